@@ -1,37 +1,49 @@
 # Backend: Flask application with transcription and summarization
 
 # Standard Libraries
-import json
 import os
-import threading
 import time
 import uuid
 import functools
+import hmac
 from datetime import datetime
 
 # Third-Party Libraries
-from flask import Flask, request, jsonify, send_from_directory, make_response, g, redirect, url_for
+from flask import (Flask, Response, request, jsonify, send_from_directory, send_file, make_response, g, redirect,
+                   url_for, stream_with_context)
 from flask_cors import CORS
-import nltk
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_bcrypt import Bcrypt
 from flask_session import Session
 
-# Import modules
-from config import logger, active_jobs, transcription_logs, CONFIG_FILE
-from modules.utils import ensure_nltk_resources
-from modules.transcription import process_video
-from modules.models import load_whisper_model, verify_faster_whisper_model, load_summarizer, save_app_config, load_app_config
+# Import modules. Heavy ML libraries (torch, whisper, transformers, yt_dlp, nltk,
+# langdetect, numpy) are imported lazily inside the functions that use them, so
+# auth, job listing and artifact routes are served without loading any of them.
+from config import (logger, active_jobs, transcription_logs, live_sessions, CONFIG_FILE, WARMUP_ON_STARTUP,
+                    RESUME_ON_STARTUP, STORAGE_SWEEP_SECONDS, SERVING_MODE, BROKER_TOKEN,
+                    ADMISSION_BACKLOG_SECONDS, METRICS_DIR, METRICS_EXPORT_SECONDS)
+from modules.transcription import resume_job, resume_interrupted_jobs
+from modules.segment_log import read_segment_log, partial_transcript
+from modules.scheduler import submit_job, cancel_job, queue_snapshot, PRIORITIES
+from modules import job_queue
+from modules.storage import (artifact_path, artifact_job_ids, read_json_artifact, write_json_artifact,
+                             storage_usage, run_maintenance, start_storage_sweeper)
+from modules.models import load_summarizer, save_app_config, load_app_config
 from modules.notion import export_to_notion
 from modules.summarization import generate_notes
+from modules.metrics import REQUEST_LATENCY, REQUESTS, ADMISSIONS, render_metrics, start_metrics_export
+from modules.admission import admit, release as release_admission, probe_duration
+from modules.tracing import load_trace, bind_job
+from modules.warmup import start_warmup, get_readiness, cluster_readiness
+from modules.responses import install_json_provider, artifact_response, conditional_json
+from modules.exports import EXPORT_FORMATS, cached_export, stream_export
 from models import User
 
-# Ensure required NLTK resources are available
-ensure_nltk_resources()
-
 # Initialize Flask app
 app = Flask(__name__, static_folder='../frontend/build')
 CORS(app, supports_credentials=True, origins=["http://localhost:3000"])
+# orjson, when installed, serializes every jsonify() response
+install_json_provider(app)
 
 # Add configurations for authentication and session management
 app.secret_key = 'your_secret_key_here'  # Change this to a secure random string
@@ -79,6 +91,22 @@ logger.info("Loading application configuration")
 app_config = load_app_config()
 logger.info(f"Configuration loaded: {app_config}")
 
+# Warm the configured models and restart interrupted jobs in the background; skip the
+# reloader's watcher process, which never serves requests
+serving_process = __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+# Under serve.py the inference processes own warm-up, resumption and storage maintenance
+if SERVING_MODE != "dev":
+    serving_process = False
+if WARMUP_ON_STARTUP and serving_process:
+    start_warmup()
+if RESUME_ON_STARTUP and serving_process:
+    resume_interrupted_jobs()
+if STORAGE_SWEEP_SECONDS and serving_process:
+    start_storage_sweeper()
+if SERVING_MODE != "dev":
+    # Each gunicorn worker exports its request metrics so any one of them can answer /metrics for all
+    start_metrics_export(METRICS_DIR, METRICS_EXPORT_SECONDS)
+
 # Add a request logger middleware to track user experience
 @app.before_request
 def log_request_info():
@@ -90,6 +118,9 @@ def log_response_info(response):
     if hasattr(g, 'start_time'):
         duration = time.time() - g.start_time
         logger.debug(f"Response: {response.status_code}, took {duration:.4f}s")
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_LATENCY.observe(duration, endpoint=endpoint, method=request.method)
+        REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
     return response
 
 # Add consistent API error handler
@@ -109,6 +140,13 @@ def server_error(error):
         'message': 'An unexpected error occurred'
     }), 500)
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose counters and histograms in the Prometheus text format"""
+    response = make_response(render_metrics())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
 # Helper function to get user preferences
 def get_user_preferences():
     config_data = load_app_config()
@@ -132,6 +170,10 @@ def transcribe():
         model_type = data.get('model_type', 'whisper')
         model_size = data.get('model_size', 'medium')
         language = data.get('language')  # Add language parameter
+        profile = bool(data.get('profile', False))  # Opt-in sampling profile of heavy stages
+        priority = data.get('priority', 'interactive')  # Bulk jobs yield their slot to interactive ones
+        if priority not in PRIORITIES:
+            return jsonify({"error": f"priority must be one of {', '.join(PRIORITIES)}"}), 400
         
         # Improved validation for YouTube URLs
         import re
@@ -142,23 +184,48 @@ def transcribe():
         # Generate unique job ID
         job_id = str(uuid.uuid4())
         
-        # Save job config including language
-        active_jobs[job_id] = {
-            "url": youtube_url,
-            "status": "queued",
-            "created_at": time.time(),
-            "model_type": model_type,
-            "model_size": model_size,
-            "language": language  # Store language in job config
-        }
+        # Refuse work the workers cannot start within the backlog budget, rather than slowing every job;
+        # an admitted job's place is reserved until it is submitted below
+        duration = probe_duration(youtube_url) if ADMISSION_BACKLOG_SECONDS > 0 else None
+        admitted, estimated_seconds, retry_after = admit(job_id, youtube_url, priority, PRIORITIES[priority],
+                                                         model_type, model_size, duration)
+        if not admitted:
+            ADMISSIONS.inc(result="rejected")
+            logger.warning(f"Rejected {youtube_url}: backlog full, retry in {retry_after}s")
+            response = jsonify({
+                "error": "The server is busy; retry later",
+                "retry_after": retry_after,
+                "estimated_seconds": round(estimated_seconds, 1)
+            })
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 503
+        ADMISSIONS.inc(result="admitted")
         
-        # Start processing in a separate thread
-        thread = threading.Thread(target=process_video, args=(youtube_url, job_id, language))
-        thread.daemon = True
-        thread.start()
+        try:
+            # Save job config including language
+            active_jobs[job_id] = {
+                "url": youtube_url,
+                "status": "queued",
+                "created_at": time.time(),
+                "model_type": model_type,
+                "model_size": model_size,
+                "language": language,  # Store language in job config
+                "profile": profile,
+                "priority": priority,
+                "duration": duration,
+                "estimated_seconds": estimated_seconds
+            }
+            
+            # Workers pick the job up in priority order
+            submit_job(job_id, youtube_url, language, priority)
+        except Exception:
+            release_admission(job_id)
+            raise
         
         logger.info(f"Started job {job_id} for URL: {youtube_url} with model: {model_type}/{model_size}, language: {language or 'auto'}")
-        return jsonify({"job_id": job_id, "status": "queued"})
+        # A job cancelled while its place was reserved is never queued
+        cancelled = (active_jobs.get(job_id) or {}).get("status") == "cancelled"
+        return jsonify({"job_id": job_id, "status": "cancelled" if cancelled else "queued"})
         
     except Exception as e:
         logger.error(f"Error starting transcription: {str(e)}")
@@ -171,21 +238,32 @@ def load_model_config():
     model_size = data.get('model_size', 'medium')
     summarizer_model = data.get('summarizer_model')
     
+    if model_type not in ("whisper", "faster-whisper"):
+        return jsonify({"error": "Invalid model type"}), 400
+    
     # Save config
     save_app_config(model_type, model_size, summarizer_model)
+
+    if SERVING_MODE != "dev":
+        # HTTP processes hold no models; the inference workers read the saved config when they start
+        return jsonify({"message": f"Saved {model_type} model {model_size} with {summarizer_model} summarizer; "
+                                   "restart serve.py to load it in the inference workers"}), 202
+
+    # Load the models in the background; progress is reported by /api/ready
+    if not start_warmup(model_type, model_size, summarizer_model):
+        return jsonify({"error": "A model load is already in progress", "readiness": get_readiness()}), 409
     
-    # Load summarization model
-    load_summarizer(summarizer_model)
-    
-    # Continue with loading the appropriate transcription model
-    if model_type == "whisper":
-        load_whisper_model(model_size)
-    elif model_type == "faster-whisper":
-        verify_faster_whisper_model(model_size)
-    else:
-        return jsonify({"error": "Invalid model type"}), 400
-    
-    return jsonify({"message": f"{model_type.capitalize()} model {model_size} loaded with {summarizer_model} summarizer"}), 200
+    return jsonify({
+        "message": f"Loading {model_type} model {model_size} with {summarizer_model} summarizer",
+        "readiness": get_readiness()
+    }), 202
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 only once every model has been loaded and warmed"""
+    # HTTP processes load no models; under serve.py the inference processes' state decides
+    status = get_readiness() if SERVING_MODE == "dev" else cluster_readiness()
+    return jsonify(status), 200 if status["ready"] else 503
 
 @app.route('/api/config', methods=['GET'])
 def get_config():
@@ -195,6 +273,16 @@ def get_config():
     from modules.models import get_available_summarizers
     config_data["available_summarizers"] = get_available_summarizers()
     
+    # Device, compute type and thread counts the engines run with. Probing the hardware
+    # would import the ML libraries here, so report what the inference side has detected
+    from modules.hardware import peek_execution_profile, published_profiles
+    if SERVING_MODE == "dev":
+        config_data["execution_profile"] = peek_execution_profile()
+    else:
+        profiles = published_profiles()
+        config_data["execution_profile"] = next(iter(profiles.values()), None)
+        config_data["execution_profiles"] = profiles
+    
     # Add language support information
     config_data["language_support"] = {
         # Standard models support all languages but at varying quality
@@ -261,13 +349,14 @@ def save_theme():
 @app.route('/api/job/<job_id>', methods=['GET'])
 def get_job_status(job_id):
     from config import TRANSCRIPT_DIR, NOTES_DIR
-    if job_id not in active_jobs:
-        transcript_path = os.path.join(TRANSCRIPT_DIR, f"{job_id}.json")
-        notes_path = os.path.join(NOTES_DIR, f"{job_id}.json")
-        if os.path.exists(transcript_path):
+    # Finished jobs leave memory after a while; their last state is kept on disk
+    job = active_jobs.load(job_id)
+    if job is None:
+        transcript_path = artifact_path(TRANSCRIPT_DIR, job_id)
+        notes_path = artifact_path(NOTES_DIR, job_id)
+        if transcript_path is not None:
             try:
-                with open(transcript_path, 'r') as f:
-                    data = json.load(f)
+                data = read_json_artifact(TRANSCRIPT_DIR, job_id)
                 title = data.get("title", "Unknown Video")
                 channel = data.get("channel", "Unknown")
             except Exception:
@@ -285,39 +374,192 @@ def get_job_status(job_id):
             return jsonify(job_info)
         else:
             return jsonify({"error": "Job not found"}), 404
-    return jsonify(active_jobs[job_id])
+    # Spans and profiles are served by /api/job/<job_id>/trace to keep status polls small
+    job = {k: v for k, v in job.items() if k not in ("trace", "profiles")}
+    # Every update bumps the version, so pollers get a 304 until the job moves on
+    return conditional_json(job, f"{job_id}-{job.get('version', 0)}-{job.get('updated_at', 0)}")
+
+@app.route('/api/job/<job_id>/trace', methods=['GET'])
+def get_job_trace(job_id):
+    """Return the job's span timeline and, if profiled, its sampled stacks"""
+    trace = load_trace(job_id)
+    if trace is None:
+        return jsonify({"error": "Trace not available"}), 404
+    
+    # ?format=collapsed returns one profile in the folded-stack format used by flame graph tools
+    if request.args.get('format') == 'collapsed':
+        stage = request.args.get('stage', 'transcribe')
+        profile = trace.get("profiles", {}).get(stage)
+        if not profile:
+            return jsonify({"error": f"No profile recorded for stage {stage}"}), 404
+        lines = [f"{entry['stack']} {entry['count']}" for entry in profile["stacks"]]
+        response = make_response("\n".join(lines) + "\n")
+        response.headers['Content-Type'] = 'text/plain; charset=utf-8'
+        return response
+    
+    spans = trace.get("spans", [])
+    if spans:
+        origin = min(entry["start"] for entry in spans)
+        trace["spans"] = [dict(entry, offset=round(entry["start"] - origin, 4)) for entry in spans]
+    return jsonify(trace)
+
+@app.route('/api/job/<job_id>/cancel', methods=['POST'])
+def cancel_job_route(job_id):
+    """Cancel a queued job, or stop a running one at its next safe point"""
+    result = cancel_job(job_id)
+    if result is None:
+        job = active_jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify({"error": f"Job is {job.get('status')}, not queued or running"}), 409
+    return jsonify({"job_id": job_id, "status": result}), 200 if result == "cancelled" else 202
+
+@app.route('/api/queue', methods=['GET'])
+def get_queue():
+    return jsonify(queue_snapshot())
+
+def _broker_denied():
+    """Error response unless the caller is an inference node holding the broker token"""
+    if SERVING_MODE == "dev" or not BROKER_TOKEN:
+        return jsonify({"error": "Remote inference nodes need serving mode and ECHOSCRIPT_BROKER_TOKEN"}), 404
+    if not hmac.compare_digest(request.headers.get('X-Broker-Token', ''), BROKER_TOKEN):
+        return jsonify({"error": "Invalid broker token"}), 403
+    return None
+
+@app.route('/api/broker/claim', methods=['POST'])
+def broker_claim():
+    """Lease the next queued job to a worker on another node"""
+    denied = _broker_denied()
+    if denied:
+        return denied
+    worker = (request.get_json(silent=True) or {}).get("worker")
+    if not worker:
+        return jsonify({"error": "worker is required"}), 400
+    return jsonify({"job": job_queue.claim(worker)})
+
+@app.route('/api/broker/heartbeat', methods=['POST'])
+def broker_heartbeat():
+    """Renew a remote worker's leases; answers which of its jobs must stop"""
+    denied = _broker_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "A JSON object is required"}), 400
+    jobs, process = data.get("jobs") or {}, data.get("process")
+    if not isinstance(jobs, dict) or not all(isinstance(beat, dict) and beat.get("worker")
+                                             for beat in jobs.values()):
+        return jsonify({"error": "jobs must map job IDs to beats with a worker"}), 400
+    if process is not None and not (isinstance(process, dict) and process.get("name")):
+        return jsonify({"error": "process must be an object with a name"}), 400
+    return jsonify({"answers": job_queue.heartbeat(jobs, process)})
+
+@app.route('/api/broker/release', methods=['POST'])
+def broker_release():
+    denied = _broker_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    if not data.get("job_id"):
+        return jsonify({"error": "job_id is required"}), 400
+    job_queue.release(data["job_id"], data.get("worker"), bool(data.get("requeue")))
+    return jsonify({"released": data["job_id"]})
+
+@app.route('/api/job/<job_id>/resume', methods=['POST'])
+def resume_job_route(job_id):
+    """Restart a failed or interrupted job from its last persisted segment"""
+    state = read_segment_log(job_id)
+    if state is None:
+        from config import TRANSCRIPT_DIR
+        if artifact_path(TRANSCRIPT_DIR, job_id) is not None:
+            # Completed jobs delete their log once the transcript and notes are saved
+            return jsonify({"error": "Job already complete"}), 409
+        return jsonify({"error": "No segment log for this job"}), 404
+    if state["status"] == "complete":
+        return jsonify({"error": "Job already complete"}), 409
+    if active_jobs.get(job_id, {}).get("status") not in ("error", "cancelled", None):
+        return jsonify({"error": "Job is still running"}), 409
+    job = resume_job(job_id)
+    return jsonify({"job_id": job_id, "status": job["status"], "resumed_from": job["resumed_from"]}), 202
 
 @app.route('/api/transcript/<job_id>', methods=['GET'])
 def get_transcript(job_id):
     from config import TRANSCRIPT_DIR
-    transcript_path = None
-    if job_id in active_jobs and active_jobs[job_id].get("status") == "complete":
-        transcript_path = active_jobs[job_id].get("transcript_path")
-    else:
-        possible_path = os.path.join(TRANSCRIPT_DIR, f"{job_id}.json")
-        if os.path.exists(possible_path):
-            transcript_path = possible_path
-    if transcript_path is None:
+    # Saved transcripts are sent as stored (precompressed, or 304 if unchanged)
+    response = artifact_response(TRANSCRIPT_DIR, job_id)
+    if response is None:
+        # Running (or interrupted) jobs serve whatever segments have been persisted so far
+        partial = partial_transcript(job_id)
+        if partial is not None:
+            return jsonify(partial)
         return jsonify({"error": "Transcript not available"}), 404
-    with open(transcript_path, 'r') as f:
-        transcript_data = json.load(f)
-    return jsonify(transcript_data)
+    return response
 
 @app.route('/api/notes/<job_id>', methods=['GET'])
 def get_notes(job_id):
     from config import NOTES_DIR
-    notes_path = None
-    if job_id in active_jobs and active_jobs[job_id].get("status") == "complete":
-        notes_path = active_jobs[job_id].get("notes_path")
-    else:
-        possible_path = os.path.join(NOTES_DIR, f"{job_id}.json")
-        if os.path.exists(possible_path):
-            notes_path = possible_path
-    if notes_path is None:
+    response = artifact_response(NOTES_DIR, job_id)
+    if response is None:
         return jsonify({"error": "Notes not available"}), 404
-    with open(notes_path, 'r') as f:
-        notes_data = json.load(f)
-    return jsonify(notes_data)
+    return response
+
+@app.route('/api/export/<job_id>/<fmt>', methods=['GET'])
+def export_transcript(job_id, fmt):
+    """Download a transcript as SRT, VTT, plain text or Markdown"""
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format, use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    filename = f"{job_id}.{fmt}"
+    # Exports of finished transcripts are cached on disk and served as static files (ETag, Range, 304)
+    path = cached_export(job_id, fmt)
+    if path is not None:
+        return send_file(path, mimetype=EXPORT_FORMATS[fmt], as_attachment=True, download_name=filename)
+    chunks = stream_export(job_id, fmt)
+    if chunks is None:
+        return jsonify({"error": "Transcript not available"}), 404
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def _archive_time(value):
+    """Unix seconds or an ISO 8601 date/time from a query parameter"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+@app.route('/api/export/archive', methods=['GET'])
+def export_archive():
+    """Stream a zip of the transcripts and notes of every job matching the filter"""
+    from modules.archive import archive_jobs, stream_archive
+    try:
+        since = _archive_time(request.args.get('since'))
+        until = _archive_time(request.args.get('until'))
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+    except ValueError:
+        return jsonify({"error": "since/until must be Unix seconds or ISO dates and limit an integer"}), 400
+    subtitles = [fmt for fmt in request.args.get('subtitles', '').split(',') if fmt]
+    unknown = [fmt for fmt in subtitles if fmt not in EXPORT_FORMATS]
+    if unknown:
+        return jsonify({"error": f"Unsupported subtitle formats: {', '.join(unknown)}"}), 400
+    
+    # One extra job tells whether a next page exists
+    jobs = archive_jobs(since=since, until=until, channel=request.args.get('channel'),
+                        status=request.args.get('status'), after=request.args.get('after'),
+                        limit=limit + 1 if limit else None)
+    next_cursor = None
+    if limit and len(jobs) > limit:
+        jobs = jobs[:limit]
+        next_cursor = jobs[-1]["job_id"]
+    
+    chunks = (chunk for chunk in stream_archive(jobs, subtitles, next_cursor) if chunk)
+    response = Response(stream_with_context(chunks), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="echoscript-{int(time.time())}.zip"'
+    response.headers['X-Archive-Jobs'] = str(len(jobs))
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @app.route('/api/jobs', methods=['GET'])
 def list_jobs():
@@ -329,39 +571,116 @@ def list_jobs():
         "url": job.get("url", ""),
         "title": job.get("title", "Unknown"),
         "created_at": job.get("created_at", 0)
-    } for job_id, job in active_jobs.items()]
+    } for job_id, job in active_jobs.snapshot()]
     
     # Scan transcripts folder for saved transcripts from previous runs
-    for filename in os.listdir(TRANSCRIPT_DIR):
-        if filename.endswith(".json"):
-            j_id = filename[:-5]
-            if j_id not in active_jobs:
-                transcript_path = os.path.join(TRANSCRIPT_DIR, filename)
-                created_at = os.path.getmtime(transcript_path)
-                title = "Unknown Video"
-                try:
-                    with open(transcript_path, 'r') as f:
-                        data = json.load(f)
-                        if "title" in data:
-                            title = data["title"]
-                except Exception:
-                    pass
-                job_list.append({
-                    "job_id": j_id,
-                    "status": "complete",
-                    "url": "",
-                    "title": title,
-                    "created_at": created_at
-                })
+    for j_id in artifact_job_ids(TRANSCRIPT_DIR):
+        if j_id not in active_jobs:
+            transcript_path = artifact_path(TRANSCRIPT_DIR, j_id)
+            created_at = os.path.getmtime(transcript_path)
+            title = "Unknown Video"
+            try:
+                data = read_json_artifact(TRANSCRIPT_DIR, j_id)
+                if "title" in data:
+                    title = data["title"]
+            except Exception:
+                pass
+            job_list.append({
+                "job_id": j_id,
+                "status": "complete",
+                "url": "",
+                "title": title,
+                "created_at": created_at
+            })
     
     job_list.sort(key=lambda x: x["created_at"], reverse=True)
     return jsonify({"jobs": job_list})
 
+@app.route('/api/search', methods=['GET'])
+def search_transcripts():
+    """Ranked full-text search over the segments of every indexed transcript"""
+    from modules.search import search
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Query parameter q is required"}), 400
+    try:
+        limit = int(request.args.get('limit', 20))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    started = time.perf_counter()
+    try:
+        hits = search(query, limit=limit, offset=offset, job_id=request.args.get('job_id'))
+    except Exception as e:
+        logger.error(f"Search failed for {query!r}: {str(e)}")
+        return jsonify({"error": f"Search failed: {str(e)}"}), 500
+    return jsonify({
+        "query": query,
+        "hits": hits,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2)
+    })
+
+@app.route('/api/storage', methods=['GET'])
+def get_storage_usage():
+    """Disk usage per artifact class"""
+    return jsonify(storage_usage())
+
+@app.route('/api/storage/sweep', methods=['POST'])
+def sweep_storage():
+    """Evict audio over quota and compress cold artifacts now"""
+    result = run_maintenance()
+    return jsonify(dict(result, usage=storage_usage()))
+
 @app.route('/api/logs/<job_id>', methods=['GET'])
 def get_job_logs(job_id):
-    if job_id in transcription_logs:
-        return jsonify({"logs": transcription_logs[job_id]})
-    return jsonify({"logs": []})
+    return jsonify({"logs": transcription_logs.lines(job_id)})
+
+@app.route('/api/live/start', methods=['POST'])
+def live_start():
+    """Open a live transcription session that accepts 16-bit PCM frames"""
+    from modules.live import start_live_session
+    if SERVING_MODE != "dev":
+        # A session lives in the process that opened it, and gunicorn spreads its requests over every worker
+        return jsonify({"error": "Live transcription is only available on the development server (python app.py)"}), 501
+    try:
+        data = request.json or {}
+        session_id = str(uuid.uuid4())
+        session = start_live_session(
+            session_id,
+            model_size=data.get('model_size'),
+            language=data.get('language'),
+            sample_rate=data.get('sample_rate')
+        )
+        return jsonify({
+            "session_id": session_id,
+            "encoding": "pcm_s16le",
+            "channels": 1,
+            "sample_rate": session.sample_rate
+        })
+    except Exception as e:
+        logger.error(f"Error starting live session: {str(e)}")
+        return jsonify({"error": f"Failed to start live session: {str(e)}"}), 500
+
+@app.route('/api/live/<session_id>/audio', methods=['POST'])
+def live_audio(session_id):
+    """Feed raw PCM frames to a live session and return final and partial hypotheses"""
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": "Live session not found"}), 404
+    try:
+        return jsonify(session.feed(request.get_data()))
+    except Exception as e:
+        logger.error(f"Live session {session_id}: error decoding audio - {str(e)}", exc_info=True)
+        return jsonify({"error": f"Failed to decode audio: {str(e)}"}), 500
+
+@app.route('/api/live/<session_id>/stop', methods=['POST'])
+def live_stop(session_id):
+    """Flush and close a live session, persisting its transcript"""
+    from modules.live import stop_live_session
+    result = stop_live_session(session_id)
+    if result is None:
+        return jsonify({"error": "Live session not found"}), 404
+    return jsonify(result)
 
 @app.route('/api/export/notion', methods=['POST'])
 def notion_export():
@@ -388,14 +707,10 @@ def regenerate_notes(job_id):
         data = request.json or {}
         model_name = data.get('model')
         
-        # Check if transcript exists
-        transcript_path = os.path.join(TRANSCRIPT_DIR, f"{job_id}.json")
-        if not os.path.exists(transcript_path):
+        # Read the transcript, compressed or not
+        transcript_data = read_json_artifact(TRANSCRIPT_DIR, job_id)
+        if transcript_data is None:
             return jsonify({"error": "Transcript not found"}), 404
-            
-        # Read the transcript
-        with open(transcript_path, 'r') as f:
-            transcript_data = json.load(f)
         
         # Get the full transcript text
         full_text = ""
@@ -419,16 +734,20 @@ def regenerate_notes(job_id):
                 return jsonify({"error": f"Failed to load summarizer model {model_name}"}), 500
         
         # Generate notes with the loaded model
-        notes = generate_notes(full_text)
+        # The transcript records the language the engine detected; detection from text is the fallback,
+        # run with the job bound so an earlier detection cached on the job is reused
+        from modules.document import load_document
+        document = load_document(job_id, transcript_data) if "text" in transcript_data else None
+        with bind_job(job_id):
+            notes = generate_notes(full_text, transcript_data.get("language"), document=document)
+        notes["notes_stage"] = "final"
         
         # Save the regenerated notes
-        notes_path = os.path.join(NOTES_DIR, f"{job_id}.json")
-        with open(notes_path, 'w') as f:
-            json.dump(notes, f)
+        notes_path = write_json_artifact(NOTES_DIR, job_id, notes)
             
         # Set the notes path in active_jobs if job is still active
         if job_id in active_jobs:
-            active_jobs[job_id]["notes_path"] = notes_path
+            active_jobs.update(job_id, notes_path=notes_path, notes_stage="final")
         
         logger.info(f"Successfully regenerated notes for job {job_id}")
         return jsonify(notes)
@@ -514,7 +833,7 @@ def check_auth():
         preferences = get_user_preferences()
         
         # Get active jobs count for this user
-        user_jobs = [job for job_id, job in active_jobs.items() 
+        user_jobs = [job for job_id, job in active_jobs.snapshot() 
                     if job.get('user_id') == current_user.id]
         
         return jsonify({
@@ -0,0 +1,95 @@
+"""Cold-start import benchmark for the API layer.
+
+Imports ``app`` in a fresh interpreter several times and reports the median
+wall time, the slowest modules from ``-X importtime`` and whether any heavy
+ML library was pulled in. The API process must not import those libraries
+until a route actually needs a model:
+
+    python benchmarks/import_time.py --budget 1.0
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Libraries that must stay out of the API process until a model is needed
+HEAVY_MODULES = ["torch", "whisper", "transformers", "faster_whisper", "ctranslate2",
+                 "yt_dlp", "nltk", "langdetect", "numpy", "notion_client"]
+
+PROBE = (
+    "import sys, time, json\n"
+    "started = time.perf_counter()\n"
+    "import app\n"
+    "elapsed = time.perf_counter() - started\n"
+    f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+    "print(json.dumps({'seconds': elapsed, 'heavy_modules': heavy}))\n"
+)
+
+
+def measure_once(env):
+    """Import app in a new interpreter and return its probe result"""
+    proc = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+                          capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def slowest_modules(env, top=15):
+    """Return the modules with the largest cumulative import time"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=BACKEND_DIR,
+                          env=env, capture_output=True, text=True, check=True)
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = (field.strip() for field in line[len("import time:"):].split("|"))
+        entries.append({"module": name, "cumulative_ms": int(cumulative_us) / 1000, "self_ms": int(self_us) / 1000})
+    entries.sort(key=lambda entry: entry["cumulative_ms"], reverse=True)
+    return entries[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the API layer")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, help="Fail if the median import time exceeds this many seconds")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/import_<timestamp>.json)")
+    args = parser.parse_args()
+
+    # Warm-up is a background concern of inference processes; measure the bare API layer
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1", ECHOSCRIPT_WARMUP="0")
+    runs = [measure_once(env) for _ in range(args.runs)]
+    seconds = [run["seconds"] for run in runs]
+    heavy = sorted({module for run in runs for module in run["heavy_modules"]})
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "median_seconds": round(statistics.median(seconds), 4),
+        "min_seconds": round(min(seconds), 4),
+        "max_seconds": round(max(seconds), 4),
+        "heavy_modules_imported": heavy,
+        "slowest_modules": slowest_modules(env)
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"import_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if heavy:
+        print(f"Heavy modules imported at startup: {', '.join(heavy)}", file=sys.stderr)
+        sys.exit(1)
+    if args.budget is not None and report["median_seconds"] > args.budget:
+        print(f"Median import time {report['median_seconds']}s exceeds budget {args.budget}s", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
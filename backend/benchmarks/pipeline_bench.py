@@ -0,0 +1,309 @@
+"""End-to-end pipeline benchmark.
+
+Runs process_video's stages (decode, transcribe, summarize, persist) on a
+bundled or synthetic audio file with yt-dlp stubbed out, once per
+engine/model-size/summarizer combination. Every combination runs in its own
+subprocess with a throwaway storage directory so peak RSS and model caches
+never leak between runs. Results are written as JSON for comparison between
+releases. Streaming summarization is off unless --streaming-summary is given,
+so the summarize stage is not hidden inside transcription; with it on, the
+summarizer time that overlapped transcription is reported separately:
+
+    python benchmarks/pipeline_bench.py --engines whisper faster-whisper \\
+        --sizes tiny base --summarizers t5-small --output results/v1.json
+    python benchmarks/pipeline_bench.py --compare results/v0.json results/v1.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+STAGES = ["decode", "transcribe", "summarize", "persist"]
+
+
+def write_synthetic_audio(path, seconds=30, sample_rate=16000):
+    """Write a deterministic speech-band test signal as 16-bit mono WAV"""
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        frames = bytearray()
+        for i in range(int(seconds * sample_rate)):
+            t = i / sample_rate
+            # Syllable-rate amplitude modulation over a few formant-like tones
+            envelope = 0.5 * (1 + math.sin(2 * math.pi * 4 * t))
+            value = envelope * (0.5 * math.sin(2 * math.pi * 220 * t)
+                                + 0.3 * math.sin(2 * math.pi * 880 * t)
+                                + 0.2 * math.sin(2 * math.pi * 2400 * t))
+            frames += struct.pack("<h", int(value * 12000))
+        wav.writeframes(bytes(frames))
+    return path
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def count_tokens(text):
+    """Count summary tokens with the loaded summarizer's tokenizer when available"""
+    import config
+    try:
+        return len(config.summarizer.tokenizer(text)["input_ids"])
+    except Exception:
+        return len(text.split())
+
+
+def run_one(spec):
+    """Benchmark a single configuration inside the current process"""
+    sys.path.insert(0, BACKEND_DIR)
+    import config
+    import modules.transcription as transcription
+    from modules.models import load_whisper_model, load_summarizer
+    from modules.utils import get_audio_duration, ensure_nltk_resources
+
+    ensure_nltk_resources()
+    source_audio = spec["audio"]
+
+    class StubYoutubeDL:
+        """Stand-in for yt_dlp.YoutubeDL that "downloads" the benchmark audio"""
+
+        def __init__(self, opts=None):
+            self.opts = opts or {}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def download(self, urls):
+            # Same re-encode the FFmpegExtractAudio postprocessor performs
+            target = self.opts["outtmpl"].replace("%(ext)s", "mp3")
+            subprocess.run(
+                ["ffmpeg", "-y", "-loglevel", "error", "-i", source_audio, "-b:a", "192k", target],
+                check=True
+            )
+            return 0
+
+        def extract_info(self, url, download=False):
+            if download:
+                self.download([url])
+            return {"title": "Benchmark audio", "uploader": "benchmark", "thumbnail": "", "duration": None}
+
+    import yt_dlp
+    yt_dlp.YoutubeDL = StubYoutubeDL
+
+    timings = {}
+    counters = {}
+
+    def timed(stage, func):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+        return wrapper
+
+    transcription.download_youtube_audio = timed("decode", transcription.download_youtube_audio)
+    transcription.transcribe_audio = timed("transcribe", transcription.transcribe_audio)
+    original_generate_notes = transcription.generate_notes
+
+    def generate_notes(*args, **kwargs):
+        notes = original_generate_notes(*args, **kwargs)
+        counters["summary_tokens"] = count_tokens(notes.get("summary", ""))
+        return notes
+
+    transcription.generate_notes = timed("summarize", generate_notes)
+    # Chunks a StreamingSummarizer summarizes on its own thread while transcription runs
+    from modules.summarization import StreamingSummarizer
+    StreamingSummarizer._flush = timed("summarize_overlap", StreamingSummarizer._flush)
+
+    load_started = time.perf_counter()
+    if spec["engine"] == "whisper":
+        load_whisper_model(spec["size"])
+    if spec["summarizer"]:
+        load_summarizer(spec["summarizer"])
+    model_load_seconds = time.perf_counter() - load_started
+
+    job_id = "bench"
+    config.active_jobs[job_id] = {
+        "url": "https://www.youtube.com/watch?v=benchmark",
+        "status": "queued",
+        "created_at": time.time(),
+        "model_type": spec["engine"],
+        "model_size": spec["size"],
+        "language": spec["language"]
+    }
+    started = time.perf_counter()
+    transcription.process_video(config.active_jobs[job_id]["url"], job_id, spec["language"])
+    total = time.perf_counter() - started
+
+    job = config.active_jobs[job_id]
+    if job.get("status") != "complete":
+        raise RuntimeError(f"Pipeline failed: {job.get('error', job.get('status'))}")
+
+    # Whatever process_video spent outside the instrumented calls is persistence and bookkeeping
+    timings["persist"] = max(0.0, total - sum(timings.get(stage, 0.0) for stage in STAGES[:-1]))
+    audio_seconds = get_audio_duration(os.path.join(config.AUDIO_DIR, f"{job_id}.mp3"))
+    with open(os.path.join(config.TRANSCRIPT_DIR, f"{job_id}.json")) as f:
+        segment_count = len(json.load(f).get("segments", []))
+
+    summarize_seconds = timings.get("summarize", 0.0)
+    return {
+        "engine": spec["engine"],
+        "model_size": spec["size"],
+        "summarizer": spec["summarizer"],
+        "streaming_summary": config.STREAMING_SUMMARY,
+        "audio_seconds": round(audio_seconds, 2),
+        "model_load_seconds": round(model_load_seconds, 3),
+        "total_seconds": round(total, 3),
+        "stage_seconds": {stage: round(timings.get(stage, 0.0), 3) for stage in STAGES},
+        "overlapped_summarize_seconds": round(timings.get("summarize_overlap", 0.0), 3),
+        "rtf": round(total / audio_seconds, 4) if audio_seconds else None,
+        "transcribe_rtf": round(timings.get("transcribe", 0.0) / audio_seconds, 4) if audio_seconds else None,
+        "segments": segment_count,
+        "summary_tokens": counters.get("summary_tokens", 0),
+        "tokens_per_second": round(counters.get("summary_tokens", 0) / summarize_seconds, 2) if summarize_seconds else None,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def environment_info():
+    """Describe the machine and code revision the results came from"""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now().isoformat(timespec="seconds")
+    }
+    try:
+        info["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        info["git_commit"] = None
+    return info
+
+
+def run_matrix(args):
+    """Run every configuration in its own subprocess and collect results"""
+    work_dir = tempfile.mkdtemp(prefix="echoscript-bench-")
+    audio = args.audio or write_synthetic_audio(os.path.join(work_dir, "synthetic.wav"), args.seconds)
+    results = []
+    try:
+        for engine in args.engines:
+            for size in args.sizes:
+                for summarizer in args.summarizers:
+                    spec = {
+                        "engine": engine,
+                        "size": size,
+                        "summarizer": summarizer,
+                        "audio": os.path.abspath(audio),
+                        "language": args.language
+                    }
+                    storage = tempfile.mkdtemp(dir=work_dir)
+                    env = dict(os.environ, ECHOSCRIPT_STORAGE_DIR=storage,
+                               ECHOSCRIPT_STREAMING_SUMMARY="1" if args.streaming_summary else "0")
+                    if args.offline:
+                        env.update(HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1")
+                    print(f"Running {engine}/{size} with {summarizer or 'default summarizer'}...", file=sys.stderr)
+                    proc = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--run-one", json.dumps(spec)],
+                        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+                    )
+                    if proc.returncode == 0:
+                        result = json.loads(proc.stdout.strip().splitlines()[-1])
+                    else:
+                        result = dict(spec, error=proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed")
+                        result.pop("audio", None)
+                    results.append(result)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "environment": environment_info(),
+        "audio": "synthetic" if not args.audio else os.path.basename(args.audio),
+        "results": results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+    return report
+
+
+def compare(baseline_path, candidate_path):
+    """Print per-configuration deltas between two result files"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+
+    def key(result):
+        return (result["engine"], result["model_size"], result.get("summarizer"),
+                "streaming" if result.get("streaming_summary") else "sequential")
+
+    base_by_key = {key(r): r for r in baseline["results"] if "error" not in r}
+    print(f"{'configuration':<40} {'metric':<18} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for result in candidate["results"]:
+        base = base_by_key.get(key(result))
+        if base is None or "error" in result:
+            continue
+        name = "/".join(str(part) for part in key(result))
+        metrics = [("rtf", base["rtf"], result["rtf"]),
+                   ("peak_rss_mb", base["peak_rss_mb"], result["peak_rss_mb"]),
+                   ("tokens_per_second", base["tokens_per_second"], result["tokens_per_second"])]
+        metrics += [(f"{stage}_s", base["stage_seconds"][stage], result["stage_seconds"][stage]) for stage in STAGES]
+        for metric, old, new in metrics:
+            change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else "n/a"
+            print(f"{name:<40} {metric:<18} {str(old):>10} {str(new):>10} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the transcription pipeline end to end")
+    parser.add_argument("--engines", nargs="+", default=["faster-whisper"], choices=["whisper", "faster-whisper"])
+    parser.add_argument("--sizes", nargs="+", default=["tiny"])
+    parser.add_argument("--summarizers", nargs="+", default=["t5-small"])
+    parser.add_argument("--audio", help="Audio file to use instead of the synthetic signal")
+    parser.add_argument("--seconds", type=float, default=30, help="Length of the synthetic signal")
+    parser.add_argument("--language", default="en", help="Fixed language keeps runs deterministic")
+    parser.add_argument("--streaming-summary", action="store_true",
+                        help="Summarize during transcription; overlapped time is reported separately")
+    parser.add_argument("--offline", action="store_true", help="Only use models already in the local cache")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/bench_<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"))
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(json.loads(args.run_one))))
+    elif args.compare:
+        compare(*args.compare)
+    else:
+        report = run_matrix(args)
+        print(json.dumps(report["results"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,13 @@ import datetime
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BACKEND_DIR = os.path.join(BASE_DIR, "backend")
 
+# Root for job artifacts; can be redirected (e.g. by benchmarks) without touching models
+STORAGE_DIR = os.environ.get("ECHOSCRIPT_STORAGE_DIR", BACKEND_DIR)
+
 # Storage paths
-AUDIO_DIR = os.path.join(BACKEND_DIR, 'downloads')
-TRANSCRIPT_DIR = os.path.join(BACKEND_DIR, 'transcripts')
-NOTES_DIR = os.path.join(BACKEND_DIR, 'notes')
+AUDIO_DIR = os.path.join(STORAGE_DIR, 'downloads')
+TRANSCRIPT_DIR = os.path.join(STORAGE_DIR, 'transcripts')
+NOTES_DIR = os.path.join(STORAGE_DIR, 'notes')
 MODEL_DIR = os.path.join(BACKEND_DIR, "models")
 LOG_DIR = os.path.join(BACKEND_DIR, "logs")
 
@@ -39,11 +42,95 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Dictionary to store real-time transcription logs
-transcription_logs = {}
+# Bounds on in-memory state; finished jobs leave memory after JOB_TTL_SECONDS and stay readable from JOBS_DIR
+JOBS_DIR = os.path.join(STORAGE_DIR, 'jobs')
+os.makedirs(JOBS_DIR, exist_ok=True)
+JOB_TTL_SECONDS = float(os.environ.get("ECHOSCRIPT_JOB_TTL_SECONDS", "3600"))
+MAX_JOBS_IN_MEMORY = int(os.environ.get("ECHOSCRIPT_MAX_JOBS_IN_MEMORY", "1000"))
+# Cap on the JSON size of the job records held in memory
+MAX_JOB_MEMORY_BYTES = int(float(os.environ.get("ECHOSCRIPT_MAX_JOB_MEMORY_MB", "64")) * 1024 * 1024)
+LOG_LINES_PER_JOB = 100
+MAX_LOG_JOBS = int(os.environ.get("ECHOSCRIPT_MAX_LOG_JOBS", "500"))
+
+# "dev" runs everything in one process; serve.py starts "api" (HTTP) and "inference" processes
+SERVING_MODE = os.environ.get("ECHOSCRIPT_SERVING_MODE", "dev")
+# Job records and logs go through JOBS_DIR so every process sees the same state
+SHARED_STATE = SERVING_MODE != "dev"
+
+from modules.job_store import JobStore, LogStore
+
+# Real-time transcription logs, one ring buffer per job
+transcription_logs = LogStore(max_lines=LOG_LINES_PER_JOB, max_jobs=MAX_LOG_JOBS,
+                              log_dir=JOBS_DIR if SHARED_STATE else None)
 
 # Track jobs
-active_jobs = {}
+active_jobs = JobStore(JOBS_DIR, ttl=JOB_TTL_SECONDS, max_jobs=MAX_JOBS_IN_MEMORY, max_bytes=MAX_JOB_MEMORY_BYTES,
+                       on_evict=transcription_logs.discard, shared=SHARED_STATE)
+
+# Load the configured models in the background at startup (disable for API-only processes)
+WARMUP_ON_STARTUP = os.environ.get("ECHOSCRIPT_WARMUP", "1") != "0"
+
+# Jobs processed concurrently; further jobs wait in the scheduler's priority queue
+WORKER_SLOTS = max(1, int(os.environ.get("ECHOSCRIPT_WORKER_SLOTS", "2")))
+
+# Summarize transcript chunks while transcription is still running (0 summarizes after it finishes)
+STREAMING_SUMMARY = os.environ.get("ECHOSCRIPT_STREAMING_SUMMARY", "1") != "0"
+
+# Serve extractive preview notes while the summarizer runs (0 leaves notes missing until then)
+PREVIEW_NOTES = os.environ.get("ECHOSCRIPT_PREVIEW_NOTES", "1") != "0"
+
+# Production serving (serve.py): HTTP processes queue jobs in QUEUE_DB for the inference processes
+QUEUE_DB = os.path.join(STORAGE_DIR, 'queue.db')
+SERVE_BIND = os.environ.get("ECHOSCRIPT_BIND", "0.0.0.0:5000")
+HTTP_WORKERS = max(1, int(os.environ.get("ECHOSCRIPT_HTTP_WORKERS", "4")))
+HTTP_THREADS = max(1, int(os.environ.get("ECHOSCRIPT_HTTP_THREADS", "8")))
+INFERENCE_WORKERS = max(1, int(os.environ.get("ECHOSCRIPT_INFERENCE_WORKERS", "1")))
+# Each serving process exports its counters here every METRICS_EXPORT_SECONDS; /metrics adds them up
+METRICS_DIR = os.path.join(STORAGE_DIR, 'metrics')
+METRICS_EXPORT_SECONDS = float(os.environ.get("ECHOSCRIPT_METRICS_EXPORT_SECONDS", "5"))
+QUEUE_POLL_SECONDS = float(os.environ.get("ECHOSCRIPT_QUEUE_POLL_SECONDS", "0.5"))  # Idle slot and heartbeat interval
+
+# Running jobs hold a lease renewed by heartbeats; a job whose worker stops heartbeating is requeued
+LEASE_SECONDS = float(os.environ.get("ECHOSCRIPT_LEASE_SECONDS", "30"))
+# Inference nodes on other hosts reach the queue through an API process (python serve.py --worker);
+# they need the same storage, e.g. ECHOSCRIPT_STORAGE_DIR on a shared mount
+BROKER_URL = os.environ.get("ECHOSCRIPT_BROKER_URL", "").rstrip("/")
+BROKER_TOKEN = os.environ.get("ECHOSCRIPT_BROKER_TOKEN", "")
+
+# Admission control: /api/transcribe answers 503 with Retry-After once the estimated processing time of
+# queued and running jobs, per worker slot, would exceed this many seconds (0 disables)
+ADMISSION_BACKLOG_SECONDS = float(os.environ.get("ECHOSCRIPT_ADMISSION_BACKLOG_SECONDS", "3600"))
+ADMISSION_DEFAULT_DURATION = 600  # Seconds assumed for videos whose length yt-dlp cannot report up front
+# Longest /api/transcribe waits for yt-dlp's metadata before assuming ADMISSION_DEFAULT_DURATION
+ADMISSION_PROBE_SECONDS = float(os.environ.get("ECHOSCRIPT_ADMISSION_PROBE_SECONDS", "5"))
+RTF_FILE = os.path.join(STORAGE_DIR, 'rtf.json')  # Measured processing seconds per audio second
+
+# Restart jobs a crash interrupted, continuing from their segment logs
+RESUME_ON_STARTUP = os.environ.get("ECHOSCRIPT_RESUME", "1") != "0"
+
+# Execution profile overrides; empty values mean "pick from detected hardware"
+EXECUTION_DEVICE = os.environ.get("ECHOSCRIPT_DEVICE", "auto")  # auto, cuda or cpu
+EXECUTION_COMPUTE_TYPE = os.environ.get("ECHOSCRIPT_COMPUTE_TYPE") or None
+EXECUTION_CPU_THREADS = int(os.environ.get("ECHOSCRIPT_CPU_THREADS", "0")) or None
+EXECUTION_NUM_WORKERS = int(os.environ.get("ECHOSCRIPT_NUM_WORKERS", "0")) or None
+
+# Live transcription sessions keyed by session ID
+live_sessions = {}
+
+# Live transcription settings (16 kHz mono PCM, matching Whisper's input rate)
+LIVE_SAMPLE_RATE = 16000
+LIVE_DEFAULT_MODEL = "small"
+LIVE_WINDOW_SECONDS = 15.0   # Maximum uncommitted audio kept in the decoding window
+LIVE_OVERLAP_SECONDS = 1.0   # Trailing audio whose segments are never finalized yet
+LIVE_STEP_SECONDS = 0.5      # Minimum new audio before re-decoding the window
+LIVE_RING_SECONDS = 120      # Audio a session buffers while its decoder catches up
+LIVE_IDLE_SECONDS = int(os.environ.get("ECHOSCRIPT_LIVE_IDLE_SECONDS", "300"))  # Sessions without audio this long are closed
+
+# The ASR engine's language is used for notes unless its probability falls below this;
+# otherwise the language is detected from LANGUAGE_SAMPLE_COUNT excerpts of the transcript
+LANGUAGE_MIN_PROBABILITY = 0.5
+LANGUAGE_SAMPLE_COUNT = 5
+LANGUAGE_SAMPLE_CHARS = 1000
 
 # Summarizer model definitions
 SUMMARIZER_MODELS = {
@@ -57,21 +144,33 @@ SUMMARIZER_MODELS = {
 # Global model variables
 transcription_model = None
 current_whisper_model_size = None
+faster_whisper_models = {}
 summarizer = None
 current_summarizer_model = "bart-large-cnn"
 
 # Set up paths for different model types
 MODEL_DIR = os.path.join(os.path.dirname(__file__), 'models')
-AUDIO_DIR = os.path.join(os.path.dirname(__file__), 'downloads')
-TRANSCRIPT_DIR = os.path.join(os.path.dirname(__file__), 'transcripts')
-NOTES_DIR = os.path.join(os.path.dirname(__file__), 'notes')
+AUDIO_DIR = os.path.join(STORAGE_DIR, 'downloads')
+TRANSCRIPT_DIR = os.path.join(STORAGE_DIR, 'transcripts')
+NOTES_DIR = os.path.join(STORAGE_DIR, 'notes')
+TRACE_DIR = os.path.join(STORAGE_DIR, 'traces')
+SEARCH_DB = os.path.join(STORAGE_DIR, 'search.db')
+SEGMENT_DIR = os.path.join(STORAGE_DIR, 'segments')
+DOCUMENT_DIR = os.path.join(STORAGE_DIR, 'documents')
+EXPORT_DIR = os.path.join(STORAGE_DIR, 'exports')
 LOGS_DIR = os.path.join(os.path.dirname(__file__), 'logs')
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), 'config.json')
 
 # Ensure directories exist
-for dir_path in [MODEL_DIR, AUDIO_DIR, TRANSCRIPT_DIR, NOTES_DIR, LOGS_DIR]:
+for dir_path in [MODEL_DIR, AUDIO_DIR, TRANSCRIPT_DIR, NOTES_DIR, TRACE_DIR, SEGMENT_DIR, DOCUMENT_DIR, EXPORT_DIR, LOGS_DIR,
+                 METRICS_DIR]:
     os.makedirs(dir_path, exist_ok=True)
     
+# Storage lifecycle: audio is a re-downloadable cache, JSON artifacts are compressed when cold
+AUDIO_QUOTA_BYTES = int(float(os.environ.get("ECHOSCRIPT_AUDIO_QUOTA_MB", "5120")) * 1024 * 1024)
+COLD_AFTER_SECONDS = float(os.environ.get("ECHOSCRIPT_COLD_DAYS", "7")) * 86400
+STORAGE_SWEEP_SECONDS = float(os.environ.get("ECHOSCRIPT_STORAGE_SWEEP_SECONDS", "600"))  # 0 disables the sweeper
+
 # Create summarizer models directory as well
 os.makedirs(os.path.join(MODEL_DIR, 'summarizers'), exist_ok=True)
 
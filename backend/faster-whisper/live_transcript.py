@@ -6,16 +6,25 @@ import os
 import uuid
 import signal
 import sys
+import threading
+from collections import deque
 from datetime import datetime
 
+# Shared capture helpers live in the backend's modules package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules.capture import AudioRingBuffer, VadChunker, PipelineStats, AdaptivePolicy
+from modules.hardware import faster_whisper_kwargs
+
 # Setup PyAudio
 CHUNK = 1024
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 16000
-RECORD_SECONDS = 5  # Process audio in 5-second chunks
+RING_SECONDS = 120      # Audio the capture thread can buffer while inference catches up
+STATS_INTERVAL = 10     # Seconds between metric reports
 
 model_size = "large-v3"
+beam_size = 5
 
 # Create a session ID and transcript folder
 session_id = str(uuid.uuid4())
@@ -26,8 +35,15 @@ transcript_file = os.path.join(transcript_folder, f"transcript_{session_id}.txt"
 # Initialize the transcription log
 transcription_log = []
 
+# Capture/inference shared state
+ring = AudioRingBuffer(RING_SECONDS, RATE)
+stop_event = threading.Event()
+
 # Function to handle termination
 def signal_handler(sig, frame):
+    stop_event.set()
+
+def save_transcript():
     print("\nTerminating and saving transcript...")
     # Save the transcription log
     with open(transcript_file, "w", encoding="utf-8") as f:
@@ -35,26 +51,37 @@ def signal_handler(sig, frame):
         f.write(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
         for start_time, end_time, text in transcription_log:
             f.write(f"[{start_time:.2f}s -> {end_time:.2f}s] {text}\n")
-    
+
     print(f"Transcription saved to {transcript_file}")
-    
+
     # Display the transcription log
     print("\nTranscription Log:")
     for start_time, end_time, text in transcription_log:
         print(f"[{start_time:.2f}s -> {end_time:.2f}s] {text}")
-    
-    sys.exit(0)
+
+def capture_loop(stream):
+    """Producer: read microphone frames into the ring buffer until stopped"""
+    while not stop_event.is_set():
+        data = stream.read(CHUNK, exception_on_overflow=False)
+        ring.write(np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0)
 
 # Set up signal handler
 signal.signal(signal.SIGINT, signal_handler)
 
 # Let's calculate the time it takes to load the model
-start = time.time()
-print(f'Loading model {model_size}...')
-model = WhisperModel(model_size, device="cuda", compute_type="int8_float16")
-print(f'Model {model_size} loaded.')
-end = time.time()
-print(f"Model loading time: {end - start} seconds")
+models = {}
+def get_model(size):
+    if size not in models:
+        start = time.time()
+        print(f'Loading model {size}...')
+        # int8 weights on either device; falls back to the CPU profile when there is no GPU
+        settings = faster_whisper_kwargs(quantized=True)
+        print(f"Using {settings['device']} with {settings['compute_type']}, {settings['cpu_threads']} threads")
+        models[size] = WhisperModel(size, **settings)
+        print(f"Model {size} loaded in {time.time() - start:.2f} seconds")
+    return models[size]
+
+get_model(model_size)
 
 # Initialize PyAudio
 p = pyaudio.PyAudio()
@@ -68,38 +95,55 @@ stream = p.open(format=FORMAT,
 
 print("* Recording. Press Ctrl+C to stop and save the transcript.")
 
-# Start recording and transcribing
+capture_thread = threading.Thread(target=capture_loop, args=(stream,), daemon=True)
+capture_thread.start()
+
+# Consumer: cut speech chunks at pauses and transcribe them while capture keeps running
+chunker = VadChunker(sample_rate=RATE)
+stats = PipelineStats(sample_rate=RATE)
+policy = AdaptivePolicy(model_size, beam_size=beam_size)
+pending_chunks = deque()
+last_report = time.time()
+
+def transcribe_chunk(chunk_start, audio):
+    queued = sum(len(a) for _, a in pending_chunks) / RATE
+    size, beam = policy.choose(stats.snapshot(ring, queued)["backlog_seconds"])
+    started = time.time()
+    segments, info = get_model(size).transcribe(audio, beam_size=beam)
+    for segment in segments:
+        actual_start = chunk_start + segment.start
+        actual_end = chunk_start + segment.end
+        print(f"[{actual_start:.2f}s -> {actual_end:.2f}s] {segment.text}")
+        transcription_log.append((actual_start, actual_end, segment.text))
+    stats.record(len(audio) / RATE, time.time() - started)
+
 try:
-    total_time = 0
-    while True:
-        frames = []
-        
-        # Record for RECORD_SECONDS
-        for i in range(0, int(RATE / CHUNK * RECORD_SECONDS)):
-            data = stream.read(CHUNK)
-            frames.append(data)
-        
-        # Convert the audio frames to a NumPy array
-        audio_data = np.frombuffer(b''.join(frames), dtype=np.int16).astype(np.float32) / 32768.0
-        
-        # Transcribe the audio data
-        segments, info = model.transcribe(audio_data, beam_size=5)
-        
-        # Process and store the segments
-        for segment in segments:
-            actual_start = total_time + segment.start
-            actual_end = total_time + segment.end
-            print(f"[{actual_start:.2f}s -> {actual_end:.2f}s] {segment.text}")
-            transcription_log.append((actual_start, actual_end, segment.text))
-        
-        # Update the total time
-        total_time += RECORD_SECONDS
+    while not stop_event.is_set() or ring.available():
+        samples = ring.read()
+        if len(samples) == 0:
+            time.sleep(0.05)
+        else:
+            pending_chunks.extend(chunker.feed(samples))
+
+        if stop_event.is_set() and not ring.available():
+            pending_chunks.extend(chunker.flush())
+
+        while pending_chunks:
+            chunk_start, audio = pending_chunks.popleft()
+            transcribe_chunk(chunk_start, audio)
+
+        if time.time() - last_report > STATS_INTERVAL:
+            level = policy.levels[policy.level]
+            print(f"[stats] {stats.snapshot(ring)} model={level[0]} beam={level[1]}")
+            last_report = time.time()
 
 except KeyboardInterrupt:
-    signal_handler(None, None)
+    stop_event.set()
 finally:
     # Clean up
+    stop_event.set()
+    capture_thread.join(timeout=1)
     stream.stop_stream()
     stream.close()
     p.terminate()
-
+    save_transcript()
@@ -0,0 +1,174 @@
+import os
+import json
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as ProbeTimeout
+from config import (logger, active_jobs, ADMISSION_BACKLOG_SECONDS, ADMISSION_DEFAULT_DURATION, ADMISSION_PROBE_SECONDS,
+                    RTF_FILE, SERVING_MODE, WORKER_SLOTS, INFERENCE_WORKERS)
+
+# Whole-job processing seconds per second of audio, used until a model size has been measured;
+# openai-whisper takes about twice as long as faster-whisper
+DEFAULT_RTF = {"tiny": 0.06, "base": 0.1, "small": 0.2, "medium": 0.4, "large": 0.8,
+               "large-v2": 0.8, "large-v3": 0.8}
+WHISPER_SLOWDOWN = 2.0
+# Weight of the newest measurement in the moving average
+RTF_SMOOTHING = 0.2
+
+# Jobs that still need worker time
+PENDING_STATES = ("queued", "downloading", "transcribing", "generating_notes", "preempted")
+
+_rtf_lock = threading.Lock()
+_rtf_cache = (None, {})  # (mtime, factors) of RTF_FILE
+
+# Held from the admission check until the job is recorded, so concurrent requests see each other (dev mode)
+_admission_lock = threading.Lock()
+
+# yt-dlp calls that outlive their request's patience finish here instead of on the request thread
+_probe_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="duration-probe")
+
+
+def _rtf_key(engine, model_size):
+    return f"{engine}/{model_size}"
+
+
+def _read_factors():
+    global _rtf_cache
+    try:
+        mtime = os.path.getmtime(RTF_FILE)
+    except OSError:
+        return {}
+    if _rtf_cache[0] != mtime:
+        try:
+            with open(RTF_FILE, 'r') as f:
+                _rtf_cache = (mtime, json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read real-time factors: {str(e)}")
+            return _rtf_cache[1]
+    return _rtf_cache[1]
+
+
+def real_time_factor(engine, model_size):
+    """Measured processing seconds per audio second for an engine and size, or a default"""
+    measured = _read_factors().get(_rtf_key(engine, model_size))
+    if measured:
+        return measured
+    factor = DEFAULT_RTF.get(model_size, DEFAULT_RTF["medium"])
+    return factor * WHISPER_SLOWDOWN if engine == "whisper" else factor
+
+
+def record_rtf(engine, model_size, audio_seconds, elapsed):
+    """Fold a finished job's processing time into its engine's moving average"""
+    if not audio_seconds or audio_seconds <= 0 or elapsed <= 0:
+        return
+    key = _rtf_key(engine, model_size)
+    with _rtf_lock:
+        factors = dict(_read_factors())
+        sample = elapsed / audio_seconds
+        previous = factors.get(key)
+        factors[key] = sample if previous is None else previous + RTF_SMOOTHING * (sample - previous)
+        tmp_path = f"{RTF_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(factors, f)
+        os.replace(tmp_path, RTF_FILE)
+    logger.info(f"Real-time factor for {key}: {factors[key]:.3f} (last job {sample:.3f})")
+
+
+def _probe(youtube_url, timeout):
+    try:
+        import yt_dlp
+        with yt_dlp.YoutubeDL({"quiet": True, "skip_download": True, "socket_timeout": timeout}) as ydl:
+            # process=False skips format selection; the page metadata already has the duration
+            info = ydl.extract_info(youtube_url, download=False, process=False)
+        return info.get("duration")
+    except Exception as e:
+        logger.warning(f"Could not read the duration of {youtube_url}: {str(e)}")
+        return None
+
+
+def probe_duration(youtube_url, timeout=ADMISSION_PROBE_SECONDS):
+    """Video length in seconds from yt-dlp's metadata, without downloading; None when unknown or slower than timeout"""
+    future = _probe_pool.submit(_probe, youtube_url, timeout)
+    try:
+        return future.result(timeout=timeout)
+    except ProbeTimeout:
+        logger.warning(f"Duration of {youtube_url} not known within {timeout}s; assuming {ADMISSION_DEFAULT_DURATION}s")
+        return None
+
+
+def remaining_estimate(job, resumed_from):
+    """Worker seconds a job still needs once resumed_from seconds of its audio are transcribed"""
+    duration = job.get("duration")
+    if not duration:
+        return job.get("estimated_seconds")
+    return max(0.0, duration - resumed_from) * real_time_factor(job.get("model_type", "whisper"),
+                                                                  job.get("model_size", "medium"))
+
+
+def worker_slots():
+    """Jobs that run at once: the slots of live inference processes in serving mode, the local pool in dev"""
+    if SERVING_MODE == "dev":
+        return WORKER_SLOTS
+    from modules import job_queue
+    # Before any worker has heartbeated, assume the configured ones are on their way
+    return job_queue.worker_capacity() or INFERENCE_WORKERS * WORKER_SLOTS
+
+
+def backlog_seconds(now=None):
+    """Estimated wall-clock seconds until the workers finish every accepted job"""
+    if SERVING_MODE != "dev":
+        from modules import job_queue
+        return job_queue.outstanding_work() / worker_slots()
+    now = now or time.time()
+    total = 0.0
+    for _, job in active_jobs.snapshot():
+        if job.get("status") not in PENDING_STATES:
+            continue
+        cost = job.get("estimated_seconds") or 0.0
+        if job.get("started_at") and job.get("status") != "queued":
+            cost = max(0.0, cost - (now - job["started_at"]))
+        total += cost
+    return total / worker_slots()
+
+
+def _verdict(cost, backlog, slots):
+    """(admitted, seconds to wait before retrying) for a job of cost worker seconds"""
+    excess = backlog + cost / slots - ADMISSION_BACKLOG_SECONDS
+    if backlog == 0 or excess <= 0:
+        return True, 0
+    # The backlog drains at one second per second; waiting longer than all of it is never needed
+    return False, max(1, math.ceil(min(excess, backlog)))
+
+
+def admit(job_id, youtube_url, priority, rank, model_type, model_size, duration):
+    """Decide whether a job fits the backlog budget and, if it does, reserve its place.
+
+    Returns (admitted, estimated seconds of worker time, seconds to wait before
+    retrying). A job is always admitted when nothing is pending, however long it is.
+    The reservation counts against the backlog until the job is submitted; call
+    release() if the job is not submitted after all.
+    """
+    cost = (duration or ADMISSION_DEFAULT_DURATION) * real_time_factor(model_type, model_size)
+    if ADMISSION_BACKLOG_SECONDS <= 0:
+        return True, cost, 0
+    if SERVING_MODE != "dev":
+        from modules import job_queue
+        fallback = INFERENCE_WORKERS * WORKER_SLOTS
+        admitted, retry_after = job_queue.reserve(
+            job_id, youtube_url, priority, rank, cost,
+            lambda work, capacity: _verdict(cost, work / (capacity or fallback), capacity or fallback))
+        return admitted, cost, retry_after
+    with _admission_lock:
+        admitted, retry_after = _verdict(cost, backlog_seconds(), worker_slots())
+        if admitted:
+            active_jobs.create(job_id, url=youtube_url, status="queued", created_at=time.time(),
+                               priority=priority, estimated_seconds=cost)
+    return admitted, cost, retry_after
+
+
+def release(job_id):
+    """Give back the reservation of an admitted job that was never submitted"""
+    active_jobs.pop(job_id, None)
+    if SERVING_MODE != "dev":
+        from modules import job_queue
+        job_queue.release(job_id)
@@ -0,0 +1,109 @@
+import io
+import json
+import time
+import zipfile
+from config import logger, TRANSCRIPT_DIR, NOTES_DIR
+from modules.storage import artifact_path, open_artifact
+from modules.search import find_documents
+from modules.exports import cached_export, stream_export
+
+# Bytes read from an artifact per zip write
+COPY_BLOCK = 64 * 1024
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, unseekable target: zipfile falls back to data descriptors and
+    everything it writes can be handed to the client straight away"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def archive_jobs(since=None, until=None, channel=None, status=None, after=None, limit=None):
+    """Jobs with an indexed transcript matching the filter, ordered by job ID.
+
+    The filter runs in the search database, so no job record or transcript is
+    read; transcripts saved before indexing existed need `python -m modules.search rebuild`.
+    after is the cursor: the last job ID an earlier, interrupted archive delivered.
+    """
+    return find_documents(since=since, until=until, channel=channel, status=status, after=after, limit=limit)
+
+
+# Earliest time a zip entry can carry (1980-01-02, clear of any timezone offset)
+ZIP_EPOCH = 315619200
+
+
+def _entry(name, created_at):
+    info = zipfile.ZipInfo(name, time.localtime(max(created_at, ZIP_EPOCH))[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def _export_chunks(job_id, fmt):
+    """Encoded blocks of a subtitle or text export, from its cached file when there is one"""
+    cached = cached_export(job_id, fmt)
+    if cached is not None:
+        def read_cached():
+            with open(cached, 'rb') as f:
+                yield from iter(lambda: f.read(COPY_BLOCK), b"")
+        return read_cached()
+    chunks = stream_export(job_id, fmt)
+    if chunks is None:
+        return None
+    return (chunk.encode('utf-8') for chunk in chunks)
+
+
+def stream_archive(jobs, subtitles=(), next_cursor=None):
+    """Yield a zip of each job's transcript, notes and subtitle exports as it is built.
+
+    Only one block of one file is in memory at a time. Entries are ordered by
+    job ID; manifest.json, written last, lists the jobs archived in full, those
+    that failed partway (with the error), and the cursor of the next page when
+    the archive was cut at a limit.
+    """
+    sink = _ZipSink()
+    delivered, failed = [], []
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for job in jobs:
+            job_id = job["job_id"]
+            try:
+                for directory, name in ((TRANSCRIPT_DIR, "transcript.json"), (NOTES_DIR, "notes.json")):
+                    path = artifact_path(directory, job_id)
+                    if path is None:
+                        continue
+                    with open_artifact(path) as source, \
+                            archive.open(_entry(f"{job_id}/{name}", job["created_at"]), 'w') as target:
+                        for block in iter(lambda: source.read(COPY_BLOCK), b""):
+                            target.write(block)
+                            yield sink.drain()
+                for fmt in subtitles:
+                    chunks = _export_chunks(job_id, fmt)
+                    if chunks is None:
+                        continue
+                    with archive.open(_entry(f"{job_id}/transcript.{fmt}", job["created_at"]), 'w') as target:
+                        for chunk in chunks:
+                            target.write(chunk)
+                            yield sink.drain()
+            except Exception as e:
+                # One unreadable job should not abort an archive of hundreds
+                logger.warning(f"Archive: skipped the rest of job {job_id} - {str(e)}")
+                failed.append(dict(job, error=str(e)))
+            else:
+                delivered.append(job)
+            yield sink.drain()
+
+        manifest = {"jobs": delivered, "failed": failed, "next_cursor": next_cursor, "created_at": time.time()}
+        archive.writestr(_entry("manifest.json", time.time()), json.dumps(manifest, indent=2))
+    yield sink.drain()
@@ -0,0 +1,62 @@
+import gc
+import sys
+import threading
+from modules.tracing import current_job_id
+
+# Why a job was asked to stop: "cancelled" ends it, "preempted" sends it back to the queue,
+# "lease_lost" means another worker took it over, so this one leaves its state alone
+CANCELLED = "cancelled"
+PREEMPTED = "preempted"
+LEASE_LOST = "lease_lost"
+
+_lock = threading.Lock()
+_requests = {}
+
+
+class JobCancelled(BaseException):
+    """Raised at a safe point once a job has been asked to stop.
+
+    Derives from BaseException, like asyncio.CancelledError, so the pipeline's
+    broad `except Exception` fallbacks cannot swallow it.
+    """
+
+    def __init__(self, job_id, reason=CANCELLED):
+        super().__init__(f"Job {job_id} {reason}")
+        self.job_id = job_id
+        self.reason = reason
+
+
+def request_cancel(job_id, reason=CANCELLED):
+    """Ask a running job to stop at its next safe point"""
+    with _lock:
+        # An explicit cancel wins over a pending preemption; a lost lease wins over both
+        if reason == LEASE_LOST or _requests.get(job_id) not in (CANCELLED, LEASE_LOST):
+            _requests[job_id] = reason
+
+
+def cancel_reason(job_id):
+    with _lock:
+        return _requests.get(job_id)
+
+
+def clear_cancel(job_id):
+    with _lock:
+        _requests.pop(job_id, None)
+
+
+def check_cancelled(job_id=None):
+    """Safe point: raise JobCancelled if the job (default: the bound one) should stop"""
+    job_id = job_id or current_job_id()
+    if job_id is None:
+        return
+    reason = cancel_reason(job_id)
+    if reason:
+        raise JobCancelled(job_id, reason)
+
+
+def release_resources():
+    """Free what an interrupted job left behind; cached models stay loaded for the next job"""
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
@@ -0,0 +1,199 @@
+import time
+import numpy as np
+
+# Model sizes from most to least expensive, used when the adaptive policy downgrades
+MODEL_SIZE_LADDER = ["large-v3", "large-v2", "large", "medium", "small", "base", "tiny"]
+
+
+class AudioRingBuffer:
+    """Single-producer/single-consumer ring buffer of float32 samples.
+
+    The capture thread only advances ``write_index`` and the inference thread
+    only advances ``read_index``; both are plain ints whose assignment is
+    atomic under the GIL, so neither side ever takes a lock. If the consumer
+    falls a whole buffer behind, new audio is counted in ``overflow_samples``
+    instead of overwriting unread samples.
+    """
+
+    def __init__(self, capacity_seconds=120, sample_rate=16000):
+        self.sample_rate = sample_rate
+        self.capacity = int(capacity_seconds * sample_rate)
+        self.buffer = np.zeros(self.capacity, dtype=np.float32)
+        self.write_index = 0
+        self.read_index = 0
+        self.overflow_samples = 0
+
+    def available(self):
+        """Number of samples written but not yet read"""
+        return self.write_index - self.read_index
+
+    def write(self, samples):
+        """Append samples; called from the capture thread only"""
+        free = self.capacity - (self.write_index - self.read_index)
+        if len(samples) > free:
+            self.overflow_samples += len(samples) - free
+            samples = samples[:free]
+        count = len(samples)
+        if count == 0:
+            return 0
+        start = self.write_index % self.capacity
+        first = min(count, self.capacity - start)
+        self.buffer[start:start + first] = samples[:first]
+        if first < count:
+            self.buffer[:count - first] = samples[first:]
+        self.write_index += count
+        return count
+
+    def read(self, max_samples=None):
+        """Remove and return up to max_samples samples; called from the consumer thread only"""
+        count = self.available()
+        if max_samples is not None:
+            count = min(count, max_samples)
+        if count <= 0:
+            return np.zeros(0, dtype=np.float32)
+        start = self.read_index % self.capacity
+        first = min(count, self.capacity - start)
+        out = np.empty(count, dtype=np.float32)
+        out[:first] = self.buffer[start:start + first]
+        if first < count:
+            out[first:] = self.buffer[:count - first]
+        self.read_index += count
+        return out
+
+
+class VadChunker:
+    """Split a sample stream into speech chunks at pauses using frame energy.
+
+    Chunks close after ``min_silence_seconds`` of trailing silence or once
+    they reach ``max_chunk_seconds``; stretches of pure silence are dropped so
+    inference only ever sees speech.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=30, energy_threshold=0.01,
+                 min_silence_seconds=0.5, min_speech_seconds=0.25, max_chunk_seconds=15.0):
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * frame_ms / 1000)
+        self.energy_threshold = energy_threshold
+        self.min_silence_frames = int(min_silence_seconds * 1000 / frame_ms)
+        self.min_speech_frames = int(min_speech_seconds * 1000 / frame_ms)
+        self.max_chunk_frames = int(max_chunk_seconds * 1000 / frame_ms)
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.frames = []
+        self.speech_frames = 0
+        self.silence_run = 0
+        self.position = 0          # Absolute sample index of the next frame
+        self.chunk_start = None    # Absolute sample index where the open chunk starts
+
+    def feed(self, samples):
+        """Consume samples and return a list of (start_seconds, audio) chunks that closed"""
+        self.pending = np.concatenate([self.pending, samples])
+        chunks = []
+        while len(self.pending) >= self.frame_size:
+            frame = self.pending[:self.frame_size]
+            self.pending = self.pending[self.frame_size:]
+            is_speech = float(np.sqrt(np.mean(frame * frame))) >= self.energy_threshold
+
+            if is_speech:
+                if self.chunk_start is None:
+                    self.chunk_start = self.position
+                self.speech_frames += 1
+                self.silence_run = 0
+            else:
+                self.silence_run += 1
+
+            if self.chunk_start is not None:
+                self.frames.append(frame)
+
+            self.position += self.frame_size
+
+            if self.chunk_start is not None and (
+                self.silence_run >= self.min_silence_frames or len(self.frames) >= self.max_chunk_frames
+            ):
+                chunk = self._close()
+                if chunk is not None:
+                    chunks.append(chunk)
+        return chunks
+
+    def flush(self):
+        """Close any open chunk, e.g. when capture stops"""
+        chunk = self._close() if self.chunk_start is not None else None
+        return [chunk] if chunk is not None else []
+
+    def _close(self):
+        chunk = None
+        if self.speech_frames >= self.min_speech_frames:
+            chunk = (self.chunk_start / self.sample_rate, np.concatenate(self.frames))
+        self.frames = []
+        self.speech_frames = 0
+        self.silence_run = 0
+        self.chunk_start = None
+        return chunk
+
+
+class PipelineStats:
+    """Backlog and real-time-factor bookkeeping for a capture/inference pipeline"""
+
+    def __init__(self, sample_rate=16000, smoothing=0.3):
+        self.sample_rate = sample_rate
+        self.smoothing = smoothing
+        self.started_at = time.time()
+        self.processed_seconds = 0.0
+        self.inference_seconds = 0.0
+        self.chunks = 0
+        self.rtf = None
+
+    def record(self, audio_seconds, inference_seconds):
+        """Record one inference pass over audio_seconds of audio"""
+        self.processed_seconds += audio_seconds
+        self.inference_seconds += inference_seconds
+        self.chunks += 1
+        if audio_seconds > 0:
+            rtf = inference_seconds / audio_seconds
+            self.rtf = rtf if self.rtf is None else (self.smoothing * rtf + (1 - self.smoothing) * self.rtf)
+
+    def snapshot(self, ring, queued_seconds=0.0):
+        """Return current metrics; backlog counts buffered plus chunked-but-undecoded audio"""
+        backlog = ring.available() / self.sample_rate + queued_seconds
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "processed_seconds": round(self.processed_seconds, 1),
+            "backlog_seconds": round(backlog, 2),
+            "rtf": round(self.rtf, 3) if self.rtf is not None else None,
+            "overall_rtf": round(self.inference_seconds / self.processed_seconds, 3) if self.processed_seconds else None,
+            "chunks": self.chunks,
+            "dropped_seconds": round(ring.overflow_samples / self.sample_rate, 2)
+        }
+
+
+class AdaptivePolicy:
+    """Pick decoding settings from the current backlog.
+
+    Levels go from the configured model with full beam search down to greedy
+    decoding and then to smaller models. The policy steps down one level when
+    the backlog exceeds ``high_water`` seconds and back up when it drains below
+    ``low_water`` seconds.
+    """
+
+    def __init__(self, model_size, beam_size=5, high_water=10.0, low_water=2.0, min_model_size="base"):
+        self.high_water = high_water
+        self.low_water = low_water
+        self.levels = [(model_size, beam_size)]
+        if beam_size > 2:
+            self.levels.append((model_size, 2))
+        if beam_size > 1:
+            self.levels.append((model_size, 1))
+        if model_size in MODEL_SIZE_LADDER and min_model_size in MODEL_SIZE_LADDER:
+            start = MODEL_SIZE_LADDER.index(model_size) + 1
+            stop = MODEL_SIZE_LADDER.index(min_model_size) + 1
+            for smaller in MODEL_SIZE_LADDER[start:stop]:
+                if smaller not in ("large", "large-v2"):
+                    self.levels.append((smaller, 1))
+        self.level = 0
+
+    def choose(self, backlog_seconds):
+        """Return (model_size, beam_size) for the next chunk"""
+        if backlog_seconds > self.high_water and self.level < len(self.levels) - 1:
+            self.level += 1
+        elif backlog_seconds < self.low_water and self.level > 0:
+            self.level -= 1
+        return self.levels[self.level]
@@ -0,0 +1,106 @@
+from bisect import bisect_right
+from config import logger, DOCUMENT_DIR, TRANSCRIPT_DIR
+from modules.utils import sent_tokenize
+from modules.tracing import span
+from modules.storage import write_json_artifact, read_json_artifact
+
+# Bump when the sentence fields change; older documents are rebuilt on load
+DOCUMENT_VERSION = 1
+
+
+class Document:
+    """A transcript split into sentences once, shared by every notes and export path.
+
+    Each sentence is a dict with its text and lowercased text, character offsets
+    into the document text, the index range of the transcript segments it spans
+    with their start/end seconds, and its whitespace token count.
+    """
+
+    def __init__(self, text, sentences, language=None):
+        self.text = text
+        self.sentences = sentences
+        self.language = language
+
+    @classmethod
+    def build(cls, text, segments=None, language=None):
+        """Tokenize a transcript; segments, when given, give each sentence timestamps"""
+        with span("build_document", chars=len(text)):
+            # Segment boundaries as character offsets into the joined transcript text
+            segment_offsets = []
+            if segments:
+                offset = 0
+                parts = []
+                for segment in segments:
+                    part = segment.get("text", "").strip()
+                    segment_offsets.append(offset)
+                    parts.append(part)
+                    offset += len(part) + 1
+                joined = " ".join(parts)
+                if joined != text:
+                    # Text from elsewhere (e.g. edited) cannot be mapped back to segments
+                    logger.warning("Document text does not match its segments; sentences get no timestamps")
+                    segment_offsets = []
+
+            sentences = []
+            cursor = 0
+            for sentence in sent_tokenize(text):
+                start = text.find(sentence, cursor)
+                if start < 0:
+                    start = cursor
+                end = start + len(sentence)
+                cursor = end
+                entry = {
+                    "text": sentence,
+                    "lower": sentence.lower(),
+                    "start_char": start,
+                    "end_char": end,
+                    "tokens": len(sentence.split())
+                }
+                if segment_offsets:
+                    first = max(0, bisect_right(segment_offsets, start) - 1)
+                    last = max(first, bisect_right(segment_offsets, max(start, end - 1)) - 1)
+                    entry["segments"] = [first, last]
+                    entry["start"] = segments[first]["start"]
+                    entry["end"] = segments[last]["end"]
+                sentences.append(entry)
+        return cls(text, sentences, language)
+
+    @classmethod
+    def from_transcript(cls, transcript_data):
+        return cls.build(transcript_data.get("text", ""), transcript_data.get("segments"),
+                         transcript_data.get("language"))
+
+    @property
+    def sentence_texts(self):
+        return [sentence["text"] for sentence in self.sentences]
+
+    def to_dict(self):
+        return {"version": DOCUMENT_VERSION, "language": self.language, "text": self.text,
+                "sentences": self.sentences}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["text"], data["sentences"], data.get("language"))
+
+
+def save_document(job_id, document):
+    # Documents are internal, so they are not precompressed for HTTP
+    return write_json_artifact(DOCUMENT_DIR, job_id, document.to_dict(), precompress=False)
+
+
+def load_document(job_id, transcript_data=None):
+    """Return a job's document, building and saving it if it is missing or outdated"""
+    try:
+        data = read_json_artifact(DOCUMENT_DIR, job_id)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Job {job_id}: unreadable document, rebuilding - {str(e)}")
+        data = None
+    if data is not None and data.get("version") == DOCUMENT_VERSION:
+        return Document.from_dict(data)
+    if transcript_data is None:
+        transcript_data = read_json_artifact(TRANSCRIPT_DIR, job_id)
+        if transcript_data is None:
+            return None
+    document = Document.from_transcript(transcript_data)
+    save_document(job_id, document)
+    return document
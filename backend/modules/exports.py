@@ -0,0 +1,166 @@
+import os
+import uuid
+from config import logger, EXPORT_DIR, TRANSCRIPT_DIR
+from modules.segment_log import iter_segments, segment_log_exists, read_log_metadata
+from modules.storage import artifact_path, read_json_artifact
+from modules.document import load_document
+
+# Export formats and their mimetypes
+EXPORT_FORMATS = {
+    "srt": "application/x-subrip",
+    "vtt": "text/vtt",
+    "txt": "text/plain",
+    "md": "text/markdown"
+}
+
+# Plain-text and Markdown exports start a new paragraph after this much audio
+PARAGRAPH_SECONDS = 60
+
+
+def _cue_time(seconds, separator):
+    millis = int(round(max(0.0, seconds) * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def _clock(seconds):
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def _cue_text(text):
+    # A blank line or "-->" inside a cue would end or corrupt it
+    return " ".join(text.split()).replace("-->", "->")
+
+
+def _srt(segments, meta):
+    for index, segment in enumerate(segments, 1):
+        yield (f"{index}\n{_cue_time(segment['start'], ',')} --> {_cue_time(segment['end'], ',')}\n"
+               f"{_cue_text(segment['text'])}\n\n")
+
+
+def _vtt(segments, meta):
+    yield "WEBVTT\n\n"
+    for segment in segments:
+        yield (f"{_cue_time(segment['start'], '.')} --> {_cue_time(segment['end'], '.')}\n"
+               f"{_cue_text(segment['text'])}\n\n")
+
+
+def _paragraphs(segments):
+    """Group segments into (start seconds, text) paragraphs of about PARAGRAPH_SECONDS"""
+    start = None
+    parts = []
+    for segment in segments:
+        if start is not None and segment["start"] - start >= PARAGRAPH_SECONDS:
+            yield start, " ".join(parts)
+            start, parts = None, []
+        if start is None:
+            start = segment["start"]
+        parts.append(segment["text"].strip())
+    if parts:
+        yield start, " ".join(parts)
+
+
+def _txt(segments, meta):
+    for _, text in _paragraphs(segments):
+        yield text + "\n\n"
+
+
+def _md(segments, meta):
+    yield f"# {meta.get('title') or 'Transcript'}\n\n"
+    details = [value for value in (meta.get("channel"), meta.get("youtube_url")) if value]
+    if details:
+        yield " · ".join(details) + "\n\n"
+    for start, text in _paragraphs(segments):
+        yield f"**[{_clock(start)}]** {text}\n\n"
+
+
+_WRITERS = {"srt": _srt, "vtt": _vtt, "txt": _txt, "md": _md}
+
+
+def export_path(job_id, fmt):
+    return os.path.join(EXPORT_DIR, f"{job_id}.{fmt}")
+
+
+def cached_export(job_id, fmt):
+    """Path of an export that is still current for the saved transcript, or None"""
+    path = export_path(job_id, fmt)
+    source = artifact_path(TRANSCRIPT_DIR, job_id)
+    try:
+        if source is not None and os.path.getmtime(path) >= os.path.getmtime(source):
+            return path
+    except OSError:
+        pass
+    return None
+
+
+# Formats whose cues carry their own timings; these always use the engine's segments
+TIMED_FORMATS = ("srt", "vtt")
+
+
+def _source(job_id, fmt):
+    """(cues iterator, metadata, final) for a job, or None when it has no transcript yet.
+
+    A running job's segments are read from its segment log one record at a time.
+    Subtitles of a finished job keep the engine's segments as cues: a sentence
+    spans whole segments, so its timing would overlap its neighbours'. Text and
+    Markdown use the sentences of its shared document, so paragraphs break where
+    the notes' sentences do; segments are the fallback when the document has no
+    timestamps.
+    """
+    final = artifact_path(TRANSCRIPT_DIR, job_id) is not None
+    if not final:
+        if segment_log_exists(job_id):
+            return iter_segments(job_id), read_log_metadata(job_id), False
+        return None
+    transcript = read_json_artifact(TRANSCRIPT_DIR, job_id)
+    if transcript is None:
+        return None
+    document = None
+    if fmt not in TIMED_FORMATS and "text" in transcript:
+        try:
+            document = load_document(job_id, transcript)
+        except Exception as e:
+            logger.warning(f"Job {job_id}: exporting segments, the document could not be built - {str(e)}")
+    if document is not None and document.sentences and "start" in document.sentences[0]:
+        return iter(document.sentences), transcript, True
+    return iter(transcript.get("segments", [])), transcript, True
+
+
+def stream_export(job_id, fmt):
+    """Generator of a job's export in fmt, or None when the job has no segments.
+
+    Finished transcripts are written to EXPORT_DIR as they stream, so the next
+    request is served from that file; a download cut short leaves no cache behind.
+    """
+    source = _source(job_id, fmt)
+    if source is None:
+        return None
+    segments, meta, final = source
+    chunks = _WRITERS[fmt](segments, meta)
+    if not final:
+        # A running job's export grows with every segment; never cache it
+        return chunks
+    return _caching(chunks, export_path(job_id, fmt))
+
+
+def _caching(chunks, path):
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    complete = False
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        complete = True
+    finally:
+        try:
+            if complete:
+                os.replace(temp_path, path)
+            else:
+                os.remove(temp_path)
+        except OSError as e:
+            logger.warning(f"Could not finish export cache {path}: {str(e)}")
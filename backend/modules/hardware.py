@@ -0,0 +1,157 @@
+import os
+import threading
+from config import logger
+import config
+
+# Compute types in order of preference for each device
+CUDA_COMPUTE_TYPES = ["float16", "int8_float16", "int8", "float32"]
+CPU_COMPUTE_TYPES = ["int8", "int8_float32", "float32"]
+# Int8 weights with float16 activations, for latency-bound callers such as live captioning
+QUANTIZED_CUDA_COMPUTE_TYPES = ["int8_float16", "int8", "float16", "float32"]
+
+_lock = threading.Lock()
+_profile = None
+_torch_threads_applied = False
+
+
+def _available_cpus():
+    """CPUs this process may run on, honouring affinity masks and container limits"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def detect_hardware():
+    """Probe CUDA devices and supported CTranslate2 compute types"""
+    info = {
+        "cpus": _available_cpus(),
+        "cuda_devices": 0,
+        "gpu_name": None,
+        "compute_types": {"cpu": [], "cuda": []},
+        "probe": None
+    }
+    try:
+        # CTranslate2 answers without initializing a CUDA context, so prefer it over torch
+        import ctranslate2
+        info["probe"] = "ctranslate2"
+        info["cuda_devices"] = ctranslate2.get_cuda_device_count()
+        info["compute_types"]["cpu"] = sorted(ctranslate2.get_supported_compute_types("cpu"))
+        if info["cuda_devices"]:
+            info["compute_types"]["cuda"] = sorted(ctranslate2.get_supported_compute_types("cuda"))
+    except ImportError:
+        pass
+    try:
+        import torch
+        info["probe"] = info["probe"] or "torch"
+        if torch.cuda.is_available():
+            info["cuda_devices"] = max(info["cuda_devices"], torch.cuda.device_count())
+            info["gpu_name"] = torch.cuda.get_device_name(0)
+    except ImportError:
+        pass
+    return info
+
+
+def _pick_compute_type(preferences, supported):
+    if not supported:
+        return preferences[0]
+    for compute_type in preferences:
+        if compute_type in supported:
+            return compute_type
+    return "default"
+
+
+def build_profile(hardware):
+    """Choose device, compute type and thread counts for every engine"""
+    requested = config.EXECUTION_DEVICE
+    use_cuda = hardware["cuda_devices"] > 0 if requested == "auto" else requested == "cuda"
+    device = "cuda" if use_cuda else "cpu"
+    cpus = hardware["cpus"]
+
+    if use_cuda:
+        compute_type = _pick_compute_type(CUDA_COMPUTE_TYPES, hardware["compute_types"]["cuda"])
+        # The GPU does the heavy lifting; a few CPU threads feed it
+        num_workers = 2
+        cpu_threads = min(4, cpus)
+    else:
+        compute_type = _pick_compute_type(CPU_COMPUTE_TYPES, hardware["compute_types"]["cpu"])
+        # One worker per 8 cores, with the cores split evenly between them
+        num_workers = max(1, cpus // 8)
+        cpu_threads = max(1, cpus // num_workers)
+
+    compute_type = config.EXECUTION_COMPUTE_TYPE or compute_type
+    cpu_threads = config.EXECUTION_CPU_THREADS or cpu_threads
+    num_workers = config.EXECUTION_NUM_WORKERS or num_workers
+
+    return {
+        "device": device,
+        "hardware": hardware,
+        "faster_whisper": {
+            "device": device,
+            "compute_type": compute_type,
+            "cpu_threads": cpu_threads,
+            "num_workers": num_workers
+        },
+        "whisper": {
+            "device": device,
+            "fp16": use_cuda
+        },
+        "summarizer": {
+            "device": 0 if use_cuda else -1
+        },
+        "torch": {
+            "intra_op_threads": cpus if use_cuda else cpu_threads,
+            "inter_op_threads": 1 if not use_cuda else None
+        }
+    }
+
+
+def peek_execution_profile():
+    """Return the execution profile if this process has already detected it, without probing"""
+    with _lock:
+        return _profile
+
+
+def published_profiles():
+    """Execution profiles the live inference processes publish with their heartbeats, by process name"""
+    from modules import job_queue
+    return {worker["name"]: worker["profile"] for worker in job_queue.live_workers() if worker.get("profile")}
+
+
+def get_execution_profile():
+    """Return the execution profile, detecting the hardware on first use"""
+    global _profile
+    with _lock:
+        if _profile is None:
+            _profile = build_profile(detect_hardware())
+            fw = _profile["faster_whisper"]
+            logger.info(f"Execution profile: {fw['device']} {fw['compute_type']}, "
+                        f"{fw['cpu_threads']} threads x {fw['num_workers']} workers")
+        return _profile
+
+
+def faster_whisper_kwargs(quantized=False):
+    """Keyword arguments for faster_whisper.WhisperModel"""
+    profile = get_execution_profile()
+    settings = dict(profile["faster_whisper"])
+    if quantized and settings["device"] == "cuda" and not config.EXECUTION_COMPUTE_TYPE:
+        settings["compute_type"] = _pick_compute_type(QUANTIZED_CUDA_COMPUTE_TYPES,
+                                                      profile["hardware"]["compute_types"]["cuda"])
+    return settings
+
+
+def apply_torch_threads():
+    """Set torch's thread pools from the profile once per process"""
+    global _torch_threads_applied
+    if _torch_threads_applied:
+        return
+    import torch
+    settings = get_execution_profile()["torch"]
+    torch.set_num_threads(settings["intra_op_threads"])
+    if settings["inter_op_threads"]:
+        try:
+            torch.set_num_interop_threads(settings["inter_op_threads"])
+        except RuntimeError:
+            # Only allowed before any parallel work has run
+            pass
+    _torch_threads_applied = True
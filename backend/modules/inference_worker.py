@@ -0,0 +1,116 @@
+import os
+import time
+import socket
+import threading
+from config import (logger, active_jobs, WORKER_SLOTS, WARMUP_ON_STARTUP, STORAGE_SWEEP_SECONDS,
+                    QUEUE_POLL_SECONDS, LEASE_SECONDS, BROKER_URL, METRICS_DIR, METRICS_EXPORT_SECONDS)
+from modules import job_queue
+from modules.metrics import start_metrics_export
+from modules.cancellation import request_cancel, clear_cancel, cancel_reason, PREEMPTED, LEASE_LOST
+
+# Jobs running in this process (job_id -> worker holding the lease), heartbeated to the queue
+_running = {}
+_running_lock = threading.Lock()
+
+
+def _slot_loop(worker):
+    from modules.transcription import process_video
+    while True:
+        try:
+            job = job_queue.claim(worker)
+        except Exception as e:
+            logger.error(f"{worker}: Could not claim a job - {str(e)}", exc_info=True)
+            job = None
+        if job is None:
+            time.sleep(QUEUE_POLL_SECONDS)
+            continue
+
+        job_id = job["job_id"]
+        # The HTTP process that accepted the job wrote its record; take it over
+        active_jobs.refresh(job_id)
+        with _running_lock:
+            _running[job_id] = worker
+        try:
+            process_video(job["url"], job_id, job["language"])
+        except Exception as e:
+            logger.error(f"Job {job_id}: Worker failed - {str(e)}", exc_info=True)
+        finally:
+            with _running_lock:
+                _running.pop(job_id, None)
+            lost = cancel_reason(job_id) == LEASE_LOST
+            clear_cancel(job_id)
+
+        if lost:
+            # Another worker holds the job now; its queue entry is not ours to release
+            continue
+        preempted = active_jobs.get(job_id, {}).get("status") == PREEMPTED
+        if preempted:
+            # Resumes from the segment log once a slot is free
+            active_jobs.update(job_id, status="queued")
+        try:
+            job_queue.release(job_id, worker, requeue=preempted)
+        except Exception as e:
+            # The lease runs out and the queue takes the job back
+            logger.error(f"Job {job_id}: Could not release the job - {str(e)}")
+
+
+def _heartbeat(name):
+    """Renew the leases of this process's jobs and forward stop requests to their safe points.
+
+    Every beat also publishes the process's warm-up state for /api/ready and its
+    execution profile for /api/config.
+    """
+    from modules.warmup import get_readiness
+    from modules.hardware import get_execution_profile
+    renewed_at = {}
+    while True:
+        with _running_lock:
+            running = dict(_running)
+        now = time.time()
+        beats = {job_id: {"worker": worker, "progress": active_jobs.get(job_id, {}).get("status"),
+                          "estimated_seconds": active_jobs.get(job_id, {}).get("estimated_seconds")}
+                 for job_id, worker in running.items()}
+        try:
+            answers = job_queue.heartbeat(beats, {"name": name, "slots": WORKER_SLOTS,
+                                                        "readiness": get_readiness(),
+                                                        "profile": get_execution_profile()})
+            for job_id in beats:
+                if answers.get(job_id) != LEASE_LOST:
+                    renewed_at[job_id] = now
+            for job_id, reason in answers.items():
+                request_cancel(job_id, reason)
+        except Exception as e:
+            logger.warning(f"Could not renew job leases: {str(e)}")
+        for job_id in list(renewed_at):
+            if job_id not in running:
+                del renewed_at[job_id]
+            elif now - renewed_at[job_id] > LEASE_SECONDS:
+                # Unrenewed for a whole lease: the job may already be running elsewhere
+                request_cancel(job_id, LEASE_LOST)
+        for job_id in running:
+            renewed_at.setdefault(job_id, now)
+        time.sleep(QUEUE_POLL_SECONDS)
+
+
+def run_inference_worker(index=0):
+    """Entry point of an inference worker process: load models, then run jobs from the shared queue"""
+    from modules.warmup import start_warmup, wait_for_warmup
+    from modules.storage import start_storage_sweeper
+    # Worker names identify lease holders across every node sharing the queue
+    name = f"{socket.gethostname()}-inference-{index}-{os.getpid()}"
+    logger.info(f"{name}: Starting with {WORKER_SLOTS} job slots")
+    start_metrics_export(METRICS_DIR, METRICS_EXPORT_SECONDS)
+    if WARMUP_ON_STARTUP:
+        start_warmup()
+    if STORAGE_SWEEP_SECONDS and index == 0 and not BROKER_URL:
+        # One sweeper is enough; the storage it maintains is shared, and remote nodes leave it to the API host
+        start_storage_sweeper()
+    heartbeat = threading.Thread(target=_heartbeat, args=(name,), name="heartbeat", daemon=True)
+    heartbeat.start()
+    if WARMUP_ON_STARTUP:
+        # Jobs load models on demand too; claiming before warm-up ends would race it for the same model
+        readiness = wait_for_warmup()
+        logger.info(f"{name}: Warm-up finished, {'ready' if readiness['ready'] else 'not ready'}")
+    for slot in range(WORKER_SLOTS):
+        threading.Thread(target=_slot_loop, args=(f"{name}/{slot}",), name=f"job-worker-{slot}", daemon=True).start()
+    heartbeat.join()
@@ -0,0 +1,424 @@
+import json
+import time
+import sqlite3
+import threading
+import urllib.request
+from contextlib import contextmanager
+from config import logger, active_jobs, QUEUE_DB, LEASE_SECONDS, BROKER_URL, BROKER_TOKEN, WORKER_SLOTS
+from modules.cancellation import LEASE_LOST
+
+# Shared queue between HTTP processes and inference worker processes (serving mode only;
+# the dev server uses the in-process queue in modules.scheduler)
+#
+# The queue lives in a broker. SQLiteBroker is embedded: every process on the host
+# opens the same database. Inference nodes on other hosts use HTTPBroker, which
+# sends claims, heartbeats and releases to an API process's /api/broker routes.
+#
+# A claimed job is leased to its worker for LEASE_SECONDS. Workers heartbeat their
+# running jobs; a job whose lease runs out (its node died or lost the network) is
+# put back in the queue by the next claim and resumes from its segment log.
+
+# Job statuses that mean a worker was processing the job
+RUNNING_STATES = ("downloading", "transcribing", "generating_notes")
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS queue (
+    job_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    language TEXT,
+    priority TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    sequence INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    cancel TEXT,
+    enqueued_at REAL,
+    started_at REAL,
+    lease_expires REAL,
+    heartbeat_at REAL,
+    progress TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    estimated_seconds REAL
+)"""
+
+# Inference processes, their job slots, warm-up state and execution profile, refreshed by every heartbeat and claim
+WORKERS_SCHEMA = """CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    readiness TEXT,
+    seen_at REAL,
+    slots INTEGER,
+    profile TEXT
+)"""
+
+# Columns added after the first release, for queue databases created before them
+MIGRATIONS = {
+    "lease_expires": "ALTER TABLE queue ADD COLUMN lease_expires REAL",
+    "heartbeat_at": "ALTER TABLE queue ADD COLUMN heartbeat_at REAL",
+    "progress": "ALTER TABLE queue ADD COLUMN progress TEXT",
+    "attempts": "ALTER TABLE queue ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+    "estimated_seconds": "ALTER TABLE queue ADD COLUMN estimated_seconds REAL"
+}
+WORKER_MIGRATIONS = {
+    "slots": "ALTER TABLE workers ADD COLUMN slots INTEGER",
+    "profile": "ALTER TABLE workers ADD COLUMN profile TEXT"
+}
+
+
+class SQLiteBroker:
+    """Embedded broker: one SQLite database shared by the processes of a host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        """Return this thread's connection; transactions are explicit (BEGIN IMMEDIATE)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(SCHEMA)
+            conn.execute(WORKERS_SCHEMA)
+            for table, migrations in (("queue", MIGRATIONS), ("workers", WORKER_MIGRATIONS)):
+                columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for column, statement in migrations.items():
+                    if column not in columns:
+                        try:
+                            conn.execute(statement)
+                        except sqlite3.OperationalError:
+                            pass  # Another process added it first
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT, so claims and cancels never interleave across processes"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _capacity(self, conn, since):
+        # Processes from before the slots column count with this process's slot setting
+        return conn.execute("SELECT COALESCE(SUM(COALESCE(slots, ?)), 0) FROM workers WHERE seen_at >= ?",
+                            (WORKER_SLOTS, since)).fetchone()[0]
+
+    def _work(self, conn, now, live_since):
+        # Running jobs count what is left of their estimate; reservations only while their request is alive
+        return conn.execute(
+            "SELECT COALESCE(SUM(CASE WHEN state = 'running' "
+            "THEN MAX(0, COALESCE(estimated_seconds, 0) - (? - started_at)) "
+            "ELSE COALESCE(estimated_seconds, 0) END), 0) FROM queue "
+            "WHERE state IN ('queued', 'running') OR (state = 'reserved' AND cancel IS NULL AND enqueued_at >= ?)",
+            (now, live_since)).fetchone()[0]
+
+    def reserve(self, job_id, youtube_url, priority, rank, estimated_seconds, live_since, decide):
+        """Hold a place for a job when decide(outstanding work, live slots) admits it; returns decide's answer.
+
+        The check and the reserved row share one transaction, so concurrent requests
+        on any process see each other's reservations.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            verdict = decide(self._work(conn, now, live_since), self._capacity(conn, live_since))
+            if verdict[0]:
+                conn.execute(
+                    "INSERT OR REPLACE INTO queue (job_id, url, priority, rank, sequence, state, enqueued_at, "
+                    "estimated_seconds) VALUES (?, ?, ?, ?, 0, 'reserved', ?, ?)",
+                    (job_id, youtube_url, priority, rank, now, estimated_seconds))
+        return verdict
+
+    def work(self, live_since):
+        return self._work(self._connect(), time.time(), live_since)
+
+    def enqueue(self, job_id, youtube_url, language, priority, rank, sequence=None, live_since=None,
+                estimated_seconds=None):
+        with self._transaction() as conn:
+            reserved = conn.execute("SELECT cancel FROM queue WHERE job_id = ? AND state = 'reserved'",
+                                    (job_id,)).fetchone()
+            if reserved is not None and reserved["cancel"]:
+                # Cancelled between admission and submission; replacing the row would revive it
+                conn.execute("DELETE FROM queue WHERE job_id = ?", (job_id,))
+                return None
+            if sequence is None:
+                sequence = conn.execute("SELECT COALESCE(MAX(sequence), 0) + 1 FROM queue").fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO queue (job_id, url, language, priority, rank, sequence, state, enqueued_at, "
+                "estimated_seconds) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, youtube_url, language, priority, rank, sequence, time.time(), estimated_seconds)
+            )
+            if rank == 0 and live_since is not None:
+                # Capacity is what the heartbeating workers offer now, not what the deployment was sized for
+                capacity = self._capacity(conn, live_since)
+                running = conn.execute("SELECT COUNT(*) FROM queue WHERE state = 'running'").fetchone()[0]
+                if capacity and running >= capacity:
+                    victim = conn.execute(
+                        "SELECT job_id FROM queue WHERE state = 'running' AND rank > 0 AND cancel IS NULL "
+                        "ORDER BY started_at DESC LIMIT 1").fetchone()
+                    if victim is not None:
+                        logger.info(f"Job {victim['job_id']}: Preempting bulk job for interactive work")
+                        conn.execute("UPDATE queue SET cancel = 'preempted' WHERE job_id = ?", (victim["job_id"],))
+        return sequence
+
+    def reclaim_expired(self, now=None):
+        """Requeue running jobs whose lease ran out; returns (requeued, dropped) job IDs.
+
+        Jobs that were being cancelled when their worker vanished are dropped instead.
+        """
+        now = now or time.time()
+        expired = ("SELECT job_id, worker, cancel FROM queue WHERE state = 'running' "
+                   "AND (lease_expires IS NULL OR lease_expires < ?)")
+        # Checked without the write lock first; this runs on every claim poll
+        conn = self._connect()
+        abandoned = "FROM queue WHERE state = 'reserved' AND enqueued_at < ?"
+        if conn.execute("SELECT job_id " + abandoned + " LIMIT 1", (now - LEASE_SECONDS,)).fetchone():
+            # Reservations whose request never enqueued the job, e.g. because its process died
+            with self._transaction() as conn:
+                conn.execute("DELETE " + abandoned, (now - LEASE_SECONDS,))
+        if conn.execute(expired + " LIMIT 1", (now,)).fetchone() is None:
+            return [], []
+        with self._transaction() as conn:
+            rows = conn.execute(expired, (now,)).fetchall()
+            requeued, dropped = [], []
+            for row in rows:
+                if row["cancel"] == "cancelled":
+                    conn.execute("DELETE FROM queue WHERE job_id = ?", (row["job_id"],))
+                    dropped.append(row["job_id"])
+                else:
+                    conn.execute("UPDATE queue SET state = 'queued', worker = NULL, cancel = NULL, started_at = NULL, "
+                                 "lease_expires = NULL WHERE job_id = ?", (row["job_id"],))
+                    requeued.append(row["job_id"])
+                logger.warning(f"Job {row['job_id']}: Lease of {row['worker']} expired")
+        return requeued, dropped
+
+    def claim(self, worker, lease_seconds):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM queue WHERE state = 'queued' ORDER BY rank, sequence LIMIT 1").fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE queue SET state = 'running', worker = ?, started_at = ?, cancel = NULL, "
+                         "lease_expires = ?, heartbeat_at = ?, progress = NULL, attempts = attempts + 1 "
+                         "WHERE job_id = ?", (worker, now, now + lease_seconds, now, row["job_id"]))
+            # Slot workers are named <process>/<slot>; claiming proves the process is alive
+            conn.execute("UPDATE workers SET seen_at = ? WHERE name = ?", (now, worker.rsplit("/", 1)[0]))
+        return dict(row)
+
+    def heartbeat(self, jobs, lease_seconds, process=None):
+        now = time.time()
+        answers = {}
+        with self._transaction() as conn:
+            if process is not None:
+                conn.execute("INSERT OR REPLACE INTO workers (name, readiness, seen_at, slots, profile) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             (process["name"], json.dumps(process.get("readiness")), now, process.get("slots"),
+                              json.dumps(process.get("profile"))))
+            for job_id, beat in jobs.items():
+                renewed = conn.execute(
+                    "UPDATE queue SET lease_expires = ?, heartbeat_at = ?, progress = ?, "
+                    "estimated_seconds = COALESCE(?, estimated_seconds) "
+                    "WHERE job_id = ? AND worker = ? AND state = 'running'",
+                    (now + lease_seconds, now, beat.get("progress"), beat.get("estimated_seconds"), job_id,
+                     beat["worker"])).rowcount
+                if not renewed:
+                    answers[job_id] = LEASE_LOST
+                    continue
+                cancel = conn.execute("SELECT cancel FROM queue WHERE job_id = ?", (job_id,)).fetchone()["cancel"]
+                if cancel:
+                    answers[job_id] = cancel
+        return answers
+
+    def release(self, job_id, worker=None, requeue=False):
+        owner = " AND worker = ?" if worker else ""
+        params = (job_id, worker) if worker else (job_id,)
+        with self._transaction() as conn:
+            if requeue:
+                conn.execute("UPDATE queue SET state = 'queued', worker = NULL, cancel = NULL, started_at = NULL, "
+                             f"lease_expires = NULL WHERE job_id = ?{owner}", params)
+            else:
+                conn.execute(f"DELETE FROM queue WHERE job_id = ?{owner}", params)
+
+    def cancel(self, job_id):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT state FROM queue WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["state"] == "queued":
+                conn.execute("DELETE FROM queue WHERE job_id = ?", (job_id,))
+                return "cancelled"
+            if row["state"] == "reserved":
+                # Kept until enqueue() so the submission sees the cancellation and drops the job
+                conn.execute("UPDATE queue SET cancel = 'cancelled' WHERE job_id = ?", (job_id,))
+                return "cancelled"
+            conn.execute("UPDATE queue SET cancel = 'cancelled' WHERE job_id = ?", (job_id,))
+            return "cancelling"
+
+    def rows(self):
+        return [dict(row) for row in self._connect().execute("SELECT * FROM queue ORDER BY rank, sequence")]
+
+    def workers(self, since):
+        rows = self._connect().execute("SELECT * FROM workers WHERE seen_at >= ? ORDER BY name", (since,))
+        return [dict(row, readiness=json.loads(row["readiness"] or "null"), profile=json.loads(row["profile"] or "null"))
+                for row in rows]
+
+    def capacity(self, since):
+        return self._capacity(self._connect(), since)
+
+
+class HTTPBroker:
+    """Broker client for inference nodes on other hosts; an API process answers from its own broker"""
+
+    def __init__(self, url, token=""):
+        self.url = url
+        self.token = token
+
+    def _call(self, action, payload):
+        request = urllib.request.Request(
+            f"{self.url}/api/broker/{action}", data=json.dumps(payload).encode('utf-8'), method="POST",
+            headers={"Content-Type": "application/json", "X-Broker-Token": self.token})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.loads(response.read())
+
+    def claim(self, worker, lease_seconds):
+        return self._call("claim", {"worker": worker})["job"]
+
+    def heartbeat(self, jobs, lease_seconds, process=None):
+        return self._call("heartbeat", {"jobs": jobs, "process": process})["answers"]
+
+    def release(self, job_id, worker=None, requeue=False):
+        self._call("release", {"job_id": job_id, "worker": worker, "requeue": requeue})
+
+    def close(self):
+        pass
+
+    def _api_only(self, *args, **kwargs):
+        raise RuntimeError("Queue administration runs in API processes; this node only runs jobs")
+
+    enqueue = reserve = cancel = reclaim_expired = rows = workers = capacity = work = _api_only
+
+
+_broker = HTTPBroker(BROKER_URL, BROKER_TOKEN) if BROKER_URL else SQLiteBroker(QUEUE_DB)
+
+
+def get_broker():
+    return _broker
+
+
+def close():
+    """Close this thread's broker connection"""
+    _broker.close()
+
+
+def enqueue(job_id, youtube_url, language, priority, rank, sequence=None, estimated_seconds=None):
+    """Add or requeue a job, replacing its reservation; an interactive job that would wait preempts the newest bulk job.
+
+    Whether it would wait is judged against the slots of the workers that heartbeated
+    within the last lease period, in the same transaction as the insert. Returns the
+    job's sequence, or None when it was cancelled while reserved and is not queued.
+    """
+    return _broker.enqueue(job_id, youtube_url, language, priority, rank, sequence, time.time() - LEASE_SECONDS,
+                           estimated_seconds)
+
+
+def reserve(job_id, youtube_url, priority, rank, estimated_seconds, decide):
+    """Atomically check admission and hold the job's place until enqueue(); see SQLiteBroker.reserve"""
+    return _broker.reserve(job_id, youtube_url, priority, rank, estimated_seconds, time.time() - LEASE_SECONDS,
+                           decide)
+
+
+def outstanding_work():
+    """Estimated worker seconds of every reserved, queued and running job"""
+    return _broker.work(time.time() - LEASE_SECONDS)
+
+
+def reclaim_expired():
+    """Requeue jobs whose worker stopped heartbeating; returns how many were requeued"""
+    requeued, dropped = _broker.reclaim_expired()
+    for job_id in dropped:
+        job = active_jobs.load(job_id)
+        if job is not None and job.get("status") in RUNNING_STATES + ("queued",):
+            # Its worker died before it could record the cancellation
+            active_jobs.update(job_id, status="cancelled")
+    for job_id in requeued:
+        job = active_jobs.load(job_id)
+        if job is not None and job.get("status") in RUNNING_STATES:
+            active_jobs.update(job_id, status="preempted")
+            active_jobs.update(job_id, status="queued")
+    return len(requeued)
+
+
+def job_ids():
+    """IDs of every reserved, queued or running job"""
+    return {row["job_id"] for row in _broker.rows()}
+
+
+def claim(worker):
+    """Atomically take the highest-priority queued job under a lease, or None when the queue is empty.
+
+    Expired leases are reclaimed first, so a dead node's jobs need no separate reaper.
+    """
+    if not isinstance(_broker, HTTPBroker):
+        reclaim_expired()
+    return _broker.claim(worker, LEASE_SECONDS)
+
+
+def heartbeat(jobs, process=None):
+    """Renew the leases of running jobs ({job_id: {"worker", "progress", "estimated_seconds"}}).
+
+    process ({"name", "slots", "readiness", "profile"}) records the calling inference process as alive.
+    Returns {job_id: reason} for jobs that must stop: "cancelled", "preempted",
+    or LEASE_LOST when the job was reclaimed and now belongs to another worker.
+    """
+    if not jobs and process is None:
+        return {}
+    return _broker.heartbeat(jobs, LEASE_SECONDS, process)
+
+
+def live_workers():
+    """Inference processes that heartbeated within the last lease period, with their warm-up state and profile"""
+    return _broker.workers(time.time() - LEASE_SECONDS)
+
+
+def worker_capacity():
+    """Job slots of the inference processes that heartbeated within the last lease period"""
+    return _broker.capacity(time.time() - LEASE_SECONDS)
+
+
+def release(job_id, worker=None, requeue=False):
+    """Drop a finished job, or put a preempted one back in its original place.
+
+    With worker given, nothing happens unless that worker still holds the job.
+    """
+    _broker.release(job_id, worker, requeue)
+
+
+def cancel(job_id):
+    """Remove a queued job or flag a running one; returns "cancelled", "cancelling" or None"""
+    return _broker.cancel(job_id)
+
+
+def snapshot():
+    """Queued and running jobs, in the same shape as scheduler.queue_snapshot()"""
+    rows = _broker.rows()
+    return {
+        "slots": worker_capacity(),
+        "running": [{"job_id": row["job_id"], "priority": row["priority"], "started_at": row["started_at"],
+                     "worker": row["worker"], "heartbeat_at": row["heartbeat_at"],
+                     "lease_expires": row["lease_expires"], "progress": row["progress"],
+                     "attempts": row["attempts"]} for row in rows if row["state"] == "running"],
+        "queued": [{"job_id": row["job_id"], "priority": row["priority"]}
+                   for row in rows if row["state"] == "queued"]
+    }
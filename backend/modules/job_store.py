@@ -0,0 +1,360 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from modules.metrics import STATE_EVICTIONS
+
+# Jobs in these states can leave memory; their record stays on disk
+TERMINAL_STATES = ("complete", "error", "cancelled")
+# Large per-job data that already has its own file (traces/<job_id>.json); changed only through amend()
+TRANSIENT_KEYS = ("trace", "profiles")
+
+# Status changes a job may make; staying in the same status is always allowed
+TRANSITIONS = {
+    "queued": {"downloading", "cancelled", "error"},
+    "downloading": {"transcribing", "error", "cancelled", "preempted"},
+    "transcribing": {"generating_notes", "error", "cancelled", "preempted"},
+    "generating_notes": {"complete", "error", "cancelled", "preempted"},
+    "preempted": {"queued", "cancelled", "error"},
+    "live": {"complete", "error"},
+    "error": {"queued"},
+    "cancelled": {"queued"},
+    "complete": set()
+}
+
+
+class InvalidTransition(ValueError):
+    """Raised when an update would move a job to a status it cannot reach"""
+
+
+class JobStore(dict):
+    """In-memory job table with atomic, versioned updates and TTL eviction.
+
+    Job records are copy-on-write: update() builds a new dict with the next
+    version and swaps it in under the store lock, so a record obtained from
+    get() or snapshot() is never modified afterwards and readers need no lock.
+    Traces and profiles are published the same way, through amend().
+
+    Finished jobs are evicted after the TTL, or oldest first above max_jobs
+    records or max_bytes of records (measured by their JSON size), and written
+    to jobs_dir first so load() can still return them. Running jobs are never
+    evicted, so both caps are soft.
+
+    With shared=True every write also goes to jobs_dir, and reads pick up
+    newer versions written by other processes. Each job has one writer at a
+    time (the process that created it, then the inference worker running it),
+    so the version number is enough to tell which copy is newer.
+    """
+
+    def __init__(self, jobs_dir, ttl=3600, max_jobs=1000, max_bytes=None, sweep_interval=60, on_evict=None,
+                 shared=False):
+        super().__init__()
+        self.jobs_dir = jobs_dir
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        self._sizes = {}
+        self.total_bytes = 0
+        self.sweep_interval = sweep_interval
+        self.on_evict = on_evict
+        self.shared = shared
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._snapshot = (0, ())
+        self._last_sweep = time.time()
+        # Pick up jobs other processes created up to one TTL before this one started
+        self._last_sync = time.time() - ttl
+
+    def __setitem__(self, job_id, job):
+        self.create(job_id, **job)
+
+    def __delitem__(self, job_id):
+        with self._lock:
+            super().__delitem__(job_id)
+            self._generation += 1
+            self.total_bytes -= self._sizes.pop(job_id, 0)
+
+    def pop(self, job_id, *default):
+        with self._lock:
+            self._generation += 1
+            self.total_bytes -= self._sizes.pop(job_id, 0)
+            return super().pop(job_id, *default)
+
+    def _store(self, job_id, record):
+        """Swap in a record and account for its approximate size; caller holds the lock"""
+        super().__setitem__(job_id, record)
+        self._generation += 1
+        size = len(json.dumps(record, default=str))
+        self.total_bytes += size - self._sizes.get(job_id, 0)
+        self._sizes[job_id] = size
+
+    def _over_capacity(self):
+        return len(self) > self.max_jobs or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+
+    def create(self, job_id, **fields):
+        """Insert a new record for job_id, replacing any previous one.
+
+        A replacement continues from the highest version in memory or on disk,
+        so other processes still holding the old record take the new one.
+        """
+        on_disk = self._read(job_id) if self.shared or job_id not in self else None
+        with self._lock:
+            current = dict.get(self, job_id)
+            version = max((current or {}).get("version", 0), (on_disk or {}).get("version", 0)) + 1
+            record = dict(fields, version=version, updated_at=time.time())
+            is_new = current is None
+            self._store(job_id, record)
+            if self.shared:
+                self.persist(job_id, record)
+        if is_new:
+            if self._over_capacity():
+                self.enforce_capacity()
+            if time.time() - self._last_sweep > self.sweep_interval:
+                self.evict_expired()
+        return record
+
+    def update(self, job_id, **fields):
+        """Atomically apply fields to a job and return the new record.
+
+        Raises KeyError for unknown jobs and InvalidTransition for a status the
+        job cannot move to from its current one.
+        """
+        with self._lock:
+            if self.shared:
+                self.refresh(job_id)
+            current = dict.__getitem__(self, job_id)
+            status = fields.get("status")
+            previous = current.get("status")
+            if status is not None and status != previous:
+                # A record created without a status may enter any state
+                if previous is not None and status not in TRANSITIONS.get(previous, ()):
+                    raise InvalidTransition(f"Job {job_id}: cannot go from {previous} to {status}")
+                if status in TERMINAL_STATES:
+                    fields.setdefault("finished_at", time.time())
+            record = dict(current)
+            record.update(fields)
+            record["version"] = current.get("version", 0) + 1
+            record["updated_at"] = time.time()
+            self._store(job_id, record)
+            if self.shared:
+                self.persist(job_id, record)
+            return record
+
+    def amend(self, job_id, key, change, default):
+        """Publish a copy of the job whose TRANSIENT_KEYS entry key holds change(current value or default).
+
+        The change is applied under the store lock, so concurrent amendments are
+        never lost. Transient values never reach disk, so the version stays put and
+        a newer copy written by another process still wins in refresh().
+        """
+        with self._lock:
+            current = dict.__getitem__(self, job_id)
+            record = dict(current)
+            record[key] = change(current.get(key, default))
+            self._store(job_id, record)
+            return record
+
+    def snapshot(self):
+        """Return a consistent tuple of (job_id, record) pairs.
+
+        The tuple is rebuilt only after a write, so concurrent pollers share it.
+        """
+        if self.shared and time.time() - self._last_sync > 1.0:
+            self.sync()
+        generation, jobs = self._snapshot
+        if generation == self._generation:
+            return jobs
+        with self._lock:
+            jobs = tuple(dict.items(self))
+            self._snapshot = (self._generation, jobs)
+        return jobs
+
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def persist(self, job_id, job=None):
+        """Write a job's record to disk"""
+        job = job if job is not None else dict.get(self, job_id)
+        if job is None:
+            return
+        record = {key: value for key, value in job.items() if key not in TRANSIENT_KEYS}
+        tmp_path = self._path(job_id) + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, self._path(job_id))
+
+    def _read(self, job_id):
+        try:
+            with open(self._path(job_id), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, job_id):
+        """Return a job from memory, or its persisted record after eviction"""
+        if self.shared:
+            return self.refresh(job_id) or self._read(job_id)
+        job = self.get(job_id)
+        if job is not None:
+            return job
+        return self._read(job_id)
+
+    def refresh(self, job_id):
+        """Take another process's newer copy of a job into memory; returns the current record"""
+        record = self._read(job_id)
+        with self._lock:
+            current = dict.get(self, job_id)
+            if record is None or (current is not None and current.get("version", 0) >= record.get("version", 0)):
+                return current
+            if current is not None:
+                # Containers that never leave this process survive the swap
+                for key in TRANSIENT_KEYS:
+                    if key in current:
+                        record[key] = current[key]
+            self._store(job_id, record)
+            return record
+
+    def sync(self):
+        """Refresh every job whose file changed since the last sync"""
+        now = time.time()
+        since, self._last_sync = self._last_sync, now
+        try:
+            entries = list(os.scandir(self.jobs_dir))
+        except OSError:
+            return
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                if entry.stat().st_mtime < since - 1.0:
+                    continue
+            except OSError:
+                continue
+            job_id = entry.name[:-len(".json")]
+            record = self._read(job_id)
+            # Jobs evicted everywhere stay on disk only
+            if record is None or (record.get("status") in TERMINAL_STATES
+                                  and now - record.get("finished_at", now) > self.ttl):
+                continue
+            self.refresh(job_id)
+
+    def _evict(self, job_id, reason):
+        job = self.pop(job_id, None)
+        if job is None:
+            return
+        if not self.shared:
+            self.persist(job_id, job)
+        STATE_EVICTIONS.inc(kind="job", reason=reason)
+        if self.on_evict is not None:
+            self.on_evict(job_id)
+
+    def _finished(self, now):
+        """(finished_at, job_id) for every terminal job"""
+        return [(job.get("finished_at", job.get("updated_at", now)), job_id)
+                for job_id, job in self.snapshot() if job.get("status") in TERMINAL_STATES]
+
+    def evict_expired(self, now=None):
+        """Evict finished jobs older than the TTL, then any over capacity; returns how many were evicted"""
+        now = now or time.time()
+        with self._lock:
+            self._last_sweep = now
+            expired = [job_id for finished_at, job_id in self._finished(now) if now - finished_at > self.ttl]
+            for job_id in expired:
+                self._evict(job_id, "ttl")
+        # Records grow after creation (traces, notes paths), so the byte cap is also checked here
+        return len(expired) + self.enforce_capacity()
+
+    def enforce_capacity(self):
+        """Evict the longest-finished jobs until the table fits max_jobs and max_bytes"""
+        evicted = 0
+        with self._lock:
+            for _, job_id in sorted(self._finished(time.time())):
+                if not self._over_capacity():
+                    break
+                self._evict(job_id, "capacity")
+                evicted += 1
+        return evicted
+
+
+class LogStore(dict):
+    """Per-job log lines in fixed-size ring buffers, holding at most max_jobs buffers.
+
+    With a log_dir, lines are appended to <job_id>.log there instead, so a job's
+    log is visible from every process; each buffer then tails its file from the
+    offset it last read up to. discard() deletes the file.
+    """
+
+    # Bytes per line assumed when a log file is first tailed
+    LINE_BYTES = 256
+
+    def __init__(self, max_lines=100, max_jobs=500, log_dir=None):
+        super().__init__()
+        self.max_lines = max_lines
+        self.max_jobs = max_jobs
+        self.log_dir = log_dir
+        self._offsets = {}
+        self._lock = threading.Lock()
+
+    def _path(self, job_id):
+        return os.path.join(self.log_dir, f"{job_id}.log")
+
+    def _buffer(self, job_id):
+        """Return the job's ring buffer, creating it; caller holds the lock"""
+        buffer = self.get(job_id)
+        if buffer is None:
+            buffer = self[job_id] = deque(maxlen=self.max_lines)
+            # Dicts keep insertion order, so the first key is the oldest log
+            while len(self) > self.max_jobs:
+                oldest = next(iter(self))
+                self.pop(oldest)
+                self._offsets.pop(oldest, None)
+                STATE_EVICTIONS.inc(kind="log", reason="capacity")
+        return buffer
+
+    def append(self, job_id, line):
+        if self.log_dir is not None:
+            with open(self._path(job_id), 'a', encoding='utf-8') as f:
+                f.write(line.replace("\n", " ") + "\n")
+            return
+        with self._lock:
+            self._buffer(job_id).append(line)
+
+    def _tail(self, job_id):
+        """Read the lines other processes appended since the last call; caller holds the lock"""
+        try:
+            with open(self._path(job_id), 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                offset = self._offsets.get(job_id)
+                if offset is None or offset > size:
+                    # First read (or a recreated file): only the end can fit in the buffer anyway
+                    offset = max(0, size - self.max_lines * self.LINE_BYTES)
+                    f.seek(offset)
+                    if offset:
+                        offset += len(f.readline())
+                else:
+                    f.seek(offset)
+                data = f.read()
+        except OSError:
+            return
+        # A line still being written is read next time
+        complete = data[:data.rfind(b"\n") + 1]
+        buffer = self._buffer(job_id)
+        buffer.extend(line.decode('utf-8', 'replace') for line in complete.splitlines())
+        self._offsets[job_id] = offset + len(complete)
+
+    def lines(self, job_id):
+        with self._lock:
+            if self.log_dir is not None:
+                self._tail(job_id)
+            return list(self.get(job_id, ()))
+
+    def discard(self, job_id):
+        with self._lock:
+            self.pop(job_id, None)
+            self._offsets.pop(job_id, None)
+        if self.log_dir is not None:
+            try:
+                os.remove(self._path(job_id))
+            except FileNotFoundError:
+                pass
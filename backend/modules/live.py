@@ -0,0 +1,318 @@
+import os
+import time
+import threading
+import numpy as np
+from config import logger, active_jobs, TRANSCRIPT_DIR
+import config
+from modules.models import get_faster_whisper_model
+from modules.capture import AudioRingBuffer, VadChunker, PipelineStats, AdaptivePolicy
+from modules.storage import write_json_artifact
+
+_sweeper = None
+
+
+def pcm_to_float(pcm_bytes, sample_rate=None):
+    """Convert little-endian 16-bit PCM bytes into float32 samples at the live sample rate"""
+    if len(pcm_bytes) % 2:
+        pcm_bytes = pcm_bytes[:-1]
+    samples = np.frombuffer(pcm_bytes, dtype='<i2').astype(np.float32) / 32768.0
+    if sample_rate and sample_rate != config.LIVE_SAMPLE_RATE and len(samples):
+        # Linear resampling is good enough for speech at these rates
+        target_len = int(len(samples) * config.LIVE_SAMPLE_RATE / sample_rate)
+        samples = np.interp(
+            np.linspace(0, len(samples) - 1, target_len),
+            np.arange(len(samples)),
+            samples
+        ).astype(np.float32)
+    return samples
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+class LiveSession:
+    """Sliding-window transcription of one live PCM stream.
+
+    Requests write audio into a ring buffer and collect results, so they never
+    wait for a decode. A decoder thread moves the audio into an uncommitted
+    window and re-decodes it every LIVE_STEP_SECONDS while the VAD hears speech.
+    A segment becomes final once two consecutive decodes agree on it and it ends
+    before the trailing overlap, or when the VAD detects the pause ending its
+    utterance; everything after the last final segment is reported as the
+    partial hypothesis. Silence is dropped without decoding, and the adaptive
+    policy moves to smaller models while the backlog grows.
+    """
+
+    def __init__(self, session_id, model_size=None, language=None, sample_rate=None):
+        self.session_id = session_id
+        self.model_size = model_size or config.LIVE_DEFAULT_MODEL
+        self.language = language if language and language.lower() != 'auto' else None
+        self.sample_rate = sample_rate or config.LIVE_SAMPLE_RATE
+        self.audio = np.zeros(0, dtype=np.float32)
+        self.offset = 0.0          # Absolute stream time of self.audio[0]
+        self.undecoded = 0         # Samples received since the last decode
+        self.segments = []         # Final segments with absolute timestamps
+        self.previous = []         # Previous hypothesis, relative to self.offset
+        self.partial = ""
+        self.unreported = []       # Final segments not yet returned to the client
+        self.error = None
+        self.ring = AudioRingBuffer(config.LIVE_RING_SECONDS, config.LIVE_SAMPLE_RATE)
+        self.vad = VadChunker(config.LIVE_SAMPLE_RATE, max_chunk_seconds=config.LIVE_WINDOW_SECONDS)
+        self.stats = PipelineStats(config.LIVE_SAMPLE_RATE)
+        self.policy = AdaptivePolicy(self.model_size, beam_size=1)
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()  # The ring buffer takes one producer at a time
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.created_at = time.time()
+        self.last_activity = self.created_at
+        self.transcript_path = os.path.join(TRANSCRIPT_DIR, f"{session_id}.json")
+        self.decoder = threading.Thread(target=self._decode_loop, name=f"live-{session_id[:8]}", daemon=True)
+        self.decoder.start()
+
+    def feed(self, pcm_bytes):
+        """Queue PCM frames and return the segments finalized since the last call plus the current partial"""
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        samples = pcm_to_float(pcm_bytes, self.sample_rate)
+        with self.write_lock:
+            self.ring.write(samples)
+            self.last_activity = time.time()
+        self.wakeup.set()
+        return self._result()
+
+    def finish(self):
+        """Decode the remaining audio, commit everything and return the segments not yet reported"""
+        self.stopping.set()
+        self.wakeup.set()
+        self.decoder.join()
+        return self._result()
+
+    def _result(self):
+        with self.lock:
+            final, self.unreported = self.unreported, []
+            model_size, beam_size = self.policy.levels[self.policy.level]
+            return {
+                "session_id": self.session_id,
+                "final": final,
+                "partial": self.partial,
+                "committed_until": round(self.offset, 3),
+                "received_seconds": round(self.offset + (len(self.audio) + self.ring.available())
+                                          / config.LIVE_SAMPLE_RATE, 3),
+                "pipeline": dict(self.stats.snapshot(self.ring, self.undecoded / config.LIVE_SAMPLE_RATE),
+                                 model_size=model_size, beam_size=beam_size)
+            }
+
+    def _take_audio(self):
+        """Move buffered audio into the window; returns the window-relative end of an utterance the VAD closed"""
+        samples = self.ring.read()
+        chunks = self.vad.feed(samples) if len(samples) else []
+        if self.stopping.is_set():
+            chunks += self.vad.flush()
+        with self.lock:
+            if len(samples):
+                self.undecoded += len(samples)
+                self.audio = np.concatenate([self.audio, samples])
+        if not chunks:
+            return None
+        start, audio = chunks[-1]
+        return start + len(audio) / config.LIVE_SAMPLE_RATE - self.offset
+
+    def _drop_silence(self):
+        """Keep only the overlap of a window the VAD heard no speech in"""
+        keep = int(config.LIVE_OVERLAP_SECONDS * config.LIVE_SAMPLE_RATE)
+        with self.lock:
+            trim_samples = max(0, len(self.audio) - keep)
+            self.audio = self.audio[trim_samples:]
+            self.offset += trim_samples / config.LIVE_SAMPLE_RATE
+            self.undecoded = 0
+
+    def _decode_loop(self):
+        step = config.LIVE_STEP_SECONDS * config.LIVE_SAMPLE_RATE
+        try:
+            while not self.stopping.is_set() or self.ring.available():
+                if not self.ring.available():
+                    self.wakeup.wait(config.LIVE_STEP_SECONDS)
+                    self.wakeup.clear()
+                utterance_end = self._take_audio()
+                if utterance_end is not None:
+                    # The speaker paused: everything up to the pause is final
+                    self._decode(force=True, until=utterance_end)
+                elif self.undecoded >= step:
+                    if self.vad.chunk_start is None and not self.previous:
+                        self._drop_silence()
+                    else:
+                        self._decode(force=False)
+            if len(self.audio) and (self.previous or self.vad.chunk_start is not None):
+                self._decode(force=True)
+            with self.lock:
+                self.partial = ""
+        except Exception as e:
+            logger.error(f"Live session {self.session_id}: decoder failed - {str(e)}", exc_info=True)
+            with self.lock:
+                self.error = str(e)
+
+    def _decode(self, force, until=None):
+        new_seconds = self.undecoded / config.LIVE_SAMPLE_RATE
+        model_size, beam_size = self.policy.choose(
+            self.stats.snapshot(self.ring, new_seconds)["backlog_seconds"])
+        self.undecoded = 0
+        audio = self.audio if until is None else self.audio[:max(0, int(until * config.LIVE_SAMPLE_RATE))]
+        window_seconds = len(audio) / config.LIVE_SAMPLE_RATE
+        model = get_faster_whisper_model(model_size, quantized=True)
+
+        transcribe_kwargs = {
+            "beam_size": beam_size,
+            "condition_on_previous_text": False,
+        }
+        if self.language:
+            transcribe_kwargs["language"] = self.language
+        if self.segments:
+            # Carry the tail of the committed text as context across windows
+            transcribe_kwargs["initial_prompt"] = " ".join(s["text"] for s in self.segments[-3:])
+
+        started = time.time()
+        # The lock is not held here: requests keep queueing audio while the window decodes
+        segments, info = model.transcribe(audio, **transcribe_kwargs)
+        hypothesis = [(s.start, s.end, s.text.strip()) for s in segments if s.text.strip()]
+        if self.language is None and info.language:
+            self.language = info.language
+        elapsed = time.time() - started
+        self.stats.record(new_seconds, elapsed)
+        logger.debug(f"Live {self.session_id}: decoded {window_seconds:.2f}s window with {model_size} "
+                     f"(beam {beam_size}) in {elapsed:.3f}s")
+
+        stable_until = window_seconds - config.LIVE_OVERLAP_SECONDS
+        previous_texts = {_normalize(text) for _, _, text in self.previous}
+        commit_count = 0
+        if force:
+            commit_count = len(hypothesis)
+        else:
+            for start, end, text in hypothesis[:-1]:
+                if end <= stable_until and _normalize(text) in previous_texts:
+                    commit_count += 1
+                else:
+                    break
+            # Never let the window grow past its limit: commit all but the last segment,
+            # or the only segment when a single utterance fills the whole window
+            if window_seconds > config.LIVE_WINDOW_SECONDS:
+                commit_count = max(commit_count, len(hypothesis) - 1 if len(hypothesis) > 1 else len(hypothesis))
+
+        final = [{
+            "id": len(self.segments) + index,
+            "text": text,
+            "start": round(self.offset + start, 3),
+            "end": round(self.offset + end, 3)
+        } for index, (start, end, text) in enumerate(hypothesis[:commit_count])]
+
+        if force:
+            trim_seconds = window_seconds
+        elif final:
+            trim_seconds = hypothesis[commit_count - 1][1]
+        elif not hypothesis and window_seconds > config.LIVE_WINDOW_SECONDS:
+            # Silence only: drop everything except the overlap
+            trim_seconds = window_seconds - config.LIVE_OVERLAP_SECONDS
+        else:
+            trim_seconds = 0.0
+
+        with self.lock:
+            self.segments.extend(final)
+            self.unreported.extend(final)
+            if trim_seconds > 0:
+                trim_samples = min(len(self.audio), int(trim_seconds * config.LIVE_SAMPLE_RATE))
+                self.audio = self.audio[trim_samples:]
+                self.offset += trim_samples / config.LIVE_SAMPLE_RATE
+                self.previous = [(s - trim_seconds, e - trim_seconds, t) for s, e, t in hypothesis[commit_count:]]
+            else:
+                self.previous = hypothesis
+            if until is not None:
+                # Audio after the pause has not been decoded yet
+                self.undecoded = len(self.audio)
+            self.partial = " ".join(text for _, _, text in hypothesis[commit_count:])
+
+        if final:
+            self._persist()
+        return final
+
+    def transcript_data(self):
+        with self.lock:
+            segments = list(self.segments)
+        return {
+            "text": " ".join(s["text"] for s in segments),
+            "segments": segments,
+            "title": f"Live session {time.strftime('%Y-%m-%d %H:%M', time.localtime(self.created_at))}",
+            "channel": "Live",
+            "youtube_url": "",
+            "language": self.language
+        }
+
+    def _persist(self, precompress=False):
+        """Write the committed segments into the regular transcript store"""
+        # Compressed HTTP copies are only worth writing once the transcript stops changing
+        write_json_artifact(TRANSCRIPT_DIR, self.session_id, self.transcript_data(), precompress=precompress)
+
+
+def start_live_session(session_id, model_size=None, language=None, sample_rate=None):
+    """Create a live session and register it as a job"""
+    session = LiveSession(session_id, model_size, language, sample_rate)
+    config.live_sessions[session_id] = session
+    _start_idle_sweeper()
+    active_jobs.create(
+        session_id,
+        url="",
+        status="live",
+        created_at=session.created_at,
+        model_type="faster-whisper",
+        model_size=session.model_size,
+        language=session.language,
+        title="Live session",
+        transcript_path=session.transcript_path
+    )
+    logger.info(f"Live session {session_id} started with Faster-Whisper {session.model_size}")
+    return session
+
+
+def stop_live_session(session_id):
+    """Finalize a live session and mark its job complete"""
+    session = config.live_sessions.pop(session_id, None)
+    if session is None:
+        return None
+    result = session.finish()
+    session._persist(precompress=True)
+    try:
+        from modules.search import index_transcript
+        index_transcript(session_id, session.transcript_data(), session.created_at)
+    except Exception as e:
+        logger.warning(f"Live session {session_id}: could not index transcript - {str(e)}")
+    if session_id in active_jobs:
+        active_jobs.update(session_id, status="complete", language=session.language)
+    logger.info(f"Live session {session_id} finished with {len(session.segments)} segments")
+    return result
+
+
+def close_idle_sessions(now=None):
+    """Finalize sessions that received no audio for LIVE_IDLE_SECONDS; returns how many were closed"""
+    now = now or time.time()
+    idle = [session_id for session_id, session in list(config.live_sessions.items())
+            if now - session.last_activity > config.LIVE_IDLE_SECONDS]
+    for session_id in idle:
+        logger.info(f"Live session {session_id} idle for over {config.LIVE_IDLE_SECONDS}s, closing it")
+        try:
+            stop_live_session(session_id)
+        except Exception as e:
+            logger.error(f"Live session {session_id}: could not close - {str(e)}", exc_info=True)
+    return len(idle)
+
+
+def _idle_loop():
+    while True:
+        time.sleep(max(1.0, config.LIVE_IDLE_SECONDS / 4))
+        close_idle_sessions()
+
+
+def _start_idle_sweeper():
+    global _sweeper
+    if _sweeper is None or not _sweeper.is_alive():
+        _sweeper = threading.Thread(target=_idle_loop, name="live-idle-sweeper", daemon=True)
+        _sweeper.start()
@@ -0,0 +1,331 @@
+import os
+import json
+import socket
+import threading
+import time
+
+# Bucket boundaries in seconds
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STAGE_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for a labelled metric family"""
+    metric_type = "untyped"
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self, others=()):
+        """Text for this family; others are exported values of the same family from other processes"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples(others))
+        return "\n".join(lines)
+
+    def export(self):
+        """This process's values as JSON-serializable [labels, value] pairs"""
+        with self.lock:
+            return [[list(key), value] for key, value in self.values.items()]
+
+    def _merged(self, others):
+        with self.lock:
+            values = dict(self.values)
+        for exported in others:
+            for key, value in exported:
+                key = tuple(key)
+                values[key] = values.get(key, 0) + value
+        return values
+
+    def _samples(self, others=()):
+        items = self._merged(others).items()
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, optionally computed at scrape time"""
+    metric_type = "gauge"
+
+    def __init__(self, name, description, labels=(), collect=None):
+        super().__init__(name, description, labels)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def export(self):
+        # Gauges describe this process, or are computed from shared state at scrape time
+        return []
+
+    def _samples(self, others=()):
+        if self.collect is not None:
+            # collect() returns {label_tuple: value}; it replaces any stored values
+            try:
+                collected = self.collect()
+            except Exception:
+                collected = {}
+            with self.lock:
+                self.values = {tuple(str(v) for v in key): value for key, value in collected.items()}
+        return super()._samples()
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed bucket boundaries"""
+    metric_type = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=REQUEST_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def time(self, **labels):
+        """Context manager that observes the elapsed wall time of its block"""
+        return _Timer(self, labels)
+
+    def export(self):
+        with self.lock:
+            return [[list(key), {"counts": list(state["counts"]), "sum": state["sum"], "count": state["count"]}]
+                    for key, state in self.values.items()]
+
+    def _merged(self, others):
+        with self.lock:
+            values = {key: {"counts": list(state["counts"]), "sum": state["sum"], "count": state["count"]}
+                      for key, state in self.values.items()}
+        for exported in others:
+            for key, state in exported:
+                if len(state["counts"]) != len(self.buckets):
+                    continue  # Written with other bucket boundaries
+                merged = values.setdefault(tuple(key), {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+                merged["counts"] = [a + b for a, b in zip(merged["counts"], state["counts"])]
+                merged["sum"] += state["sum"]
+                merged["count"] += state["count"]
+        return values
+
+    def _samples(self, others=()):
+        items = [(key, state["counts"], state["sum"], state["count"]) for key, state in self._merged(others).items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        self.histogram.observe(self.elapsed, **self.labels)
+        return False
+
+
+class Registry:
+    """Holds metric families and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def export(self):
+        return {metric.name: metric.export() for metric in self.metrics}
+
+    def render(self, others=()):
+        """Text of every family, adding the exports of other processes to this one's values"""
+        return "\n".join(metric.render([exported.get(metric.name, []) for exported in others])
+                         for metric in self.metrics) + "\n"
+
+
+REGISTRY = Registry()
+_exporter = None
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "echoscript_http_request_duration_seconds", "HTTP request latency by endpoint",
+    labels=("endpoint", "method")))
+REQUESTS = REGISTRY.register(Counter(
+    "echoscript_http_requests_total", "HTTP requests by endpoint and status code",
+    labels=("endpoint", "method", "status")))
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "echoscript_stage_duration_seconds", "Duration of job pipeline stages",
+    labels=("stage", "engine"), buckets=STAGE_BUCKETS))
+MODEL_LOAD_DURATION = REGISTRY.register(Histogram(
+    "echoscript_model_load_seconds", "Time spent constructing or loading models",
+    labels=("kind", "model"), buckets=STAGE_BUCKETS))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "echoscript_cache_requests_total", "Cache lookups by cache and result (hit or miss)",
+    labels=("cache", "result")))
+AUDIO_SECONDS = REGISTRY.register(Counter(
+    "echoscript_audio_seconds_processed_total", "Seconds of audio transcribed",
+    labels=("engine", "model_size")))
+JOBS_FINISHED = REGISTRY.register(Counter(
+    "echoscript_jobs_finished_total", "Jobs that reached a terminal state",
+    labels=("status",)))
+ADMISSIONS = REGISTRY.register(Counter(
+    "echoscript_admissions_total", "Transcription requests by admission result (admitted, rejected)",
+    labels=("result",)))
+STATE_EVICTIONS = REGISTRY.register(Counter(
+    "echoscript_state_evictions_total", "In-memory jobs and logs dropped by kind (job, log) and reason (ttl, capacity)",
+    labels=("kind", "reason")))
+
+
+def _jobs_by_status():
+    from config import active_jobs
+    counts = {}
+    for _, job in active_jobs.snapshot():
+        status = job.get("status", "unknown")
+        counts[(status,)] = counts.get((status,), 0) + 1
+    return counts
+
+
+def _queue_depth():
+    return {(): _jobs_by_status().get(("queued",), 0)}
+
+
+def _backlog():
+    from modules.admission import backlog_seconds
+    return {(): round(backlog_seconds(), 1)}
+
+
+JOBS_BY_STATUS = REGISTRY.register(Gauge(
+    "echoscript_jobs", "Jobs held in memory by status",
+    labels=("status",), collect=_jobs_by_status))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "echoscript_queue_depth", "Jobs accepted but not yet started",
+    collect=_queue_depth))
+BACKLOG = REGISTRY.register(Gauge(
+    "echoscript_backlog_seconds", "Estimated seconds until every accepted job is processed",
+    collect=_backlog))
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup as a hit or miss"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def _export_path(directory):
+    # Remote nodes may share the storage directory, so PIDs alone could collide
+    return os.path.join(directory, f"{socket.gethostname()}-{os.getpid()}.json")
+
+
+def export_metrics(directory):
+    """Write this process's counters and histograms where other processes' /metrics can add them up"""
+    path = _export_path(directory)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(REGISTRY.export(), f)
+    os.replace(tmp_path, path)
+
+
+def _export_loop(directory, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            export_metrics(directory)
+        except OSError:
+            pass
+
+
+def start_metrics_export(directory, interval):
+    """Export this process's metrics every interval seconds from a background thread"""
+    global _exporter
+    if _exporter is None or not _exporter.is_alive():
+        _exporter = threading.Thread(target=_export_loop, args=(directory, interval), name="metrics-export",
+                                     daemon=True)
+        _exporter.start()
+
+
+def _read_exports(directory):
+    own = os.path.basename(_export_path(directory))
+    exports = []
+    for filename in os.listdir(directory):
+        if not filename.endswith(".json") or filename == own:
+            continue
+        try:
+            with open(os.path.join(directory, filename), 'r') as f:
+                exports.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return exports
+
+
+def render_metrics():
+    """Render all registered metrics in the Prometheus text exposition format.
+
+    Under serve.py every process exports its counters and histograms to
+    METRICS_DIR, and each scrape adds the other processes' latest exports to
+    this one's live values; files of exited processes are kept so totals never
+    go backwards. Gauges are computed from shared state at scrape time.
+    """
+    from config import SHARED_STATE, METRICS_DIR
+    if not SHARED_STATE:
+        return REGISTRY.render()
+    return REGISTRY.render(_read_exports(METRICS_DIR))
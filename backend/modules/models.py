@@ -1,24 +1,35 @@
-import torch
-import whisper
 import gc
 import time
 import os
 import json
+import threading
 import traceback
-from transformers import pipeline, AutoModelForSeq2SeqLM, AutoTokenizer
 from config import logger, SUMMARIZER_MODELS, MODEL_DIR, CONFIG_FILE
 import config
 from modules.utils import get_model_path
+from modules.metrics import MODEL_LOAD_DURATION, record_cache
+from modules.hardware import get_execution_profile, faster_whisper_kwargs, apply_torch_threads
 
 # Set CUDA memory allocation configuration - update the existing setting
 os.environ["PYTORCH_CUDA_ALLOC_CONF"] = "max_split_size_mb:512"
 
+# Serializes ASR model loads between warm-up and the job slots of one process
+_load_lock = threading.RLock()
+
 def load_whisper_model(model_size="medium"):
     """Load the OpenAI Whisper model"""
+    with _load_lock:
+        return _load_whisper_model(model_size)
+
+def _load_whisper_model(model_size):
+    import torch
+    import whisper
+    
     # Clear GPU memory before loading new model
     if config.transcription_model is not None:
         logger.info("Unloading previous Whisper model")
-        del config.transcription_model
+        # Dropped, not deleted: other threads read the attribute while this one loads
+        config.transcription_model = None
         gc.collect()
         torch.cuda.empty_cache()
         time.sleep(1)  # Allow GPU memory to release
@@ -27,11 +38,13 @@ def load_whisper_model(model_size="medium"):
     model_path = get_model_path("whisper")
     
     # Load with optimized settings
-    config.transcription_model = whisper.load_model(
-        model_size, 
-        download_root=model_path,
-        device="cuda" if torch.cuda.is_available() else "cpu"
-    )
+    apply_torch_threads()
+    with MODEL_LOAD_DURATION.time(kind="whisper", model=model_size):
+        config.transcription_model = whisper.load_model(
+            model_size, 
+            download_root=model_path,
+            device=get_execution_profile()["whisper"]["device"]
+        )
     config.current_whisper_model_size = model_size
     logger.info(f"Completed loading Whisper {model_size} model")
     return True
@@ -39,24 +52,44 @@ def load_whisper_model(model_size="medium"):
 def verify_faster_whisper_model(model_size="medium"):
     """Verify that a Faster-Whisper model can be loaded"""
     try:
-        from faster_whisper import WhisperModel
-        model_path = get_model_path("faster-whisper")
         logger.info(f"Verifying Faster-Whisper {model_size} model")
         
-        # Just verify the model can be accessed
-        _ = WhisperModel(
-            model_size, 
-            device="cuda", 
-            compute_type="float16", 
-            download_root=model_path,
-            cpu_threads=4
-        )
+        # Loading through the cache means the verified model is reused by jobs
+        get_faster_whisper_model(model_size)
         logger.info(f"Verified Faster-Whisper {model_size} model")
         return True
     except Exception as e:
         logger.error(f"Error verifying Faster-Whisper model: {str(e)}")
         return False
 
+def get_faster_whisper_model(model_size="medium", quantized=False):
+    """Return a cached Faster-Whisper model, loading it on first use
+
+    quantized picks the int8 profile used by live decoding; where it matches
+    the default profile (e.g. on CPU) the same cached model is shared.
+    """
+    settings = faster_whisper_kwargs(quantized=quantized)
+    key = model_size
+    if quantized and settings != faster_whisper_kwargs():
+        key = f"{model_size}:{settings['compute_type']}"
+    model = config.faster_whisper_models.get(key)
+    record_cache("faster-whisper-model", model is not None)
+    if model is not None:
+        return model
+    with _load_lock:
+        # Another thread may have loaded it while this one waited
+        model = config.faster_whisper_models.get(key)
+        if model is not None:
+            return model
+        from faster_whisper import WhisperModel
+        model_path = get_model_path("faster-whisper")
+        logger.info(f"Loading Faster-Whisper {model_size} model into cache "
+                    f"({settings['device']}, {settings['compute_type']})")
+        with MODEL_LOAD_DURATION.time(kind="faster-whisper", model=model_size):
+            model = WhisperModel(model_size, download_root=model_path, **settings)
+        config.faster_whisper_models[key] = model
+    return model
+
 def get_available_summarizers():
     """Return dict of available summarization models"""
     available = {
@@ -101,6 +134,13 @@ def load_summarizer(model_name=None):
     
     available_models = get_available_summarizers()
     
+    # Accept the short names from SUMMARIZER_MODELS as well as Hugging Face IDs
+    if model_name in SUMMARIZER_MODELS:
+        model_name = SUMMARIZER_MODELS[model_name]["name"]
+    known_names = {m["name"] for m in SUMMARIZER_MODELS.values()}
+    if model_name in known_names and model_name not in available_models:
+        available_models[model_name] = {}
+    
     # Use default if none specified
     if not model_name or model_name not in available_models:
         model_name = "facebook/bart-large-cnn"
@@ -124,12 +164,14 @@ def load_summarizer(model_name=None):
             return True
         
         # Standard models using the pipeline with cache_dir to save models
-        config.summarizer = pipeline(
-            "summarization", 
-            model=model_name, 
-            device=0 if torch.cuda.is_available() else -1,
-            model_kwargs={"cache_dir": model_path}
-        )
+        apply_torch_threads()
+        with MODEL_LOAD_DURATION.time(kind="summarizer", model=model_name):
+            config.summarizer = pipeline(
+                "summarization", 
+                model=model_name, 
+                device=get_execution_profile()["summarizer"]["device"],
+                model_kwargs={"cache_dir": model_path}
+            )
         config.summarizer_model = model_name
         config.summarizer_status = "loaded"
         logger.info(f"Summarizer loaded successfully: {model_name}")
@@ -173,8 +215,20 @@ def load_app_config():
         }
     
     # Add model_status to indicate whether models are loaded
-    config_data["model_status"] = "loaded" if config.transcription_model is not None else "no model loaded"
-    config_data["summarizer_status"] = "loaded" if config.summarizer is not None else "no summarizer loaded"
+    from modules.warmup import get_readiness
+    components = get_readiness()["components"]
+    if config.transcription_model is not None or config.faster_whisper_models:
+        config_data["model_status"] = "loaded"
+    elif components["asr"]["state"] == "loading":
+        config_data["model_status"] = "loading"
+    else:
+        config_data["model_status"] = "no model loaded"
+    if config.summarizer is not None:
+        config_data["summarizer_status"] = "loaded"
+    elif components["summarizer"]["state"] == "loading":
+        config_data["summarizer_status"] = "loading"
+    else:
+        config_data["summarizer_status"] = "no summarizer loaded"
     
     # Add available summarizer models to the config
     config_data["available_summarizers"] = SUMMARIZER_MODELS
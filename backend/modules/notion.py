@@ -1,5 +1,4 @@
 import os
-from notion_client import Client
 from dotenv import load_dotenv
 from config import logger
 
@@ -160,6 +159,7 @@ def export_to_notion(content, notion_token=None, parent_page_id=None):
             }
         
         # Initialize Notion client
+        from notion_client import Client
         notion = Client(auth=notion_token)
         
         try:
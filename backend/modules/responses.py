@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+from flask import Response, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import is_resource_modified
+from modules.storage import servable_variants, read_artifact_bytes
+
+try:
+    import orjson
+    # Flask's provider accepts non-string keys and numpy values reach a few payloads
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+except ImportError:
+    orjson = None
+
+# Encodings tried in order when the client accepts several
+ENCODING_PREFERENCE = ("br", "zstd", "gzip")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; types orjson can't handle go through Flask's default"""
+
+    def _options(self):
+        # Honour the provider's sort_keys (app.json.sort_keys) like Flask's own provider does
+        return ORJSON_OPTIONS | orjson.OPT_SORT_KEYS if self.sort_keys else ORJSON_OPTIONS
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # json.dumps options (indent, sort_keys...) only come from explicit callers
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=self.default, option=self._options()),
+                                        mimetype=self.mimetype)
+
+
+def install_json_provider(app):
+    """Serialize with orjson when it is installed; returns whether it was"""
+    if orjson is None:
+        return False
+    app.json = OrjsonProvider(app)
+    return True
+
+
+def _not_modified(etag, last_modified=None):
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def conditional_json(data, etag):
+    """jsonify data, or answer 304 when the client's copy carries the same ETag"""
+    response = _not_modified(etag)
+    if response is not None:
+        return response
+    response = jsonify(data)
+    response.set_etag(etag, weak=True)
+    # Clients may cache but must revalidate, which costs a 304 when nothing changed
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def artifact_response(directory, job_id):
+    """Serve a stored JSON artifact without parsing it, or None when there is none.
+
+    Answers 304 from a stat() alone when the client's ETag or Last-Modified
+    still matches, and otherwise sends the best precompressed copy the client
+    accepts, decompressing only when it accepts none of them.
+    """
+    mtime_ns, variants = servable_variants(directory, job_id)
+    if not variants:
+        return None
+    etag = f"{job_id}-{mtime_ns:x}"
+    last_modified = datetime.fromtimestamp(mtime_ns // 1_000_000_000, timezone.utc)
+    response = _not_modified(etag, last_modified)
+    if response is None:
+        encoding = next((name for name in ENCODING_PREFERENCE
+                         if name in variants and request.accept_encodings[name]), None)
+        if encoding is not None:
+            with open(variants[encoding], 'rb') as f:
+                response = Response(f.read(), mimetype='application/json')
+            response.headers['Content-Encoding'] = encoding
+        elif "identity" in variants:
+            with open(variants["identity"], 'rb') as f:
+                response = Response(f.read(), mimetype='application/json')
+        else:
+            response = Response(read_artifact_bytes(next(iter(variants.values()))), mimetype='application/json')
+        response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,136 @@
+import time
+import heapq
+import itertools
+import threading
+from config import logger, active_jobs, WORKER_SLOTS, SERVING_MODE
+from modules import job_queue
+from modules.cancellation import request_cancel, clear_cancel, cancel_reason, CANCELLED, PREEMPTED
+from modules.metrics import JOBS_FINISHED
+
+# Lower value runs first; interactive requests may preempt bulk work
+PRIORITIES = {"interactive": 0, "bulk": 1}
+
+_condition = threading.Condition()
+_queue = []       # heap of (priority, sequence, job_id)
+_queued = {}      # job_id -> (url, language, priority name)
+_running = {}     # job_id -> (priority, started_at)
+_sequence = itertools.count()
+_workers = []
+
+
+def submit_job(job_id, youtube_url, language=None, priority="interactive", sequence=None):
+    """Queue a job for the worker pool, preempting bulk work if an interactive job would wait"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority}")
+    if SERVING_MODE != "dev":
+        # Inference worker processes pick the job up from the shared queue
+        queued = job_queue.enqueue(job_id, youtube_url, language, priority, PRIORITIES[priority], sequence,
+                                   estimated_seconds=(active_jobs.get(job_id) or {}).get("estimated_seconds"))
+        if queued is None:
+            # The record may have been written after the cancellation reached the queue
+            if (active_jobs.get(job_id) or {}).get("status") not in (None, "cancelled"):
+                active_jobs.update(job_id, status="cancelled")
+            logger.info(f"Job {job_id}: Cancelled before it was queued")
+            return
+        if job_id in active_jobs:
+            active_jobs.update(job_id, status="queued", priority=priority)
+        return
+    _ensure_workers()
+    with _condition:
+        # Requeued jobs keep their original sequence so they don't lose their place
+        sequence = next(_sequence) if sequence is None else sequence
+        heapq.heappush(_queue, (PRIORITIES[priority], sequence, job_id))
+        _queued[job_id] = (youtube_url, language, priority, sequence)
+        if job_id in active_jobs:
+            active_jobs.update(job_id, status="queued", priority=priority)
+        if PRIORITIES[priority] == 0 and len(_running) >= WORKER_SLOTS:
+            _preempt_bulk()
+        _condition.notify()
+
+
+def _preempt_bulk():
+    """Ask the most recently started bulk job to yield its slot; caller holds the condition"""
+    # A job already asked to stop is giving up its slot anyway; preempting it again frees nothing
+    bulk = [(started, job_id) for job_id, (prio, started) in _running.items()
+            if prio == PRIORITIES["bulk"] and cancel_reason(job_id) is None]
+    if bulk:
+        _, job_id = max(bulk)
+        logger.info(f"Job {job_id}: Preempting bulk job for interactive work")
+        request_cancel(job_id, PREEMPTED)
+
+
+def cancel_job(job_id):
+    """Cancel a queued job immediately or ask a running one to stop.
+
+    Returns "cancelled", "cancelling" or None when the job is neither queued nor running.
+    """
+    if SERVING_MODE != "dev":
+        result = job_queue.cancel(job_id)
+        if result == "cancelled":
+            if active_jobs.load(job_id) is not None:
+                active_jobs.update(job_id, status="cancelled")
+            JOBS_FINISHED.inc(status="cancelled")
+            logger.info(f"Job {job_id}: Cancelled before it started")
+        return result
+    with _condition:
+        if job_id in _queued:
+            del _queued[job_id]
+            # The heap entry is skipped when a worker pops it
+            if job_id in active_jobs:
+                active_jobs.update(job_id, status="cancelled")
+            JOBS_FINISHED.inc(status="cancelled")
+            logger.info(f"Job {job_id}: Cancelled before it started")
+            return "cancelled"
+        if job_id in _running:
+            request_cancel(job_id, CANCELLED)
+            return "cancelling"
+    return None
+
+
+def queue_snapshot():
+    """Queued and running jobs for status reporting"""
+    if SERVING_MODE != "dev":
+        return job_queue.snapshot()
+    with _condition:
+        queued = [{"job_id": job_id, "priority": _queued[job_id][2]}
+                  for _, _, job_id in sorted(_queue) if job_id in _queued]
+        running = [{"job_id": job_id, "priority": "bulk" if prio else "interactive", "started_at": started}
+                   for job_id, (prio, started) in _running.items()]
+    return {"slots": WORKER_SLOTS, "running": running, "queued": queued}
+
+
+def _ensure_workers():
+    with _condition:
+        while len(_workers) < WORKER_SLOTS:
+            worker = threading.Thread(target=_worker_loop, name=f"job-worker-{len(_workers)}", daemon=True)
+            _workers.append(worker)
+            worker.start()
+
+
+def _next_job():
+    with _condition:
+        while True:
+            while _queue:
+                prio, sequence, job_id = heapq.heappop(_queue)
+                spec = _queued.pop(job_id, None)
+                if spec is not None:
+                    _running[job_id] = (prio, time.time())
+                    return job_id, spec
+            _condition.wait()
+
+
+def _worker_loop():
+    from modules.transcription import process_video
+    while True:
+        job_id, (youtube_url, language, priority, sequence) = _next_job()
+        try:
+            process_video(youtube_url, job_id, language)
+        except Exception as e:
+            logger.error(f"Job {job_id}: Worker failed - {str(e)}", exc_info=True)
+        finally:
+            with _condition:
+                _running.pop(job_id, None)
+            clear_cancel(job_id)
+        if active_jobs.get(job_id, {}).get("status") == PREEMPTED:
+            # Resumes from the segment log when a slot frees up
+            submit_job(job_id, youtube_url, language, priority, sequence=sequence)
@@ -0,0 +1,234 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import threading
+from config import logger, active_jobs, SEARCH_DB, TRANSCRIPT_DIR
+
+SNIPPET_TOKENS = 16   # Words of context returned around each hit
+MAX_RESULTS = 100
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+SCHEMA = [
+    # One row per transcript; lets hits carry titles without opening transcript files
+    """CREATE TABLE IF NOT EXISTS documents (
+        job_id TEXT PRIMARY KEY,
+        title TEXT,
+        channel TEXT,
+        language TEXT,
+        segment_count INTEGER,
+        indexed_at REAL,
+        created_at REAL,
+        status TEXT
+    )""",
+    # Segment text is the only indexed column; the rest ride along for ranking output
+    """CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+        text,
+        job_id UNINDEXED,
+        start UNINDEXED,
+        end UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+]
+
+# Columns added after the first release, for search databases created before them
+MIGRATIONS = {
+    "created_at": "ALTER TABLE documents ADD COLUMN created_at REAL",
+    "status": "ALTER TABLE documents ADD COLUMN status TEXT"
+}
+
+# Created once the migrated columns exist; archives filter and page on these
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS documents_created_at ON documents (created_at)",
+    "CREATE INDEX IF NOT EXISTS documents_status ON documents (status)",
+]
+
+
+def _connect():
+    """Return this thread's connection to the search database"""
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(SEARCH_DB, timeout=30)
+        # WAL lets searches run while a job is writing its segments
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                with conn:
+                    for statement in SCHEMA:
+                        conn.execute(statement)
+                    columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+                    for column, statement in MIGRATIONS.items():
+                        if column not in columns:
+                            try:
+                                conn.execute(statement)
+                            except sqlite3.OperationalError:
+                                pass  # Another process added it first
+                    for statement in INDEXES:
+                        conn.execute(statement)
+                    _backfill_documents(conn)
+                _schema_ready = True
+    return conn
+
+
+def _backfill_documents(conn):
+    """Give documents indexed before created_at existed their transcript's mtime; they are finished jobs"""
+    from modules.storage import artifact_path
+    rows = conn.execute("SELECT job_id FROM documents WHERE created_at IS NULL").fetchall()
+    for (job_id,) in rows:
+        path = artifact_path(TRANSCRIPT_DIR, job_id)
+        try:
+            created_at = os.path.getmtime(path) if path else time.time()
+        except OSError:
+            created_at = time.time()
+        conn.execute("UPDATE documents SET created_at = ?, status = COALESCE(status, 'complete') WHERE job_id = ?",
+                     (created_at, job_id))
+    if rows:
+        logger.info(f"Search index: backfilled creation times of {len(rows)} transcripts")
+
+
+def index_transcript(job_id, transcript_data, created_at=None, status="complete"):
+    """Replace the indexed segments for one transcript; created_at and status feed archive filters"""
+    segments = transcript_data.get("segments") or []
+    rows = [(segment["text"].strip(), job_id, segment["start"], segment["end"])
+            for segment in segments if segment.get("text", "").strip()]
+    conn = _connect()
+    with conn:
+        conn.execute("DELETE FROM segments WHERE job_id = ?", (job_id,))
+        conn.executemany("INSERT INTO segments (text, job_id, start, end) VALUES (?, ?, ?, ?)", rows)
+        conn.execute(
+            "INSERT OR REPLACE INTO documents "
+            "(job_id, title, channel, language, segment_count, indexed_at, created_at, status) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, transcript_data.get("title"), transcript_data.get("channel"),
+             transcript_data.get("language"), len(rows), time.time(), created_at or time.time(), status)
+        )
+    return len(rows)
+
+
+def set_document_status(job_id, status):
+    """Record a job's new status on its indexed transcript, if it has one"""
+    conn = _connect()
+    with conn:
+        conn.execute("UPDATE documents SET status = ? WHERE job_id = ?", (status, job_id))
+
+
+def find_documents(since=None, until=None, channel=None, status=None, after=None, limit=None):
+    """Indexed transcripts matching the filter, ordered by job ID"""
+    sql = "SELECT job_id, status, title, channel, created_at FROM documents WHERE 1 = 1"
+    params = []
+    if after:
+        sql += " AND job_id > ?"
+        params.append(after)
+    if since is not None:
+        sql += " AND created_at >= ?"
+        params.append(since)
+    if until is not None:
+        sql += " AND created_at < ?"
+        params.append(until)
+    if channel:
+        sql += " AND channel = ? COLLATE NOCASE"
+        params.append(channel)
+    if status:
+        sql += " AND status = ?"
+        params.append(status)
+    sql += " ORDER BY job_id"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return [{"job_id": job_id, "status": job_status or "complete", "title": title, "channel": channel,
+             "created_at": created_at}
+            for job_id, job_status, title, channel, created_at in _connect().execute(sql, params)]
+
+
+def remove_transcript(job_id):
+    """Drop a transcript from the index"""
+    conn = _connect()
+    with conn:
+        conn.execute("DELETE FROM segments WHERE job_id = ?", (job_id,))
+        conn.execute("DELETE FROM documents WHERE job_id = ?", (job_id,))
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query of quoted terms; a trailing * keeps prefix matching"""
+    terms = []
+    for word in re.findall(r'[^\s"]+', text):
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return " ".join(terms)
+
+
+def search(query, limit=20, offset=0, job_id=None):
+    """Return ranked segment hits for a free-text query"""
+    match = build_match_query(query)
+    if not match:
+        return []
+    limit = max(1, min(int(limit), MAX_RESULTS))
+    sql = (
+        "SELECT segments.job_id, documents.title, documents.channel, segments.start, segments.end, "
+        f"snippet(segments, 0, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}), bm25(segments) "
+        "FROM segments JOIN documents ON documents.job_id = segments.job_id "
+        "WHERE segments MATCH ?"
+    )
+    params = [match]
+    if job_id:
+        sql += " AND segments.job_id = ?"
+        params.append(job_id)
+    sql += " ORDER BY bm25(segments) LIMIT ? OFFSET ?"
+    params += [limit, max(0, int(offset))]
+    rows = _connect().execute(sql, params).fetchall()
+    return [{
+        "job_id": row[0],
+        "title": row[1],
+        "channel": row[2],
+        "start": row[3],
+        "end": row[4],
+        "snippet": row[5],
+        # bm25() is lower-is-better; flip it so clients can sort descending
+        "score": round(-row[6], 4)
+    } for row in rows]
+
+
+def index_stats():
+    """Return how many transcripts and segments are indexed"""
+    conn = _connect()
+    documents, segments = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(segment_count), 0) FROM documents").fetchone()
+    return {"documents": documents, "segments": segments}
+
+
+def rebuild_index():
+    """Index every saved transcript; only needed once for transcripts saved before indexing existed"""
+    from modules.storage import artifact_job_ids, artifact_path, read_json_artifact
+    indexed = 0
+    for job_id in artifact_job_ids(TRANSCRIPT_DIR):
+        try:
+            record = active_jobs.get(job_id) or {}
+            created_at = record.get("created_at") or os.path.getmtime(artifact_path(TRANSCRIPT_DIR, job_id))
+            index_transcript(job_id, read_json_artifact(TRANSCRIPT_DIR, job_id), created_at,
+                             record.get("status", "complete"))
+            indexed += 1
+        except Exception as e:
+            logger.warning(f"Could not index transcript {job_id}: {str(e)}")
+    logger.info(f"Search index rebuilt with {indexed} transcripts")
+    return indexed
+
+
+if __name__ == "__main__":
+    # python -m modules.search rebuild
+    if sys.argv[1:] == ["rebuild"]:
+        rebuild_index()
+        print(json.dumps(index_stats()))
+    else:
+        print("usage: python -m modules.search rebuild", file=sys.stderr)
+        sys.exit(2)
@@ -0,0 +1,280 @@
+import os
+import gzip
+import json
+import shutil
+import time
+import threading
+from config import logger, SEGMENT_DIR
+
+# Record types, one JSON object per line:
+#   job         header with everything needed to restart the job
+#   metadata    video title/channel/thumbnail from the download
+#   segment     one transcribed segment, in order
+#   language    language the engine decoded in, and how sure its detection was
+#   transcribed ASR finished; the segments are the whole transcript
+#   complete    notes saved, nothing left to resume; the log is deleted right after
+#   error       the job failed; not resumed automatically
+#   cancelled   stopped by the user; not resumed automatically
+#   preempted   gave up its worker slot; resumed when requeued
+
+
+def segment_log_path(job_id):
+    return os.path.join(SEGMENT_DIR, f"{job_id}.jsonl")
+
+
+def _compressed_path(job_id):
+    return segment_log_path(job_id) + ".gz"
+
+
+def _open_log(job_id):
+    """Open a job's log for reading, plain or compressed by the storage sweep; None when there is none"""
+    try:
+        return open(segment_log_path(job_id), 'r', encoding='utf-8')
+    except FileNotFoundError:
+        pass
+    try:
+        return gzip.open(_compressed_path(job_id), 'rt', encoding='utf-8')
+    except FileNotFoundError:
+        return None
+
+
+def segment_log_exists(job_id):
+    """Whether a job has a log, plain or compressed by the storage sweep"""
+    return os.path.exists(segment_log_path(job_id)) or os.path.exists(_compressed_path(job_id))
+
+
+def compress_segment_log(job_id):
+    """Gzip a finished job's log in place; returns bytes saved"""
+    path = segment_log_path(job_id)
+    target = _compressed_path(job_id)
+    with open(path, 'rb') as source, gzip.open(target + ".tmp", 'wb') as packed:
+        shutil.copyfileobj(source, packed)
+    os.replace(target + ".tmp", target)
+    saved = os.path.getsize(path) - os.path.getsize(target)
+    os.remove(path)
+    return saved
+
+
+def _restore(job_id):
+    """Decompress a log the storage sweep compressed, so the job can append to it again"""
+    target = segment_log_path(job_id)
+    source = _compressed_path(job_id)
+    if os.path.exists(target) or not os.path.exists(source):
+        return
+    with gzip.open(source, 'rb') as packed, open(target + ".tmp", 'wb') as plain:
+        shutil.copyfileobj(packed, plain)
+    os.replace(target + ".tmp", target)
+    os.remove(source)
+
+
+class SegmentLog:
+    """Append-only per-job log that survives crashes of the processing thread"""
+
+    def __init__(self, job_id, header=None):
+        self.job_id = job_id
+        self.path = segment_log_path(job_id)
+        self._lock = threading.Lock()
+        _restore(job_id)
+        exists = os.path.exists(self.path)
+        if exists:
+            _truncate_partial_line(self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if not exists:
+            self._write(dict(header or {}, type="job", job_id=job_id, created_at=time.time()))
+
+    def _write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # Flushing per record is enough to survive a crashed process; the OS keeps the page
+            self._file.flush()
+
+    def append_segment(self, start, end, text):
+        self._write({"type": "segment", "start": start, "end": end, "text": text})
+
+    def append_metadata(self, metadata):
+        self._write(dict(metadata, type="metadata"))
+
+    def mark(self, record_type, **details):
+        self._write(dict(details, type=record_type, at=time.time()))
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                os.fsync(self._file.fileno())
+                self._file.close()
+
+
+def _truncate_partial_line(path):
+    """Drop a trailing record cut short by a crash so appends start on a fresh line"""
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def read_segment_log(job_id):
+    """Replay a job's log; returns None when the job has no log"""
+    log = _open_log(job_id)
+    if log is None:
+        return None
+    state = {"header": {}, "metadata": {}, "segments": [], "transcribed": False, "status": None, "language": None}
+    with log as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Only the last line can be torn, and only by a crash mid-write
+                break
+            record_type = record.pop("type", None)
+            if record_type == "job":
+                state["header"] = record
+            elif record_type == "metadata":
+                state["metadata"].update(record)
+            elif record_type == "segment":
+                state["segments"].append(record)
+            elif record_type == "language":
+                record.pop("at", None)
+                state["language"] = record
+            elif record_type == "transcribed":
+                state["transcribed"] = True
+            elif record_type in ("complete", "error", "cancelled"):
+                state["status"] = record_type
+                state["error"] = record.get("error")
+            elif record_type in ("resumed", "preempted"):
+                # A resumed job is live again until it records a new outcome
+                state["status"] = None
+    return state
+
+
+def iter_segments(job_id):
+    """Yield a job's persisted segments one at a time without reading the whole log"""
+    log = _open_log(job_id)
+    if log is None:
+        return
+    with log as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if record.pop("type", None) == "segment":
+                yield record
+
+
+def read_log_metadata(job_id):
+    """Title, channel and URL from a job's log, skipping segment records unparsed"""
+    header, metadata = {}, {}
+    log = _open_log(job_id)
+    if log is None:
+        # Removed since the caller checked; report the metadata as unknown
+        return {"title": None, "channel": None, "youtube_url": None}
+    with log as f:
+        for line in f:
+            if line.startswith('{"type": "segment"'):
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if record.get("type") == "job":
+                header = record
+            elif record.get("type") == "metadata":
+                metadata.update(record)
+    return {"title": metadata.get("title"), "channel": metadata.get("channel"), "youtube_url": header.get("url")}
+
+
+def partial_transcript(job_id):
+    """Transcript of whatever segments have been persisted so far"""
+    state = read_segment_log(job_id)
+    if state is None:
+        return None
+    segments = state["segments"]
+    return {
+        "text": " ".join(segment["text"].strip() for segment in segments),
+        "segments": segments,
+        "title": state["metadata"].get("title"),
+        "channel": state["metadata"].get("channel"),
+        "youtube_url": state["header"].get("url"),
+        # The engine's detection once it has run; until then, what the job asked for
+        "language": (state["language"] or {}).get("language") or state["header"].get("language"),
+        "language_probability": (state["language"] or {}).get("probability"),
+        "partial": not state["transcribed"],
+        "transcribed_until": segments[-1]["end"] if segments else 0.0
+    }
+
+
+def remove_segment_log(job_id):
+    """Delete a finished job's log; its saved transcript holds everything the log did"""
+    for path in (segment_log_path(job_id), _compressed_path(job_id)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Bytes read per step when scanning a log backwards for its last record
+TAIL_BLOCK = 4096
+
+
+def _last_record(path):
+    """Last complete record of a log, read from the end of the file"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        tail = b""
+        while position > 0:
+            step = min(TAIL_BLOCK, position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+            lines = tail.split(b"\n")
+            # lines[0] may be cut at the block boundary; a torn final line fails to parse
+            for line in reversed(lines[1:] if position else lines):
+                if not line.strip():
+                    continue
+                try:
+                    return json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+            tail = lines[0]
+    return None
+
+
+def log_status(job_id):
+    """(header, outcome) of a job's log from its first and last records, without replaying it"""
+    path = segment_log_path(job_id)
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.readline()
+    try:
+        header = json.loads(first)
+    except json.JSONDecodeError:
+        return {}, None
+    if header.get("type") != "job":
+        return {}, None
+    last = _last_record(path) or {}
+    outcome = last.get("type")
+    return header, outcome if outcome in ("complete", "error", "cancelled") else None
+
+
+def find_interrupted_jobs():
+    """Job IDs whose log shows neither completion nor failure.
+
+    Only the first and last line of each log are read. Logs of completed jobs
+    left behind by an older version are deleted on the way.
+    """
+    interrupted = []
+    for filename in os.listdir(SEGMENT_DIR):
+        if not filename.endswith(".jsonl"):
+            continue
+        job_id = filename[:-6]
+        try:
+            header, outcome = log_status(job_id)
+            if outcome == "complete":
+                remove_segment_log(job_id)
+                continue
+        except OSError as e:
+            logger.warning(f"Could not read segment log for {job_id}: {str(e)}")
+            continue
+        if outcome is None and header.get("url"):
+            interrupted.append(job_id)
+    return interrupted
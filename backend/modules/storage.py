@@ -0,0 +1,366 @@
+import os
+import io
+import gzip
+import json
+import time
+import tempfile
+import threading
+from config import (logger, active_jobs, AUDIO_DIR, TRANSCRIPT_DIR, NOTES_DIR, TRACE_DIR, SEGMENT_DIR,
+                    DOCUMENT_DIR, EXPORT_DIR, SEARCH_DB, AUDIO_QUOTA_BYTES, COLD_AFTER_SECONDS, STORAGE_SWEEP_SECONDS)
+from modules.job_store import TERMINAL_STATES
+from modules.segment_log import log_status, compress_segment_log, remove_segment_log
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compressed variants in order of preference; reads accept any of them
+COMPRESSED_SUFFIXES = [".json.zst", ".json.gz"] if zstandard else [".json.gz"]
+JSON_SUFFIXES = [".json", ".json.zst", ".json.gz", ".json.br"]
+# HTTP-servable copies written next to each artifact, keyed by Content-Encoding
+PRECOMPRESSED_SUFFIXES = {"br": ".json.br", "gzip": ".json.gz"} if brotli else {"gzip": ".json.gz"}
+
+# Artifact classes reported by storage_usage()
+ARTIFACT_DIRS = {
+    "audio": AUDIO_DIR,
+    "transcripts": TRANSCRIPT_DIR,
+    "notes": NOTES_DIR,
+    "documents": DOCUMENT_DIR,
+    "segments": SEGMENT_DIR,
+    "exports": EXPORT_DIR,
+    "traces": TRACE_DIR
+}
+
+_sweep_lock = threading.Lock()
+_sweeper = None
+
+
+def artifact_path(directory, job_id):
+    """Path of a job's JSON artifact in whichever form it is stored, or None"""
+    for suffix in JSON_SUFFIXES:
+        path = os.path.join(directory, f"{job_id}{suffix}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def artifact_job_id(filename):
+    """Job ID for a JSON artifact filename, or None for other files"""
+    for suffix in JSON_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return None
+
+
+def artifact_job_ids(directory):
+    """Job IDs with an artifact in directory, counting each job once whatever its stored forms"""
+    return sorted({job_id for job_id in map(artifact_job_id, os.listdir(directory)) if job_id is not None})
+
+
+def read_artifact_bytes(path):
+    """Raw JSON bytes of an artifact in any stored form"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read()
+    if path.endswith(".gz"):
+        return gzip.decompress(data)
+    if path.endswith(".br"):
+        if brotli is None:
+            raise RuntimeError(f"{path} is brotli-compressed but brotli is not installed")
+        return brotli.decompress(data)
+    return data
+
+
+def open_artifact(path):
+    """Binary file object yielding an artifact's raw JSON, decompressing as it is read"""
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    if path.endswith(".gz"):
+        return gzip.open(path, 'rb')
+    if path.endswith(".br"):
+        # brotli has no file interface; .br copies sit next to a plain or gzip copy anyway
+        return io.BytesIO(read_artifact_bytes(path))
+    return open(path, 'rb')
+
+
+def read_json_artifact(directory, job_id):
+    """Load a job's transcript or notes, decompressing cold files transparently"""
+    path = artifact_path(directory, job_id)
+    if path is None:
+        return None
+    return json.loads(read_artifact_bytes(path))
+
+
+def _write_bytes(path, data, times_ns=None):
+    # A unique temporary name, so concurrent writers of the same artifact never share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        if times_ns is not None:
+            os.utime(tmp_path, ns=times_ns)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _encode(raw, suffix):
+    if suffix == ".json.zst":
+        return zstandard.ZstdCompressor(level=10).compress(raw)
+    if suffix == ".json.br":
+        return brotli.compress(raw, quality=9)
+    return gzip.compress(raw, compresslevel=9)
+
+
+def write_json_artifact(directory, job_id, data, precompress=True):
+    """Write a job's artifact plus its precompressed HTTP variants, replacing older copies.
+
+    The variants share the artifact's mtime, which is what its ETag is built from.
+    """
+    path = os.path.join(directory, f"{job_id}.json")
+    raw = json.dumps(data).encode('utf-8')
+    _write_bytes(path, raw)
+    stat = os.stat(path)
+    for suffix in JSON_SUFFIXES[1:]:
+        stale = os.path.join(directory, f"{job_id}{suffix}")
+        if os.path.exists(stale):
+            os.remove(stale)
+    for suffix in PRECOMPRESSED_SUFFIXES.values() if precompress else ():
+        # Compressed once at write time; every later request sends the bytes as they are
+        _write_bytes(os.path.join(directory, f"{job_id}{suffix}"), _encode(raw, suffix),
+                     (stat.st_atime_ns, stat.st_mtime_ns))
+    return path
+
+
+def servable_variants(directory, job_id):
+    """Return (mtime, {encoding: path}) for the copies of an artifact that can be sent as-is.
+
+    The "identity" entry is missing once a cold artifact has lost its plain copy.
+    A compressed copy older than the plain file (e.g. a live transcript rewritten
+    in place) is ignored.
+    """
+    plain = os.path.join(directory, f"{job_id}.json")
+    try:
+        mtime = os.stat(plain).st_mtime_ns
+        variants = {"identity": plain}
+    except OSError:
+        mtime = None
+        variants = {}
+    # Cold compression may also have left a zstd copy, which current browsers accept too
+    for encoding, suffix in list(PRECOMPRESSED_SUFFIXES.items()) + [("zstd", ".json.zst")]:
+        path = os.path.join(directory, f"{job_id}{suffix}")
+        try:
+            variant_mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        if mtime is None:
+            mtime = variant_mtime
+        if variant_mtime == mtime:
+            variants[encoding] = path
+    return mtime, variants
+
+
+def _is_busy(job_id):
+    job = active_jobs.get(job_id)
+    return job is not None and job.get("status") not in TERMINAL_STATES
+
+
+def compress_file(path):
+    """Compress a JSON artifact in place, keeping its modification time"""
+    suffix = COMPRESSED_SUFFIXES[0]
+    target = path[:-len(".json")] + suffix
+    with open(path, 'rb') as f:
+        raw = f.read()
+    packed = _encode(raw, suffix)
+    stat = os.stat(path)
+    _write_bytes(target, packed, (stat.st_atime_ns, stat.st_mtime_ns))
+    os.remove(path)
+    return len(raw) - len(packed)
+
+
+def compress_cold_artifacts(now=None):
+    """Compress transcripts, notes, documents, traces and segment logs untouched for COLD_AFTER_SECONDS.
+
+    Returns bytes saved.
+    """
+    now = now or time.time()
+    saved = 0
+    for directory in (TRANSCRIPT_DIR, NOTES_DIR, DOCUMENT_DIR, TRACE_DIR):
+        for filename in os.listdir(directory):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(directory, filename)
+            job_id = filename[:-len(".json")]
+            try:
+                if now - os.path.getmtime(path) < COLD_AFTER_SECONDS or _is_busy(job_id):
+                    continue
+                _, variants = servable_variants(directory, job_id)
+                if len(variants) > 1:
+                    # The precompressed HTTP copies already hold the data; the plain one is redundant
+                    saved += os.path.getsize(path)
+                    os.remove(path)
+                    continue
+                saved += compress_file(path)
+            except OSError as e:
+                logger.warning(f"Could not compress {path}: {str(e)}")
+    saved += _compress_cold_logs(now)
+    if saved:
+        logger.info(f"Compressed cold artifacts, saved {saved / 1024 / 1024:.1f} MB")
+    return saved
+
+
+def _compress_cold_logs(now):
+    """Compress the logs of failed and cancelled jobs; interrupted jobs still resume from theirs"""
+    saved = 0
+    for filename in os.listdir(SEGMENT_DIR):
+        if not filename.endswith(".jsonl"):
+            continue
+        path = os.path.join(SEGMENT_DIR, filename)
+        job_id = filename[:-len(".jsonl")]
+        try:
+            if now - os.path.getmtime(path) < COLD_AFTER_SECONDS or _is_busy(job_id):
+                continue
+            _, outcome = log_status(job_id)
+            if outcome == "complete":
+                saved += os.path.getsize(path)
+                remove_segment_log(job_id)
+            elif outcome in ("error", "cancelled"):
+                saved += compress_segment_log(job_id)
+        except OSError as e:
+            logger.warning(f"Could not compress {path}: {str(e)}")
+    return saved
+
+
+def evict_cold_exports(now=None):
+    """Delete subtitle and text exports unused for COLD_AFTER_SECONDS; returns files evicted.
+
+    Exports are caches: the next request rebuilds them from the transcript.
+    """
+    now = now or time.time()
+    evicted = 0
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            stat = entry.stat()
+            # Interrupted writes leave .tmp files that nothing reads
+            if now - max(stat.st_atime, stat.st_mtime) < COLD_AFTER_SECONDS:
+                continue
+            os.remove(entry.path)
+            evicted += 1
+        except OSError as e:
+            logger.warning(f"Could not evict {entry.path}: {str(e)}")
+    if evicted:
+        logger.info(f"Evicted {evicted} cold exports")
+    return evicted
+
+
+def touch_audio(job_id):
+    """Mark a job's audio as recently used so LRU eviction keeps it"""
+    path = os.path.join(AUDIO_DIR, f"{job_id}.mp3")
+    if os.path.exists(path):
+        os.utime(path)
+
+
+def evict_audio(quota=None):
+    """Delete least recently used audio until AUDIO_DIR fits its quota; returns files evicted"""
+    quota = AUDIO_QUOTA_BYTES if quota is None else quota
+    entries = []
+    total = 0
+    for filename in os.listdir(AUDIO_DIR):
+        path = os.path.join(AUDIO_DIR, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        total += stat.st_size
+        job_id = filename.split('.')[0]
+        if not _is_busy(job_id):
+            # relatime mounts update atime lazily, so count writes and touch_audio() as use too
+            entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= quota:
+            break
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not evict {path}: {str(e)}")
+            continue
+        total -= size
+        evicted += 1
+    if evicted:
+        logger.info(f"Evicted {evicted} audio files; audio cache now {total / 1024 / 1024:.1f} MB")
+    return evicted
+
+
+def _directory_usage(directory):
+    files = 0
+    size = 0
+    compressed = 0
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            files += 1
+            size += entry.stat().st_size
+            if entry.name.endswith((".zst", ".gz")):
+                compressed += 1
+    return {"files": files, "bytes": size, "compressed_files": compressed}
+
+
+def storage_usage():
+    """Disk usage per artifact class plus the audio quota"""
+    usage = {name: _directory_usage(directory) for name, directory in ARTIFACT_DIRS.items()}
+    search_bytes = sum(os.path.getsize(SEARCH_DB + suffix) for suffix in ("", "-wal", "-shm")
+                       if os.path.exists(SEARCH_DB + suffix))
+    usage["search_index"] = {"files": 1 if search_bytes else 0, "bytes": search_bytes, "compressed_files": 0}
+    return {
+        "artifacts": usage,
+        "total_bytes": sum(entry["bytes"] for entry in usage.values()),
+        "audio_quota_bytes": AUDIO_QUOTA_BYTES,
+        "cold_after_seconds": COLD_AFTER_SECONDS,
+        "compression": COMPRESSED_SUFFIXES[0].rsplit(".", 1)[-1]
+    }
+
+
+def run_maintenance():
+    """One sweep: expire finished jobs from memory, enforce the audio quota, drop cold exports and
+    compress cold artifacts"""
+    with _sweep_lock:
+        return {
+            "jobs_evicted": active_jobs.evict_expired(),
+            "audio_evicted": evict_audio(),
+            "exports_evicted": evict_cold_exports(),
+            "bytes_saved": compress_cold_artifacts()
+        }
+
+
+def _sweep_loop():
+    while True:
+        try:
+            run_maintenance()
+        except Exception as e:
+            logger.error(f"Storage maintenance failed: {str(e)}", exc_info=True)
+        time.sleep(STORAGE_SWEEP_SECONDS)
+
+
+def start_storage_sweeper():
+    """Run storage maintenance periodically in a background thread"""
+    global _sweeper
+    if _sweeper is None or not _sweeper.is_alive():
+        _sweeper = threading.Thread(target=_sweep_loop, name="storage-sweeper", daemon=True)
+        _sweeper.start()
+    return _sweeper
@@ -1,12 +1,21 @@
 import re
-from nltk.tokenize import sent_tokenize
-from config import logger
+import time
+import queue
+import threading
+from config import logger, active_jobs, LANGUAGE_SAMPLE_COUNT, LANGUAGE_SAMPLE_CHARS
 import config  # Import the entire config module
-from modules.utils import similar, get_model_path
-import langdetect
-import config
-from transformers import MBartForConditionalGeneration, MBartTokenizer
+from modules.utils import similar, get_model_path, sent_tokenize
 from modules.models import load_summarizer
+from modules.metrics import MODEL_LOAD_DURATION, record_cache
+from modules.tracing import span, current_job_id, bind_job
+from modules.cancellation import check_cancelled, JobCancelled
+from modules.document import Document
+
+# Room left in the summarizer's input window for special tokens and task prefixes
+INPUT_TOKEN_MARGIN = 16
+
+# Sections in the extractive preview notes
+PREVIEW_SECTIONS = 8
 
 # Dictionary of language-specific markers for content analysis
 LANGUAGE_MARKERS = {
@@ -31,16 +40,25 @@ LANGUAGE_MARKERS = {
     }
 }
 
+# Selectable summarizers that go through generate_multilingual_notes
+MULTILINGUAL_MODELS = ["ai4bharat/IndicBART", "google/mt5-base", "facebook/mbart-large-50-one-to-many-mmt"]
+
 # Global multilingual model cache
 multilingual_summarizers = {}
 
 # Update the model options for better Hindi and Bengali support
 def load_multilingual_summarizer(language):
     """Load or retrieve language-specific summarization model"""
+    record_cache("multilingual-summarizer", language in multilingual_summarizers)
     if language not in multilingual_summarizers:
         logger.info(f"Loading multilingual summarizer for {language}")
+        load_started = time.perf_counter()
         
         try:
+            from transformers import MBartForConditionalGeneration, MBartTokenizer
+            from modules.hardware import apply_torch_threads
+            apply_torch_threads()
+            
             # Get model path for storing models
             model_path = get_model_path("summarizers")
             
@@ -75,6 +93,7 @@ def load_multilingual_summarizer(language):
                 'tokenizer': tokenizer,
                 'model_type': 'mt5' if 'mt5' in model_name else 'mbart'
             }
+            MODEL_LOAD_DURATION.observe(time.perf_counter() - load_started, kind="multilingual-summarizer", model=model_name)
             logger.info(f"Successfully loaded {model_name} model for {language}")
             
         except Exception as e:
@@ -83,38 +102,408 @@ def load_multilingual_summarizer(language):
     
     return multilingual_summarizers.get(language)
 
+def _language_samples(text, count, size):
+    """Up to count evenly spaced excerpts of about size characters, cut at word boundaries"""
+    if len(text) <= count * size:
+        return [text]
+    step = len(text) // count
+    samples = []
+    for i in range(count):
+        start = text.find(" ", i * step) + 1
+        end = text.rfind(" ", start, start + size)
+        samples.append(text[start:end if end > start else start + size])
+    return samples
+
 def detect_language(text):
-    """Detect language of the text"""
-    try:
-        return langdetect.detect(text)
-    except:
-        return "en"  # Default to English if detection fails
+    """Detect language of the text from a few excerpts; cached on the bound job"""
+    job_id = current_job_id()
+    job = active_jobs.get(job_id) if job_id else None
+    if job and job.get("text_language"):
+        return job["text_language"]
+    samples = _language_samples(text, LANGUAGE_SAMPLE_COUNT, LANGUAGE_SAMPLE_CHARS)
+    with span("detect_language", chars=len(text), samples=len(samples)):
+        try:
+            import langdetect
+            # Seeded, so the same transcript always gets the same answer
+            langdetect.DetectorFactory.seed = 0
+            votes = {}
+            for sample in samples:
+                try:
+                    detected = langdetect.detect(sample)
+                except langdetect.LangDetectException:
+                    continue
+                votes[detected] = votes.get(detected, 0) + 1
+            language = max(votes, key=votes.get) if votes else "en"
+        except Exception:
+            language = "en"  # Default to English if detection fails
+    if job_id in active_jobs:
+        active_jobs.update(job_id, text_language=language)
+    return language
 
-def extract_important_sentences(transcript, language="en"):
-    """Extract important sentences directly from transcript with language support"""
+def extract_important_sentences(document, language="en"):
+    """Extract important sentences directly from the transcript's document with language support"""
     # Get language-specific markers or fall back to English
     language_data = LANGUAGE_MARKERS.get(language, LANGUAGE_MARKERS["en"])
     important_markers = language_data["important_phrases"]
     
-    sentences = sent_tokenize(transcript)
     important_sentences = []
     
-    for sentence in sentences:
-        lower_sentence = sentence.lower()
-        
+    for sentence in document.sentences:
         # Check if the sentence contains any important markers
-        if any(marker in lower_sentence for marker in important_markers):
-            important_sentences.append(sentence)
+        if any(marker in sentence["lower"] for marker in important_markers):
+            important_sentences.append(sentence["text"])
             
         # Also include sentences that are within a good information density range
-        elif 100 <= len(sentence) <= 200 and len(sentence.split()) >= 10:
-            important_sentences.append(sentence)
+        elif 100 <= len(sentence["text"]) <= 200 and sentence["tokens"] >= 10:
+            important_sentences.append(sentence["text"])
+        
+        # Limit to 5 sentences to avoid overwhelming the key points section
+        if len(important_sentences) == 5:
+            break
     
-    # Limit to 5 sentences to avoid overwhelming the key points section
-    return important_sentences[:5]
+    return important_sentences
+
+def _sentence_score(sentence, important_markers):
+    """extract_important_sentences' criteria as a score: marker hits, plus one for informative length"""
+    score = 2 * sum(1 for marker in important_markers if marker in sentence["lower"])
+    if 100 <= len(sentence["text"]) <= 200 and sentence["tokens"] >= 10:
+        score += 1
+    return score
+
+def generate_preview_notes(document, language="en", section_count=PREVIEW_SECTIONS):
+    """Extractive notes built from the document in milliseconds, served until the summarizer finishes.
+
+    The document is cut into up to section_count equal runs of sentences; each
+    run's best-scoring sentence becomes that section's summary.
+    """
+    language_data = LANGUAGE_MARKERS.get(language, LANGUAGE_MARKERS["en"])
+    important_markers = language_data["important_phrases"]
+    sentences = document.sentences
+    scores = [_sentence_score(sentence, important_markers) for sentence in sentences]
+    
+    sections = []
+    if sentences:
+        size = -(-len(sentences) // section_count)
+        for first in range(0, len(sentences), size):
+            run = range(first, min(first + size, len(sentences)))
+            best = max(run, key=lambda i: (scores[i], sentences[i]["tokens"]))
+            sections.append({
+                "start": sentences[run[0]].get("start"),
+                "end": sentences[run[-1]].get("end"),
+                "summary": sentences[best]["text"]
+            })
+    
+    # Highest-scoring sentences, kept in transcript order
+    ranked = sorted((i for i in range(len(sentences)) if scores[i] > 0), key=lambda i: -scores[i])
+    key_points = []
+    for i in sorted(ranked[:20]):
+        if not any(similar(sentences[i]["text"], existing, threshold=0.7) for existing in key_points):
+            key_points.append(sentences[i]["text"])
+    if not key_points:
+        key_points = ["Key points will appear when the summary is ready."]
+    
+    return {
+        "summary": " ".join(section["summary"] for section in sections) or document.text[:1000],
+        "sections": sections,
+        "key_points": key_points[:10],
+        "original_transcript": document.text
+    }
+
+def summarizer_input_limit(tokenizer, default=1024):
+    """Tokens a chunk may hold: the tokenizer's input limit minus room for special tokens and prefixes"""
+    limit = getattr(tokenizer, "model_max_length", None) or default
+    if limit > 100000:
+        # Tokenizers without a configured limit report a huge sentinel value
+        limit = default
+    return max(64, limit - INPUT_TOKEN_MARGIN)
+
+def _count_tokens(tokenizer, texts):
+    if not texts:
+        return []
+    if tokenizer is None:
+        # Rough subword estimate when no tokenizer is at hand
+        return [int(len(text.split()) * 4 / 3) + 1 for text in texts]
+    return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+def _segment_aligned_units(document):
+    """Group sentences into runs that start and end on transcript segment boundaries"""
+    units = []
+    for sentence in document.sentences:
+        segments = sentence.get("segments")
+        # A sentence that begins inside the segment the previous one ended in cannot start a new unit
+        if units and segments and units[-1][-1].get("segments") and segments[0] <= units[-1][-1]["segments"][1]:
+            units[-1].append(sentence)
+        else:
+            units.append([sentence])
+    return units
+
+def token_chunks(document, tokenizer, max_tokens):
+    """Pack the document into chunks of at most max_tokens summarizer tokens.
+
+    Chunks break only between transcript segments; a run of sentences longer than
+    max_tokens with no segment boundary inside is split between its sentences.
+    Each chunk carries start/end seconds when the document has timestamps.
+    """
+    counts = _count_tokens(tokenizer, document.sentence_texts)
+    tokens_of = {id(sentence): count for sentence, count in zip(document.sentences, counts)}
+    pieces = []
+    for unit in _segment_aligned_units(document):
+        if sum(tokens_of[id(sentence)] for sentence in unit) > max_tokens:
+            pieces.extend([sentence] for sentence in unit)
+        else:
+            pieces.append(unit)
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = sum(tokens_of[id(sentence)] for sentence in piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append(_make_chunk(current, current_tokens))
+            current, current_tokens = [], 0
+        current.extend(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append(_make_chunk(current, current_tokens))
+    return chunks
+
+def _make_chunk(sentences, tokens):
+    return {
+        "text": " ".join(sentence["text"] for sentence in sentences),
+        "tokens": tokens,
+        "start": sentences[0].get("start"),
+        "end": sentences[-1].get("end")
+    }
+
+def _section(chunk, summary):
+    return {"start": chunk["start"], "end": chunk["end"], "summary": summary}
+
+def summary_params():
+    """Generation parameters for the loaded summarizer; returns (model_type, params)"""
+    # Try to detect model type for optimized parameters
+    model_type = "unknown"
+    try:
+        model_type = config.summarizer.model.config.model_type.lower()
+        logger.info(f"Using summarization model type: {model_type}")
+    except Exception as e:
+        logger.warning(f"Could not determine model type: {str(e)}")
+
+    # Prepare parameters based on model type
+    if "t5" in model_type:
+        params = {
+            "max_length": 150,
+            "min_length": 30,
+            "do_sample": False,
+            "truncation": True
+        }
+    else:  # bart, etc.
+        params = {
+            "max_length": 150,
+            "min_length": 30,
+            "do_sample": True,
+            "temperature": 1.0,
+            "num_beams": 4,
+            "truncation": True
+        }
+    return model_type, params
+
+def _summarize_document(document):
+    """Summarize the document chunk by chunk; returns (summaries, sections, successful batches), or None if too short"""
+    # Fill each chunk up to the summarizer's real input window, breaking only between segments
+    tokenizer = getattr(config.summarizer, "tokenizer", None)
+    chunks = token_chunks(document, tokenizer, summarizer_input_limit(tokenizer))
+
+    # Skip very short chunks and process in batches for efficiency
+    valid_chunks = [chunk for chunk in chunks if len(chunk["text"]) >= 50]
+
+    # Log information for debugging
+    logger.info(f"Processing {len(valid_chunks)} chunks for summarization")
+    if len(valid_chunks) == 0:
+        logger.warning("No valid chunks found for summarization")
+        return None
+
+    # Process in small batches to avoid OOM errors
+    batch_size = 2
+    batched_chunks = [valid_chunks[i:i+batch_size] for i in range(0, len(valid_chunks), batch_size)]
+
+    # Log batching information
+    logger.info(f"Created {len(batched_chunks)} batches of size {batch_size}")
+
+    all_summaries = []
+    sections = []
+    successful_batches = 0
+
+    # Use a try-except block for the entire batch processing to avoid partial failures
+    try:
+        # Double check the summarizer again - IMPORTANT: use config.summarizer instead of reimporting
+        if not callable(config.summarizer):
+            raise ValueError("Summarizer is not properly initialized")
+
+        model_type, params = summary_params()
+            
+        # Process all batches with a single parameter set
+        for batch_idx, batch in enumerate(batched_chunks):
+            check_cancelled()
+            try:
+                logger.info(f"Processing batch {batch_idx+1}/{len(batched_chunks)}")
+                with span("summarize_batch", batch=batch_idx + 1, batch_size=len(batch), model_type=model_type):
+                    summaries = config.summarizer([chunk["text"] for chunk in batch], **params)
+                all_summaries.extend([s['summary_text'] for s in summaries])
+                sections.extend(_section(chunk, s['summary_text']) for chunk, s in zip(batch, summaries))
+                successful_batches += 1
+                logger.info(f"Successfully processed batch {batch_idx+1}")
+            except Exception as batch_error:
+                logger.error(f"Error in batch summarization for batch {batch_idx+1}: {str(batch_error)}")
+                continue
+
+    except Exception as e:
+        logger.error(f"Error during summarization: {str(e)}")
+        # If we have no summaries at this point, try a fallback approach
+        if len(all_summaries) == 0:
+            try:
+                # Try once more with a direct approach on smaller chunks
+                logger.info("Attempting fallback summarization with single chunks")
+                for chunk in valid_chunks[:3]:  # Only try first few chunks
+                    try:
+                        result = config.summarizer(chunk["text"], max_length=100, min_length=20, truncation=True)
+                        all_summaries.append(result[0]['summary_text'])
+                        sections.append(_section(chunk, result[0]['summary_text']))
+                    except:
+                        continue
+            except:
+                pass
+    
+    return all_summaries, sections, successful_batches
+
+def _merge_summaries(summaries):
+    """The notes' summary: section summaries joined, or condensed by one more
+    summarization pass when together they overflow the summarizer's input"""
+    tokenizer = getattr(config.summarizer, "tokenizer", None)
+    limit = summarizer_input_limit(tokenizer)
+    counts = _count_tokens(tokenizer, summaries)
+    if sum(counts) <= limit:
+        return " ".join(summaries)
+    groups = []
+    current, current_tokens = [], 0
+    for summary, count in zip(summaries, counts):
+        if current and current_tokens + count > limit:
+            groups.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(summary)
+        current_tokens += count
+    groups.append(" ".join(current))
+    model_type, params = summary_params()
+    merged = []
+    try:
+        with span("summarize_merge", summaries=len(summaries), groups=len(groups), model_type=model_type):
+            # Same batch size as the chunk pass, to stay within memory
+            for i in range(0, len(groups), 2):
+                check_cancelled()
+                merged.extend(s['summary_text'] for s in config.summarizer(groups[i:i+2], **params))
+    except Exception as e:
+        logger.error(f"Merging section summaries failed, joining them instead - {str(e)}")
+        return " ".join(summaries)
+    return " ".join(merged)
+
+class StreamingSummarizer:
+    """Summarize a transcript chunk by chunk while its segments are still being produced.
+
+    Segments are packed into chunks of at most summarizer_input_limit tokens,
+    breaking only between segments, and each chunk is summarized on a background
+    thread as soon as the next segment no longer fits. finish() returns the
+    sections for generate_notes, or None when any chunk failed.
+    """
+
+    def __init__(self, job_id, language=None):
+        self.job_id = job_id
+        self.language = language
+        self.summarizer = config.summarizer
+        self.tokenizer = getattr(self.summarizer, "tokenizer", None)
+        self.max_tokens = summarizer_input_limit(self.tokenizer)
+        self.model_type, self.params = summary_params()
+        self.sections = []
+        self.failed = False
+        self._pending = []
+        self._pending_tokens = 0
+        self._segments = queue.Queue()
+        self._aborted = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"summarize-{job_id}", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def start(cls, job_id, language=None):
+        """Return a streaming summarizer for the job, or None when notes will not use the default summarizer"""
+        if not config.STREAMING_SUMMARY or not callable(config.summarizer):
+            return None
+        if config.current_summarizer_model in MULTILINGUAL_MODELS or language in ['hi', 'bn']:
+            return None
+        return cls(job_id, language)
+
+    def add_segment(self, segment):
+        self._segments.put(segment)
+
+    def finish(self):
+        """Summarize the last partial chunk and wait for all chunks; returns the sections or None"""
+        self._segments.put(None)
+        self._thread.join()
+        if self.failed or self._aborted.is_set():
+            return None
+        logger.info(f"Job {self.job_id}: {len(self.sections)} sections summarized during transcription")
+        return self.sections
+
+    def abort(self):
+        """Stop summarizing; a chunk already running on the model finishes in the background"""
+        self._aborted.set()
+        self._segments.put(None)
+
+    def _run(self):
+        with bind_job(self.job_id):
+            while True:
+                segment = self._segments.get()
+                if segment is None:
+                    self._flush()
+                    return
+                if self._aborted.is_set() or self.failed:
+                    continue
+                # Counting tokens here keeps the tokenizer on one thread
+                tokens = _count_tokens(self.tokenizer, [segment["text"].strip()])[0]
+                if self._pending and self._pending_tokens + tokens > self.max_tokens:
+                    self._flush()
+                self._pending.append(segment)
+                self._pending_tokens += tokens
 
-def generate_notes(transcript, language=None):
-    """Generate summary notes from transcript with language support"""
+    def _flush(self):
+        pending, tokens = self._pending, self._pending_tokens
+        self._pending, self._pending_tokens = [], 0
+        if not pending or self._aborted.is_set() or self.failed:
+            return
+        chunk = {
+            "text": " ".join(segment["text"].strip() for segment in pending),
+            "tokens": tokens,
+            "start": pending[0]["start"],
+            "end": pending[-1]["end"]
+        }
+        # Matches the minimum chunk length generate_notes summarizes
+        if len(chunk["text"]) < 50:
+            return
+        try:
+            check_cancelled(self.job_id)
+            with span("summarize_chunk", tokens=tokens, model_type=self.model_type, streaming=True):
+                summary = self.summarizer(chunk["text"], **self.params)[0]['summary_text']
+            self.sections.append(_section(chunk, summary))
+        except JobCancelled:
+            self._aborted.set()
+        except Exception as e:
+            # generate_notes summarizes the whole document again instead
+            logger.error(f"Job {self.job_id}: Streaming summarization failed - {str(e)}")
+            self.failed = True
+
+def generate_notes(transcript, language=None, document=None, sections=None):
+    """Generate summary notes from transcript with language support.
+
+    document is the transcript's shared Document; it is built here when not given.
+    sections, when given, are chunk summaries already produced by a StreamingSummarizer.
+    """
     logger.info(f"Generating notes from transcript in language: {language or 'auto-detect'}")
     
     # Detect language if not specified
@@ -122,12 +511,15 @@ def generate_notes(transcript, language=None):
         language = detect_language(transcript)
         logger.info(f"Detected language: {language}")
     
+    if document is None:
+        document = Document.build(transcript, language=language)
+    
     # Always respect the user's explicitly chosen model
     if config.current_summarizer_model:
         logger.info(f"Using user-selected model: {config.current_summarizer_model}")
         
         # Load the specifically selected model
-        if config.current_summarizer_model in ["ai4bharat/IndicBART", "google/mt5-base", "facebook/mbart-large-50-one-to-many-mmt"]:
+        if config.current_summarizer_model in MULTILINGUAL_MODELS:
             multilingual_model = load_multilingual_summarizer(language)
             if multilingual_model:
                 # Log a notice if the selected model isn't ideal for the detected language
@@ -136,7 +528,7 @@ def generate_notes(transcript, language=None):
                 elif config.current_summarizer_model == "google/mt5-base" and language != "bn":
                     logger.info(f"Note: MT5 is optimized for Bengali but using it for {language} as requested")
                 
-                return generate_multilingual_notes(transcript, language, multilingual_model)
+                return generate_multilingual_notes(transcript, language, multilingual_model, document)
     
     # Previous conditional checks if no specific model was selected
     # Now only reached if user hasn't explicitly chosen a model or if loading that model failed
@@ -146,7 +538,7 @@ def generate_notes(transcript, language=None):
         logger.info(f"No specific model selected, choosing appropriate model for {language}")
         multilingual_model = load_multilingual_summarizer(language)
         if multilingual_model:
-            return generate_multilingual_notes(transcript, language, multilingual_model)
+            return generate_multilingual_notes(transcript, language, multilingual_model, document)
     
     # For English or other languages supported by the default summarizer
     logger.info("Generating notes from transcript")
@@ -175,105 +567,20 @@ def generate_notes(transcript, language=None):
                     "original_transcript": transcript
                 }
         
-        # Optimize for performance by creating smarter chunks
-        sentences = sent_tokenize(transcript)
-        chunks = []
-        current_chunk = ""
-        
-        # Create chunks of roughly 900-1000 characters for summarization
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) < 900:
-                current_chunk += " " + sentence
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        # Skip very short chunks and process in batches for efficiency
-        valid_chunks = [chunk for chunk in chunks if len(chunk) >= 50]
-        
-        # Log information for debugging
-        logger.info(f"Processing {len(valid_chunks)} chunks for summarization")
-        if len(valid_chunks) == 0:
-            logger.warning("No valid chunks found for summarization")
-            return {
-                "summary": transcript[:1000] + "...",
-                "key_points": ["Transcript too short for key point extraction."],
-                "original_transcript": transcript
-            }
-        
-        # Process in small batches to avoid OOM errors
-        batch_size = 2
-        batched_chunks = [valid_chunks[i:i+batch_size] for i in range(0, len(valid_chunks), batch_size)]
-        
-        # Log batching information
-        logger.info(f"Created {len(batched_chunks)} batches of size {batch_size}")
-        
-        all_summaries = []
-        successful_batches = 0
-        
-        # Use a try-except block for the entire batch processing to avoid partial failures
-        try:
-            # Double check the summarizer again - IMPORTANT: use config.summarizer instead of reimporting
-            if not callable(config.summarizer):
-                raise ValueError("Summarizer is not properly initialized")
-                
-            # Try to detect model type for optimized parameters
-            model_type = "unknown"
-            try:
-                model_type = config.summarizer.model.config.model_type.lower()
-                logger.info(f"Using summarization model type: {model_type}")
-            except Exception as e:
-                logger.warning(f"Could not determine model type: {str(e)}")
-            
-            # Prepare parameters based on model type
-            if "t5" in model_type:
-                params = {
-                    "max_length": 150,
-                    "min_length": 30,
-                    "do_sample": False,
-                    "truncation": True
-                }
-            else:  # bart, etc.
-                params = {
-                    "max_length": 150,
-                    "min_length": 30,
-                    "do_sample": True,
-                    "temperature": 1.0,
-                    "num_beams": 4,
-                    "truncation": True
+        if sections:
+            # Chunks were already summarized while the audio was being transcribed
+            logger.info(f"Using {len(sections)} section summaries produced during transcription")
+            all_summaries = [section["summary"] for section in sections]
+            successful_batches = len(sections)
+        else:
+            summarized = _summarize_document(document)
+            if summarized is None:
+                return {
+                    "summary": transcript[:1000] + "...",
+                    "key_points": ["Transcript too short for key point extraction."],
+                    "original_transcript": transcript
                 }
-                
-            # Process all batches with a single parameter set
-            for batch_idx, batch in enumerate(batched_chunks):
-                try:
-                    logger.info(f"Processing batch {batch_idx+1}/{len(batched_chunks)}")
-                    summaries = config.summarizer(batch, **params)
-                    all_summaries.extend([s['summary_text'] for s in summaries])
-                    successful_batches += 1
-                    logger.info(f"Successfully processed batch {batch_idx+1}")
-                except Exception as batch_error:
-                    logger.error(f"Error in batch summarization for batch {batch_idx+1}: {str(batch_error)}")
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"Error during summarization: {str(e)}")
-            # If we have no summaries at this point, try a fallback approach
-            if len(all_summaries) == 0:
-                try:
-                    # Try once more with a direct approach on smaller chunks
-                    logger.info("Attempting fallback summarization with single chunks")
-                    for chunk in valid_chunks[:3]:  # Only try first few chunks
-                        try:
-                            result = config.summarizer(chunk, max_length=100, min_length=20, truncation=True)
-                            all_summaries.append(result[0]['summary_text'])
-                        except:
-                            continue
-                except:
-                    pass
+            all_summaries, sections, successful_batches = summarized
         
         if len(all_summaries) == 0:
             logger.error("No summaries were generated successfully")
@@ -328,7 +635,7 @@ def generate_notes(transcript, language=None):
         if len(unique_points) < 3:
             logger.info("Not enough key points extracted, falling back to direct transcript extraction")
             # Extract some sentences directly from transcript
-            important_sentences = extract_important_sentences(transcript)
+            important_sentences = extract_important_sentences(document)
             for sentence in important_sentences:
                 if not any(similar(sentence, existing, threshold=0.7) for existing in unique_points):
                     unique_points.append(sentence)
@@ -338,7 +645,9 @@ def generate_notes(transcript, language=None):
             unique_points = ["No key points could be automatically extracted from this transcript."]
         
         notes = {
-            "summary": " ".join(all_summaries),
+            "summary": _merge_summaries(all_summaries),
+            # The section summaries, each tied to the part of the video it covers
+            "sections": sections,
             "key_points": unique_points[:10],  # Limit to top 10 points
             "original_transcript": transcript
         }
@@ -354,7 +663,7 @@ def generate_notes(transcript, language=None):
             "original_transcript": transcript
         }
 
-def generate_multilingual_notes(transcript, language, model_data):
+def generate_multilingual_notes(transcript, language, model_data, document):
     """Generate notes for non-English languages using specialized models"""
     logger.info(f"Using specialized model for {language} summarization")
     
@@ -364,22 +673,9 @@ def generate_multilingual_notes(transcript, language, model_data):
         model_type = model_data.get('model_type', 'mbart')
         
         # Process in chunks due to token limits
-        chunks = []
-        current_chunk = ""
-        sentences = sent_tokenize(transcript)
-        
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) < 900:
-                current_chunk += " " + sentence
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        chunks = token_chunks(document, tokenizer, summarizer_input_limit(tokenizer))
         
-        valid_chunks = [chunk for chunk in chunks if len(chunk) >= 50]
+        valid_chunks = [chunk for chunk in chunks if len(chunk["text"]) >= 50]
         
         if not valid_chunks:
             return {
@@ -390,43 +686,47 @@ def generate_multilingual_notes(transcript, language, model_data):
             }
         
         all_summaries = []
+        sections = []
         
         # Process differently based on model type
-        for chunk in valid_chunks[:3]:  # Process just a few chunks to avoid overwhelming the model
-            if model_type == 'mt5':
-                # MT5 model processing
-                prefix = "summarize: "
-                inputs = tokenizer(prefix + chunk, return_tensors="pt", max_length=1024, truncation=True)
+        for chunk_idx, chunk in enumerate(valid_chunks[:3]):  # Process just a few chunks to avoid overwhelming the model
+            check_cancelled()
+            with span("summarize_batch", batch=chunk_idx + 1, batch_size=1, model_type=model_type):
+                if model_type == 'mt5':
+                    # MT5 model processing
+                    prefix = "summarize: "
+                    inputs = tokenizer(prefix + chunk["text"], return_tensors="pt", max_length=1024, truncation=True)
                 
-                summary_ids = model.generate(
-                    inputs["input_ids"], 
-                    max_length=150, 
-                    min_length=40,
-                    length_penalty=2.0,
-                    num_beams=4,
-                    early_stopping=True
-                )
+                    summary_ids = model.generate(
+                        inputs["input_ids"], 
+                        max_length=150, 
+                        min_length=40,
+                        length_penalty=2.0,
+                        num_beams=4,
+                        early_stopping=True
+                    )
                 
-                summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-            else:
-                # mBART model processing
-                inputs = tokenizer(chunk, return_tensors="pt", max_length=1024, truncation=True)
+                    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+                else:
+                    # mBART model processing
+                    inputs = tokenizer(chunk["text"], return_tensors="pt", max_length=1024, truncation=True)
                 
-                summary_ids = model.generate(
-                    inputs["input_ids"], 
-                    max_length=150, 
-                    min_length=30,
-                    num_beams=4,
-                    length_penalty=2.0,
-                    early_stopping=True
-                )
+                    summary_ids = model.generate(
+                        inputs["input_ids"], 
+                        max_length=150, 
+                        min_length=30,
+                        num_beams=4,
+                        length_penalty=2.0,
+                        early_stopping=True
+                    )
                 
-                summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+                    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
             
-            all_summaries.append(summary)
+                all_summaries.append(summary)
+                sections.append(_section(chunk, summary))
         
         # Extract key points using language-specific approach
-        key_points = extract_important_sentences(transcript, language)
+        key_points = extract_important_sentences(document, language)
         
         # For Indic languages, we might need additional post-processing
         if language in ['hi', 'bn']:
@@ -446,6 +746,7 @@ def generate_multilingual_notes(transcript, language, model_data):
         
         notes = {
             "summary": " ".join(all_summaries),
+            "sections": sections,
             "key_points": key_points[:10],
             "original_transcript": transcript,
             "language": language
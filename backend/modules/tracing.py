@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from config import logger, active_jobs, TRACE_DIR, SHARED_STATE
+from modules.storage import write_json_artifact, read_json_artifact
+
+# The job whose work is running on the current thread
+_local = threading.local()
+
+PROFILE_INTERVAL = 0.01   # Seconds between profiler samples
+PROFILE_TOP_STACKS = 200  # Distinct stacks kept per profiled stage
+
+
+@contextmanager
+def bind_job(job_id):
+    """Attribute spans recorded on this thread to job_id"""
+    previous = getattr(_local, "job_id", None)
+    _local.job_id = job_id
+    try:
+        yield
+    finally:
+        _local.job_id = previous
+
+
+def current_job_id():
+    """Return the job bound to the current thread, if any"""
+    return getattr(_local, "job_id", None)
+
+
+def record_span(stage, start, end, job_id=None, **attributes):
+    """Append a finished span to the job's trace"""
+    job_id = job_id or current_job_id()
+    job = active_jobs.get(job_id) if job_id else None
+    if job is None:
+        return None
+    entry = {
+        "stage": stage,
+        "start": round(start, 4),
+        "end": round(end, 4),
+        "duration": round(end - start, 4),
+        "attributes": attributes
+    }
+    try:
+        active_jobs.amend(job_id, "trace", lambda spans: spans + (entry,), ())
+    except KeyError:
+        # The job was evicted while the span was open
+        return None
+    if SHARED_STATE:
+        # Records on disk leave traces out; HTTP processes read a running job's spans from here
+        try:
+            with open(_spans_path(job_id), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            logger.warning(f"Job {job_id}: could not persist span {stage} - {str(e)}")
+    return entry
+
+
+def _spans_path(job_id):
+    return os.path.join(TRACE_DIR, f"{job_id}.spans.jsonl")
+
+
+def _read_spans(job_id):
+    spans = []
+    try:
+        with open(_spans_path(job_id), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # A span still being written
+    except FileNotFoundError:
+        return None
+    return spans
+
+
+@contextmanager
+def span(stage, job_id=None, **attributes):
+    """Time a block as a trace span; the yielded dict can receive extra attributes"""
+    attrs = dict(attributes)
+    start = time.time()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs["error"] = str(e)[:200]
+        raise
+    finally:
+        record_span(stage, start, time.time(), job_id=job_id, **attrs)
+
+
+def _collapse(frame):
+    """Render a frame's stack root-first as 'file:function;file:function'"""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class SamplingProfiler:
+    """Periodically sample one thread's Python stack from a background thread"""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = _collapse(frame)
+            self.counts[stack] = self.counts.get(stack, 0) + 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        top = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:PROFILE_TOP_STACKS]
+        return {
+            "interval_ms": int(self.interval * 1000),
+            "samples": self.samples,
+            "stacks": [{"stack": stack, "count": count} for stack, count in top]
+        }
+
+
+@contextmanager
+def profile_stage(stage, job_id=None):
+    """Sample the current thread during the block when the job opted into profiling"""
+    job_id = job_id or current_job_id()
+    job = active_jobs.get(job_id) if job_id else None
+    if not job or not job.get("profile"):
+        yield
+        return
+    profiler = SamplingProfiler(threading.get_ident()).start()
+    try:
+        yield
+    finally:
+        result = profiler.stop()
+        if job_id in active_jobs:
+            active_jobs.amend(job_id, "profiles", lambda profiles: dict(profiles, **{stage: result}), {})
+
+
+def save_trace(job_id):
+    """Persist the job's spans and profiles so they outlive the in-memory job"""
+    job = active_jobs.get(job_id)
+    if not job:
+        return None
+    try:
+        # Replaces any copy a storage sweep compressed, e.g. when a resumed job finishes again
+        trace_path = write_json_artifact(TRACE_DIR, job_id, {"job_id": job_id, "spans": job.get("trace", []),
+                                                             "profiles": job.get("profiles", {})}, precompress=False)
+    except OSError as e:
+        logger.warning(f"Job {job_id}: could not save trace - {str(e)}")
+        return None
+    try:
+        os.remove(_spans_path(job_id))
+    except FileNotFoundError:
+        pass
+    return trace_path
+
+
+def load_trace(job_id):
+    """Return the trace for a job from memory, from the spans a running job has persisted, or from its saved file.
+
+    Profiles are only available from the process running the job, or once it has finished.
+    """
+    job = active_jobs.get(job_id)
+    if job is not None and "trace" in job:
+        return {"job_id": job_id, "spans": list(job.get("trace", [])), "profiles": job.get("profiles", {})}
+    spans = _read_spans(job_id) if SHARED_STATE else None
+    if spans is not None:
+        return {"job_id": job_id, "spans": spans, "profiles": {}}
+    return read_json_artifact(TRACE_DIR, job_id)
@@ -1,18 +1,28 @@
 import os
 import time
-import json
-import threading
-import yt_dlp
-import torch
-import whisper
-from nltk.tokenize import sent_tokenize
-from config import logger, active_jobs, transcription_logs, AUDIO_DIR, TRANSCRIPT_DIR, NOTES_DIR
-from modules.utils import append_transcription_log, formatTime, get_audio_duration, get_model_path
-from modules.summarization import generate_notes
+from config import (logger, active_jobs, transcription_logs, AUDIO_DIR, TRANSCRIPT_DIR, NOTES_DIR,
+                    LANGUAGE_MIN_PROBABILITY, PREVIEW_NOTES)
+from modules.utils import append_transcription_log, formatTime, get_audio_duration
+from modules.models import get_faster_whisper_model
+from modules.hardware import get_execution_profile
+from modules.summarization import generate_notes, generate_preview_notes, StreamingSummarizer
+from modules.document import Document, save_document
+from modules.metrics import STAGE_DURATION, AUDIO_SECONDS, JOBS_FINISHED
+from modules.tracing import bind_job, span, record_span, profile_stage, save_trace
+from modules.search import index_transcript, set_document_status
+from modules.segment_log import SegmentLog, read_segment_log, find_interrupted_jobs, remove_segment_log
+from modules.storage import write_json_artifact, touch_audio
+from modules.admission import record_rtf, remaining_estimate
+from modules.job_store import InvalidTransition
+from modules.cancellation import JobCancelled, check_cancelled, release_resources, CANCELLED, LEASE_LOST
 import config
 
+# Both engines decode audio at 16 kHz
+SAMPLE_RATE = 16000
+
 def download_youtube_audio(youtube_url, job_id):
-    """Download audio from a YouTube video"""
+    """Download audio from a YouTube video; returns the mp3 path and yt-dlp's info dict"""
+    import yt_dlp
     logger.info(f"Job {job_id}: Starting audio download using yt-dlp")
     output_template = os.path.join(AUDIO_DIR, f"{job_id}.%(ext)s")
     ydl_opts = {
@@ -25,13 +35,40 @@ def download_youtube_audio(youtube_url, job_id):
         }],
     }
     
+    # Hooks split the call into the network download and the mp3 re-encode for tracing
+    timings = {"started": time.time()}
+    def progress_hook(d):
+        # Called for every downloaded fragment, so a cancel interrupts the download promptly
+        check_cancelled(job_id)
+        if d.get('status') == 'finished':
+            timings["downloaded"] = time.time()
+            timings["bytes"] = d.get('total_bytes') or d.get('downloaded_bytes')
+    def postprocessor_hook(d):
+        if d.get('postprocessor') == 'ExtractAudio':
+            timings[f"reencode_{d.get('status')}"] = time.time()
+    ydl_opts['progress_hooks'] = [progress_hook]
+    ydl_opts['postprocessor_hooks'] = [postprocessor_hook]
+    
+    # Keep the info dict from the download so the pipeline doesn't need a second metadata request
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([youtube_url])
+        info = ydl.extract_info(youtube_url, download=True)
+    if "downloaded" in timings:
+        record_span("yt_dlp_download", timings["started"], timings["downloaded"], job_id=job_id, bytes=timings.get("bytes"))
+    if "reencode_started" in timings and "reencode_finished" in timings:
+        record_span("mp3_reencode", timings["reencode_started"], timings["reencode_finished"], job_id=job_id)
     logger.info(f"Job {job_id}: Audio downloaded successfully")
-    return os.path.join(AUDIO_DIR, f"{job_id}.mp3")
+    return os.path.join(AUDIO_DIR, f"{job_id}.mp3"), info or {}
+
+def transcribe_audio(audio_path, model_type="whisper", model_size="medium", language=None,
+                     on_segment=None, start_offset=0.0, on_language=None):
+    """Transcribe audio using the specified model and language.
 
-def transcribe_audio(audio_path, model_type="whisper", model_size="medium", language=None):
-    """Transcribe audio using the specified model and language"""
+    Each segment is passed to on_segment as it is produced; on_language gets the
+    language info once it is known, before the first segment. A non-zero start_offset
+    skips audio that was already transcribed; returned timestamps stay absolute.
+    Returns (transcript, segments, language_info), where language_info holds the
+    language the engine used and, when it detected it, the detection probability.
+    """
     global transcription_model, current_whisper_model_size
     logger.info(f"Transcribing audio with {model_type} model ({model_size}) from {audio_path}, language: {language or 'auto'}")
     
@@ -44,68 +81,83 @@ def transcribe_audio(audio_path, model_type="whisper", model_size="medium", lang
     append_transcription_log(job_id, "Transcription started...", transcription_logs)
     
     # Get audio duration for progress reporting
-    audio_duration = get_audio_duration(audio_path)
+    with span("get_audio_duration", job_id=job_id) as attrs:
+        audio_duration = get_audio_duration(audio_path)
+        attrs["audio_seconds"] = audio_duration
+    if start_offset:
+        logger.info(f"Job {job_id}: Resuming transcription at {formatTime(start_offset)}")
+        append_transcription_log(job_id, f"Resuming transcription at {formatTime(start_offset)}", transcription_logs)
 
     if model_type == "faster-whisper":
-        from faster_whisper import WhisperModel
-        model_path = get_model_path("faster-whisper")
-        
-        # Initialize the model with optimized settings
-        logger.info(f"Loading Faster-Whisper {model_size} model")
         try:
-            # Optimize VRAM usage with compute_type and better options
-            faster_model = WhisperModel(
-                model_size, 
-                device="cuda", 
-                compute_type="float16", 
-                download_root=model_path,
-                cpu_threads=4,
-                num_workers=2
-            )
-            
-            # Use efficient batched processing
-            logger.info(f"Starting transcription for job {job_id}")
-            segments = []
-            segment_count = 0
-            last_log_time = time.time()
-            
-            # Process segments with optimization options and language
-            transcribe_kwargs = {
-                "beam_size": 5,
-                "task": "transcribe",
-                "vad_filter": True,
-                "vad_parameters": dict(min_silence_duration_ms=500),
-            }
+            # Reuse the warmed-up model when available instead of constructing one per job
+            with span("model_load", job_id=job_id, engine=model_type, model_size=model_size) as load_attrs:
+                load_attrs["cached"] = model_size in config.faster_whisper_models
+                faster_model = get_faster_whisper_model(model_size)
             
-            # Only add language parameter if it's not None or 'auto'
-            if language and language.lower() != 'auto':
-                transcribe_kwargs["language"] = language
+            with span("asr", job_id=job_id, engine=model_type, model_size=model_size) as asr_attrs, \
+                    profile_stage("transcribe", job_id=job_id):
+                # Use efficient batched processing
+                logger.info(f"Starting transcription for job {job_id}")
+                segments = []
+                segment_count = 0
+                last_log_time = time.time()
             
-            for segment in faster_model.transcribe(
-                audio_path,
-                **transcribe_kwargs
-            )[0]:
-                segment_count += 1
-                segments.append(segment)
+                # Process segments with optimization options and language
+                transcribe_kwargs = {
+                    "beam_size": 5,
+                    "task": "transcribe",
+                    "vad_filter": True,
+                    "vad_parameters": dict(min_silence_duration_ms=500),
+                }
+            
+                # Only add language parameter if it's not None or 'auto'; otherwise the engine detects it
+                if language and language.lower() != 'auto':
+                    transcribe_kwargs["language"] = language
+                    language_info = {"language": language, "probability": None, "source": "requested"}
+            
+                audio_input = audio_path
+                if start_offset:
+                    from faster_whisper import decode_audio
+                    audio_input = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)[int(start_offset * SAMPLE_RATE):]
+            
+                segment_iter, info = faster_model.transcribe(audio_input, **transcribe_kwargs)
+                if "language" not in transcribe_kwargs:
+                    language_info = {"language": info.language, "probability": round(info.language_probability, 4),
+                                     "source": "asr"}
+                    logger.info(f"Job {job_id}: Detected language {info.language} "
+                                f"(p={info.language_probability:.2f})")
+                asr_attrs["language"] = language_info["language"]
+                if on_language:
+                    on_language(language_info)
+                for segment in segment_iter:
+                    # Segments persisted so far stay in the log; a preempted job resumes after them
+                    check_cancelled(job_id)
+                    segment_count += 1
+                    formatted = {"text": segment.text, "start": segment.start + start_offset, "end": segment.end + start_offset}
+                    segments.append(formatted)
+                    if on_segment:
+                        on_segment(formatted)
                 
-                # Format and log each segment but don't flood logs
-                formatted_time = formatTime(segment.start)
-                log_message = f"{formatted_time} - {segment.text}"
-                append_transcription_log(job_id, log_message, transcription_logs)
+                    # Format and log each segment but don't flood logs
+                    formatted_time = formatTime(formatted["start"])
+                    log_message = f"{formatted_time} - {segment.text}"
+                    append_transcription_log(job_id, log_message, transcription_logs)
                 
-                # Report progress every 10 seconds
-                current_time = time.time()
-                if (current_time - last_log_time) > 10:
-                    progress = min(500, int((segment.end / audio_duration * 100) if audio_duration else 0))
-                    logger.info(f"Job {job_id}: Transcription progress ~{progress}% ({segment_count} segments)")
-                    last_log_time = current_time
+                    # Report progress every 10 seconds
+                    current_time = time.time()
+                    if (current_time - last_log_time) > 10:
+                        progress = min(500, int((formatted["end"] / audio_duration * 100) if audio_duration else 0))
+                        logger.info(f"Job {job_id}: Transcription progress ~{progress}% ({segment_count} segments)")
+                        last_log_time = current_time
+                asr_attrs["segments"] = segment_count
             
             logger.info(f"Job {job_id}: Transcription complete with {segment_count} segments")
+            AUDIO_SECONDS.inc(max(0.0, audio_duration - start_offset), engine=model_type, model_size=model_size)
             
             # Create optimized output
-            transcript = " ".join([s.text for s in segments])
-            formatted_segments = [{"text": s.text, "start": s.start, "end": s.end} for s in segments]
-            return transcript, formatted_segments
+            transcript = " ".join([s["text"] for s in segments])
+            return transcript, segments, language_info
         
         except Exception as e:
             logger.error(f"Error in transcription: {str(e)}")
@@ -118,9 +170,12 @@ def transcribe_audio(audio_path, model_type="whisper", model_size="medium", lang
             logger.error(errorMsg)
             raise Exception(errorMsg)
         
-        # Validate and set default language if necessary
+        # Without a language, Whisper detects it from the first 30 seconds of audio
         if not language or language.lower() == 'auto':
-            language = 'en'  # Default to English if no language is provided
+            language = None
+        
+        # openai-whisper decodes the whole file in one call, so it can only stop before it starts
+        check_cancelled(job_id)
         
         # Start transcription
         logger.info(f"Starting OpenAI Whisper transcription for job {job_id}")
@@ -128,103 +183,341 @@ def transcribe_audio(audio_path, model_type="whisper", model_size="medium", lang
         
         try:
             # Use the already loaded model with optimized settings
-            result = config.transcription_model.transcribe(
-                audio_path,
-                fp16=True,
-                beam_size=5,
-                best_of=5,
-                language=language  # Add language parameter
-            )
+            with span("asr", job_id=job_id, engine=model_type, model_size=config.current_whisper_model_size) as asr_attrs, \
+                    profile_stage("transcribe", job_id=job_id):
+                audio_input = audio_path
+                if start_offset:
+                    import whisper
+                    audio_input = whisper.load_audio(audio_path)[int(start_offset * SAMPLE_RATE):]
+                result = config.transcription_model.transcribe(
+                    audio_input,
+                    fp16=get_execution_profile()["whisper"]["fp16"],
+                    beam_size=5,
+                    best_of=5,
+                    language=language  # Add language parameter
+                )
+                asr_attrs["segments"] = len(result["segments"])
+                asr_attrs["language"] = result.get("language")
+            # openai-whisper reports the detected language but not its probability
+            if language:
+                language_info = {"language": language, "probability": None, "source": "requested"}
+            else:
+                language_info = {"language": result.get("language"), "probability": None, "source": "asr"}
+            if on_language:
+                on_language(language_info)
+            
+            # openai-whisper returns all segments at once, so they reach the log only after decoding
+            segments = [{"text": segment["text"], "start": segment["start"] + start_offset,
+                         "end": segment["end"] + start_offset} for segment in result["segments"]]
+            if on_segment:
+                for segment in segments:
+                    on_segment(segment)
             
             # Log some segments for UI display without flooding logs
             total_segments = len(result["segments"])
             log_interval = max(1, total_segments // 20)  # log ~20 segments
             
-            for i, segment in enumerate(result["segments"]):
+            for i, segment in enumerate(segments):
                 if i % log_interval == 0 or i == total_segments - 1:
                     formatted_time = formatTime(segment['start'])
                     log_message = f"{formatted_time} - {segment['text']}"
                     append_transcription_log(job_id, log_message, transcription_logs)
             
             logger.info(f"Job {job_id}: Whisper transcription complete with {total_segments} segments")
-            return result["text"], result["segments"]
+            AUDIO_SECONDS.inc(max(0.0, audio_duration - start_offset), engine=model_type,
+                              model_size=config.current_whisper_model_size or model_size)
+            return result["text"], segments, language_info
             
         except Exception as e:
             logger.error(f"Error in Whisper transcription: {str(e)}")
             raise
 
+def _index_status(job_id, status):
+    """Keep the status archive filters see current; the index only holds jobs past transcription"""
+    try:
+        set_document_status(job_id, status)
+    except Exception as e:
+        logger.warning(f"Job {job_id}: could not record status {status} in the search index - {str(e)}")
+
 def process_video(youtube_url, job_id, language=None):
     """Main processing function for a video - downloads, transcribes and generates notes"""
+    with bind_job(job_id):
+        _process_video(youtube_url, job_id, language)
+    save_trace(job_id)
+
+def _process_video(youtube_url, job_id, language=None):
+    """Pipeline body of process_video; spans are attributed to the bound job"""
+    segment_log = None
+    streamer = None
     try:
-        with threading.Lock():
-            if job_id not in active_jobs:
-                active_jobs[job_id] = {"url": youtube_url, "created_at": time.time()}
-            active_jobs[job_id]["status"] = "downloading"
-            if language:
-                active_jobs[job_id]["language"] = language
-        logger.info(f"Job {job_id}: Downloading audio...")
+        if job_id not in active_jobs:
+            active_jobs.create(job_id, url=youtube_url, status="queued", created_at=time.time())
+        started = time.time()
+        fields = {"status": "downloading", "started_at": started}
+        if language:
+            fields["language"] = language
+        job = active_jobs.update(job_id, **fields)
+        
+        # Retrieve configuration for model
+        model_type = job.get("model_type", "whisper")
+        model_size = job.get("model_size", "medium")
+        language = job.get("language", None)
         
-        audio_path = download_youtube_audio(youtube_url, job_id)
+        # Segments are appended to the job's log as they are produced, so a restart can pick up from there
+        state = read_segment_log(job_id)
+        resumed = state is not None
+        if state is None:
+            segment_log = SegmentLog(job_id, {
+                "url": youtube_url,
+                "model_type": model_type,
+                "model_size": model_size,
+                "language": language,
+                "priority": job.get("priority", "interactive")
+            })
+            state = {"metadata": {}, "segments": [], "transcribed": False}
+        else:
+            segment_log = SegmentLog(job_id)
+            segment_log.mark("resumed")
+            logger.info(f"Job {job_id}: Resuming with {len(state['segments'])} persisted segments")
         
-        with threading.Lock():
-            active_jobs[job_id]["status"] = "transcribing"
-            active_jobs[job_id]["audio_path"] = audio_path
-        logger.info(f"Job {job_id}: Audio downloaded to {audio_path}. Transcribing...")
+        info = state["metadata"]
+        audio_path = os.path.join(AUDIO_DIR, f"{job_id}.mp3")
+        if info and (state["transcribed"] or os.path.exists(audio_path)):
+            logger.info(f"Job {job_id}: Reusing downloaded audio at {audio_path}")
+            touch_audio(job_id)
+        else:
+            logger.info(f"Job {job_id}: Downloading audio...")
+            with STAGE_DURATION.time(stage="download", engine=model_type), span("download"):
+                audio_path, download_info = download_youtube_audio(youtube_url, job_id)
+            info = {
+                "title": download_info.get('title', 'Unknown'),
+                "channel": download_info.get('uploader', 'Unknown'),
+                "thumbnail": download_info.get('thumbnail', ''),
+                "duration": download_info.get('duration')
+            }
+            segment_log.append_metadata(info)
         
-        # Retrieve configuration for model
-        model_type = active_jobs[job_id].get("model_type", "whisper")
-        model_size = active_jobs[job_id].get("model_size", "medium")
-        language = active_jobs[job_id].get("language", None)
+        active_jobs.update(job_id, status="transcribing", audio_path=audio_path, title=info.get("title", "Unknown"))
+        logger.info(f"Job {job_id}: Audio downloaded to {audio_path}. Transcribing...")
         
-        # Transcribe audio based on selected model
-        transcript, segments = transcribe_audio(audio_path, model_type, model_size, language)
+        # Transcribe audio based on selected model, skipping what the log already holds
+        segments = list(state["segments"])
+        language_info = state.get("language")
+        if not state["transcribed"]:
+            resume_from = segments[-1]["end"] if segments else 0.0
+            if resume_from:
+                # started_at restarted with this run, so the backlog estimate covers only the audio left
+                job = dict(job, duration=job.get("duration") or info.get("duration"))
+                active_jobs.update(job_id, duration=job["duration"], estimated_seconds=remaining_estimate(job, resume_from))
+            # A resumed job keeps decoding in the language detected before the interruption
+            engine_language = language or (language_info or {}).get("language")
+            
+            # Chunks are summarized as they fill up, so notes need little work once transcription ends.
+            # Which summarizer the notes use depends on the language, so the streamer waits for the
+            # engine's detection when the job did not ask for a language
+            def start_streaming(detected):
+                nonlocal streamer
+                probability = detected.get("probability")
+                if probability is not None and probability < LANGUAGE_MIN_PROBABILITY:
+                    # Notes fall back to text detection, which may pick another summarizer
+                    return
+                streamer = StreamingSummarizer.start(job_id, detected.get("language"))
+                if streamer is not None:
+                    for segment in segments:
+                        streamer.add_segment(segment)
+            
+            if engine_language:
+                start_streaming(language_info if language_info and not language else {"language": engine_language})
+            
+            def record_language(detected):
+                nonlocal language_info
+                # Logged before the first segment, so partial transcripts and resumes see it
+                if language_info is None:
+                    language_info = detected
+                    segment_log.mark("language", **detected)
+                if not engine_language:
+                    start_streaming(detected)
+            
+            def persist_segment(segment):
+                segment_log.append_segment(segment["start"], segment["end"], segment["text"])
+                if streamer is not None:
+                    streamer.add_segment(segment)
+            
+            with STAGE_DURATION.time(stage="transcribe", engine=model_type), \
+                    span("transcribe", engine=model_type, model_size=model_size, resumed_from=resume_from) as attrs:
+                _, new_segments, new_language_info = transcribe_audio(
+                    audio_path, model_type, model_size, engine_language,
+                    on_segment=persist_segment, start_offset=resume_from,
+                    on_language=record_language)
+                attrs["segments"] = len(new_segments)
+            segments += new_segments
+            if language_info is None:
+                language_info = new_language_info
+                segment_log.mark("language", **language_info)
+            segment_log.mark("transcribed")
+        transcript = " ".join(segment["text"].strip() for segment in segments)
         
-        # Get video metadata BEFORE saving transcript
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(youtube_url, download=False)
+        # The engine's language is trusted unless it was unsure; generate_notes falls back to text detection
+        language_info = language_info or {}
+        notes_language = language
+        if not notes_language and language_info.get("language"):
+            probability = language_info.get("probability")
+            if probability is None or probability >= LANGUAGE_MIN_PROBABILITY:
+                notes_language = language_info["language"]
+        if streamer is not None and streamer.language != notes_language:
+            # Chunks summarized for another language would not match the notes' summarizer
+            streamer.abort()
+            streamer = None
+        active_jobs.update(job_id, detected_language=language_info.get("language"),
+                           language_probability=language_info.get("probability"))
         
         # Save transcript including title, channel and language
         transcript_data = {
             "text": transcript,
             "segments": segments,
             "title": info.get('title', 'Unknown'),
-            "channel": info.get('uploader', 'Unknown'),
+            "channel": info.get('channel', 'Unknown'),
             "youtube_url": youtube_url,
-            "language": language
+            "language": notes_language or language_info.get("language"),
+            "language_probability": language_info.get("probability")
         }
-        transcript_path = os.path.join(TRANSCRIPT_DIR, f"{job_id}.json")
-        with open(transcript_path, 'w') as f:
-            json.dump(transcript_data, f)
+        with span("save_transcript"):
+            transcript_path = write_json_artifact(TRANSCRIPT_DIR, job_id, transcript_data)
         logger.info(f"Job {job_id}: Transcript saved at {transcript_path}")
         
-        with threading.Lock():
-            active_jobs[job_id]["status"] = "generating_notes"
-            active_jobs[job_id]["transcript_path"] = transcript_path
+        # Sentences are split once here; notes and exports reuse the saved document
+        with span("save_document"):
+            document = Document.from_transcript(transcript_data)
+            save_document(job_id, document)
+        
+        # Extractive notes are served at once; the summarizer's notes replace the file when ready
+        if PREVIEW_NOTES:
+            with span("save_preview_notes"):
+                try:
+                    preview = generate_preview_notes(document, notes_language or "en")
+                    preview["title"] = transcript_data["title"]
+                    preview["notes_stage"] = "preview"
+                    notes_path = write_json_artifact(NOTES_DIR, job_id, preview)
+                    active_jobs.update(job_id, notes_path=notes_path, notes_stage="preview")
+                except Exception as e:
+                    logger.warning(f"Job {job_id}: could not save preview notes - {str(e)}")
+        
+        # A stale search index is better than a failed job
+        with span("index_transcript"):
+            try:
+                index_transcript(job_id, transcript_data, job.get("created_at"), "generating_notes")
+            except Exception as e:
+                logger.warning(f"Job {job_id}: could not index transcript - {str(e)}")
+        
+        active_jobs.update(job_id, status="generating_notes", transcript_path=transcript_path)
         
         # Generate and save notes with language support
-        notes = generate_notes(transcript, language)
+        check_cancelled(job_id)
+        with STAGE_DURATION.time(stage="summarize", engine=model_type), span("summarize"), \
+                profile_stage("summarize"):
+            sections = streamer.finish() if streamer is not None else None
+            streamer = None
+            notes = generate_notes(transcript, notes_language, document=document, sections=sections)
         notes["title"] = transcript_data["title"]
-        notes_path = os.path.join(NOTES_DIR, f"{job_id}.json")
-        with open(notes_path, 'w') as f:
-            json.dump(notes, f)
+        notes["notes_stage"] = "final"
+        with span("save_notes"):
+            notes_path = write_json_artifact(NOTES_DIR, job_id, notes)
         logger.info(f"Job {job_id}: Notes saved at {notes_path}")
+        segment_log.mark("complete")
+        segment_log.close()
+        remove_segment_log(job_id)
         
-        with threading.Lock():
-            active_jobs[job_id]["status"] = "complete"
-            active_jobs[job_id]["notes_path"] = notes_path
-            active_jobs[job_id]["title"] = transcript_data["title"]
-            active_jobs[job_id]["channel"] = transcript_data["channel"]
-            active_jobs[job_id]["thumbnail"] = info.get('thumbnail', '')
+        active_jobs.update(
+            job_id,
+            status="complete",
+            notes_path=notes_path,
+            notes_stage="final",
+            title=transcript_data["title"],
+            channel=transcript_data["channel"],
+            thumbnail=info.get('thumbnail', '')
+        )
+        _index_status(job_id, "complete")
+        JOBS_FINISHED.inc(status="complete")
+        if not resumed:
+            # Admission control estimates queued work from these measurements
+            try:
+                record_rtf(model_type, model_size, info.get("duration") or (segments[-1]["end"] if segments else 0),
+                           time.time() - started)
+            except OSError as e:
+                logger.warning(f"Job {job_id}: could not record real-time factor - {str(e)}")
         logger.info(f"Job {job_id}: Processing complete")
     
+    except JobCancelled as e:
+        if e.reason == LEASE_LOST:
+            # The job was reclaimed and runs elsewhere now; its record and log belong to that worker
+            release_resources()
+            logger.warning(f"Job {job_id}: Stopped, lease lost to another worker")
+            return
+        active_jobs.update(job_id, status=e.reason)
+        _index_status(job_id, e.reason)
+        if segment_log is not None:
+            segment_log.mark(e.reason)
+        if e.reason == CANCELLED:
+            JOBS_FINISHED.inc(status="cancelled")
+        release_resources()
+        logger.info(f"Job {job_id}: Stopped ({e.reason})")
+    
     except Exception as e:
-        with threading.Lock():
-            if job_id not in active_jobs:
-                active_jobs[job_id] = {"url": youtube_url, "created_at": time.time()}
-            active_jobs[job_id]["status"] = "error"
-            active_jobs[job_id]["error"] = str(e)
+        if job_id not in active_jobs:
+            active_jobs.create(job_id, url=youtube_url, status="queued", created_at=time.time())
+        try:
+            active_jobs.update(job_id, status="error", error=str(e))
+        except InvalidTransition:
+            # Bookkeeping after the job completed failed; its results are saved and stay valid
+            logger.error(f"Job {job_id}: Error after the job finished - {str(e)}", exc_info=True)
+            return
+        _index_status(job_id, "error")
+        if segment_log is not None:
+            segment_log.mark("error", error=str(e)[:500])
+        JOBS_FINISHED.inc(status="error")
         logger.error(f"Job {job_id}: Error occurred - {str(e)}", exc_info=True)
+    finally:
+        if streamer is not None:
+            streamer.abort()
+        if segment_log is not None:
+            segment_log.close()
+
+def resume_job(job_id):
+    """Restart a job from its segment log in a background thread; returns the job or None"""
+    state = read_segment_log(job_id)
+    if state is None or not state["header"].get("url"):
+        return None
+    header = state["header"]
+    job = active_jobs.create(
+        job_id,
+        url=header["url"],
+        status="queued",
+        created_at=header.get("created_at", time.time()),
+        model_type=header.get("model_type", "whisper"),
+        model_size=header.get("model_size", "medium"),
+        language=header.get("language"),
+        priority=header.get("priority", "interactive"),
+        resumed_from=state["segments"][-1]["end"] if state["segments"] else 0.0
+    )
+    duration = state["metadata"].get("duration")
+    if duration:
+        # Only the part left to transcribe counts against the admission backlog
+        job = active_jobs.update(job_id, duration=duration, estimated_seconds=remaining_estimate(
+            dict(job, duration=duration), job["resumed_from"]))
+    from modules.scheduler import submit_job
+    submit_job(job_id, header["url"], header.get("language"), job["priority"])
+    logger.info(f"Job {job_id}: Resumed from {formatTime(job['resumed_from'])}")
+    return job
+
+def resume_interrupted_jobs():
+    """Resume every job whose log shows it was cut off by a crash or restart"""
+    queued = set()
+    if config.SERVING_MODE != "dev":
+        # Jobs still in the shared queue may be running on another node; their leases bring them back
+        from modules import job_queue
+        queued = job_queue.job_ids()
+    resumed = [job_id for job_id in find_interrupted_jobs()
+               if job_id not in active_jobs and job_id not in queued and resume_job(job_id)]
+    if resumed:
+        logger.info(f"Resumed {len(resumed)} interrupted jobs")
+    return resumed
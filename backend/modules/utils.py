@@ -1,12 +1,16 @@
 import os
 import time
 import logging
-import nltk
+import datetime
 import subprocess
 from config import logger
 
+_nltk_ready = False
+
 def ensure_nltk_resources():
     """Download required NLTK resources if they're not already available"""
+    global _nltk_ready
+    import nltk
     try:
         nltk.data.find('tokenizers/punkt')
     except LookupError:
@@ -18,6 +22,14 @@ def ensure_nltk_resources():
     except LookupError:
         nltk.download('punkt_tab')
         logger.info("Downloaded NLTK resource: punkt_tab")
+    _nltk_ready = True
+
+def sent_tokenize(text):
+    """NLTK sentence tokenizer, importing NLTK and fetching punkt on first use"""
+    if not _nltk_ready:
+        ensure_nltk_resources()
+    from nltk.tokenize import sent_tokenize as nltk_sent_tokenize
+    return nltk_sent_tokenize(text)
 
 def formatTime(seconds):
     """Format seconds into minutes:seconds format"""
@@ -27,18 +39,9 @@ def formatTime(seconds):
 
 def append_transcription_log(job_id, text, transcription_logs):
     """Append a log entry to the transcription logs for a job"""
-    if job_id not in transcription_logs:
-        transcription_logs[job_id] = []
-    
-    # Add timestamp to logs for UI only
-    import datetime
+    # Add timestamp to logs for UI only; the store's ring buffer drops the oldest lines
     timestamp = datetime.datetime.now().strftime('%H:%M:%S')
-    log_entry = f"{timestamp} - {text}"
-    transcription_logs[job_id].append(log_entry)
-    
-    # Keep only the latest 100 logs to prevent memory bloat
-    if len(transcription_logs[job_id]) > 100:
-        transcription_logs[job_id] = transcription_logs[job_id][-100:]
+    transcription_logs.append(job_id, f"{timestamp} - {text}")
 
 def get_audio_duration(audio_path):
     """Get the duration of an audio file in seconds"""
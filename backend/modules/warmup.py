@@ -0,0 +1,142 @@
+import time
+import threading
+from config import logger
+import config
+
+# Components a warm instance needs before it should receive traffic
+COMPONENTS = ("nltk", "asr", "summarizer")
+
+_lock = threading.Lock()
+_thread = None
+# Processes that never warm up (API-only) report their components as skipped
+readiness = {name: {"state": "pending" if config.WARMUP_ON_STARTUP else "skipped"} for name in COMPONENTS}
+
+
+def _set_state(component, state, **details):
+    with _lock:
+        entry = {"state": state, "updated_at": time.time()}
+        previous = readiness.get(component, {})
+        # Keep identifying details (model names, start time) across transitions
+        for key in ("model", "started_at"):
+            if key in previous and key not in details:
+                entry[key] = previous[key]
+        entry.update(details)
+        readiness[component] = entry
+
+
+def get_readiness():
+    """Return a copy of per-component warm-up state and whether the instance is ready"""
+    with _lock:
+        components = {name: dict(state) for name, state in readiness.items()}
+    ready = all(state["state"] in ("ready", "skipped") for state in components.values())
+    return {"ready": ready, "components": components}
+
+
+def cluster_readiness():
+    """Readiness of the inference processes serving this host's queue.
+
+    Ready once any live process has warmed up; components are those of a ready
+    process, or of the first one still warming.
+    """
+    from modules import job_queue
+    workers = [worker for worker in job_queue.live_workers() if worker["readiness"]]
+    ready = [worker for worker in workers if worker["readiness"].get("ready")]
+    shown = (ready or workers)[0]["readiness"]["components"] if workers else {}
+    return {
+        "ready": bool(ready),
+        "components": shown,
+        "workers": {worker["name"]: worker["readiness"] for worker in workers}
+    }
+
+
+def wait_for_warmup(timeout=None):
+    """Block until a running warm-up has finished, successfully or not; returns the readiness"""
+    thread = _thread
+    if thread is not None:
+        thread.join(timeout)
+    return get_readiness()
+
+
+def _warm_nltk():
+    from modules.utils import ensure_nltk_resources, sent_tokenize
+    _set_state("nltk", "loading", started_at=time.time())
+    ensure_nltk_resources()
+    # The first call unpickles the punkt tables, which is the slow part
+    sent_tokenize("Warm up the sentence tokenizer. It loads punkt tables lazily.")
+    _set_state("nltk", "ready")
+
+
+def _warm_asr(model_type, model_size):
+    import numpy as np
+    from modules.models import load_whisper_model, get_faster_whisper_model
+    _set_state("asr", "loading", model=f"{model_type}/{model_size}", started_at=time.time())
+    silence = np.zeros(16000, dtype=np.float32)
+    if model_type == "faster-whisper":
+        model = get_faster_whisper_model(model_size)
+        # Segments are generated lazily; consume them so the decoder actually runs
+        segments, _ = model.transcribe(silence, beam_size=1, language="en")
+        list(segments)
+    else:
+        from modules.hardware import get_execution_profile
+        if config.transcription_model is None or config.current_whisper_model_size != model_size:
+            load_whisper_model(model_size)
+        config.transcription_model.transcribe(silence, fp16=get_execution_profile()["whisper"]["fp16"], language="en")
+    _set_state("asr", "ready")
+
+
+def _warm_summarizer(summarizer_model):
+    from modules.models import load_summarizer
+    _set_state("summarizer", "loading", model=summarizer_model, started_at=time.time())
+    if not load_summarizer(summarizer_model):
+        raise RuntimeError(f"Failed to load summarizer {summarizer_model}")
+    if callable(config.summarizer):
+        config.summarizer(
+            "Warm-up text for the summarizer. It runs one short generation so that "
+            "lazy initialization happens before the first real job arrives.",
+            max_length=20, min_length=5, truncation=True
+        )
+        _set_state("summarizer", "ready")
+    else:
+        # Multilingual models are loaded per language on first use
+        _set_state("summarizer", "ready", note="multilingual model loads on demand")
+
+
+def _run(model_type, model_size, summarizer_model):
+    started = time.time()
+    logger.info(f"Warm-up started: {model_type}/{model_size}, summarizer {summarizer_model}")
+    steps = [
+        ("nltk", _warm_nltk, ()),
+        ("asr", _warm_asr, (model_type, model_size)),
+        ("summarizer", _warm_summarizer, (summarizer_model,)),
+    ]
+    for component, func, args in steps:
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error(f"Warm-up of {component} failed: {str(e)}", exc_info=True)
+            _set_state(component, "error", error=str(e)[:300])
+    state = "ready" if get_readiness()["ready"] else "not ready"
+    logger.info(f"Warm-up finished in {time.time() - started:.1f}s: {state}")
+
+
+def start_warmup(model_type=None, model_size=None, summarizer_model=None):
+    """Load the configured engine and summarizer in a background thread.
+
+    Returns False when a warm-up is already running.
+    """
+    global _thread
+    from modules.models import load_app_config
+    app_config = load_app_config()
+    model_type = model_type or app_config.get("model_type", "whisper")
+    model_size = model_size or app_config.get("model_size", "medium")
+    summarizer_model = summarizer_model or app_config.get("summarizer_model")
+
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return False
+        for component in COMPONENTS:
+            readiness[component] = {"state": "pending", "updated_at": time.time()}
+        _thread = threading.Thread(target=_run, args=(model_type, model_size, summarizer_model),
+                                   name="model-warmup", daemon=True)
+        _thread.start()
+    return True
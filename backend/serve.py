@@ -0,0 +1,115 @@
+"""Production entry point: gunicorn HTTP workers plus separate inference worker processes.
+
+The HTTP processes only validate requests, queue jobs and serve results, so
+their latency does not depend on how busy the models are. Each inference
+process loads the models once and runs WORKER_SLOTS jobs at a time from the
+shared queue.
+
+    python serve.py            # settings come from ECHOSCRIPT_* environment variables
+    python serve.py --worker   # inference processes only, for extra nodes (needs ECHOSCRIPT_BROKER_URL)
+
+Extra nodes claim jobs from the API host over HTTP and hold each one under a
+lease they keep renewing; jobs of a node that stops heartbeating go back to
+the queue. All nodes must share the storage directory.
+
+The dev server (python app.py) keeps running everything in one process.
+"""
+import os
+import sys
+import multiprocessing
+
+
+def _inference_main(index, warmup):
+    os.environ["ECHOSCRIPT_SERVING_MODE"] = "inference"
+    os.environ["ECHOSCRIPT_WARMUP"] = warmup
+    from modules.inference_worker import run_inference_worker
+    run_inference_worker(index)
+
+
+def _start_inference_workers(count, warmup):
+    # spawn, not fork: CUDA and the model libraries do not survive a fork
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for index in range(count):
+        process = context.Process(target=_inference_main, args=(index, warmup), name=f"inference-{index}", daemon=True)
+        process.start()
+        workers.append(process)
+    return workers
+
+
+def worker_main():
+    """Run inference processes only, taking jobs from the API host at ECHOSCRIPT_BROKER_URL"""
+    warmup = os.environ.get("ECHOSCRIPT_WARMUP", "1")
+    os.environ["ECHOSCRIPT_SERVING_MODE"] = "inference"
+    from config import logger, INFERENCE_WORKERS, BROKER_URL, BROKER_TOKEN
+    if not BROKER_URL or not BROKER_TOKEN:
+        logger.error("Worker nodes need ECHOSCRIPT_BROKER_URL and ECHOSCRIPT_BROKER_TOKEN")
+        sys.exit(1)
+    logger.info(f"Running {INFERENCE_WORKERS} inference workers for {BROKER_URL}")
+    workers = _start_inference_workers(INFERENCE_WORKERS, warmup)
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+
+
+def main():
+    # HTTP processes never load models, so they report ready at once; inference processes warm up
+    warmup = os.environ.get("ECHOSCRIPT_WARMUP", "1")
+    os.environ["ECHOSCRIPT_SERVING_MODE"] = "api"
+    os.environ["ECHOSCRIPT_WARMUP"] = "0"
+    from config import (logger, SERVE_BIND, HTTP_WORKERS, HTTP_THREADS, INFERENCE_WORKERS, RESUME_ON_STARTUP,
+                        METRICS_DIR)
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        logger.error("Production serving needs gunicorn (pip install gunicorn); use python app.py for development")
+        sys.exit(1)
+
+    # Metric exports of the previous run's processes would otherwise be added to this run's totals
+    for filename in os.listdir(METRICS_DIR):
+        os.remove(os.path.join(METRICS_DIR, filename))
+
+    from modules import job_queue
+    # Jobs a previous run left behind come back once their leases expire; legacy entries at once
+    job_queue.reclaim_expired()
+    if RESUME_ON_STARTUP:
+        from modules.transcription import resume_interrupted_jobs
+        resume_interrupted_jobs()
+    # gunicorn forks the HTTP workers from this process; they must not inherit the connection
+    job_queue.close()
+
+    workers = _start_inference_workers(INFERENCE_WORKERS, warmup)
+
+    def on_exit(server):
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+
+    class EchoScriptApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", SERVE_BIND)
+            self.cfg.set("workers", HTTP_WORKERS)
+            self.cfg.set("threads", HTTP_THREADS)
+            self.cfg.set("worker_class", "gthread")
+            # Audio uploads and exports can take longer than gunicorn's 30 s default
+            self.cfg.set("timeout", 120)
+            self.cfg.set("on_exit", on_exit)
+
+        def load(self):
+            from app import app
+            return app
+
+    logger.info(f"Serving on {SERVE_BIND} with {HTTP_WORKERS} HTTP workers and "
+                f"{INFERENCE_WORKERS} inference workers")
+    EchoScriptApplication().run()
+
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv[1:]:
+        worker_main()
+    else:
+        main()
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# config reads these at import time, so they are set before any test imports a backend module;
+# every artifact the tests write lands in a throwaway storage directory
+os.environ["ECHOSCRIPT_STORAGE_DIR"] = tempfile.mkdtemp(prefix="echoscript-tests-")
+os.environ["ECHOSCRIPT_SERVING_MODE"] = "dev"
+os.environ["ECHOSCRIPT_WARMUP"] = "0"
+os.environ["ECHOSCRIPT_RESUME"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,110 @@
+import time
+import threading
+import pytest
+from config import active_jobs, WORKER_SLOTS
+from modules import admission
+
+
+@pytest.fixture(autouse=True)
+def budget(monkeypatch, tmp_path):
+    monkeypatch.setattr(admission, "ADMISSION_BACKLOG_SECONDS", 100)
+    monkeypatch.setattr(admission, "RTF_FILE", str(tmp_path / "rtf.json"))
+    for job_id, _ in active_jobs.snapshot():
+        active_jobs.pop(job_id, None)
+    yield
+    for job_id, _ in active_jobs.snapshot():
+        active_jobs.pop(job_id, None)
+
+
+def _seconds_of_work(cost):
+    """Audio duration that costs this many worker seconds on faster-whisper tiny"""
+    return cost / admission.real_time_factor("faster-whisper", "tiny")
+
+
+def _admit(job_id, cost):
+    return admission.admit(job_id, "https://youtu.be/x", "interactive", 0, "faster-whisper", "tiny",
+                           _seconds_of_work(cost))
+
+
+def test_verdict_admits_within_budget_and_always_when_idle():
+    assert admission._verdict(50, 0, 1) == (True, 0)
+    assert admission._verdict(500, 0, 1) == (True, 0)
+    assert admission._verdict(40, 60, 1) == (True, 0)
+
+
+def test_verdict_retry_after_is_the_excess_capped_by_the_backlog():
+    assert admission._verdict(60, 60, 1) == (False, 20)
+    assert admission._verdict(1000, 30, 1) == (False, 30)
+    # Work is spread over the slots
+    assert admission._verdict(60, 60, 2) == (True, 0)
+
+
+def test_default_real_time_factor_penalizes_openai_whisper():
+    assert admission.real_time_factor("whisper", "small") == \
+        admission.DEFAULT_RTF["small"] * admission.WHISPER_SLOWDOWN
+    assert admission.real_time_factor("faster-whisper", "unknown") == admission.DEFAULT_RTF["medium"]
+
+
+def test_recorded_rtf_is_a_moving_average():
+    admission.record_rtf("faster-whisper", "tiny", 100, 10)
+    assert admission.real_time_factor("faster-whisper", "tiny") == pytest.approx(0.1)
+    admission.record_rtf("faster-whisper", "tiny", 100, 20)
+    assert admission.real_time_factor("faster-whisper", "tiny") == pytest.approx(0.1 + 0.2 * 0.1)
+
+
+def test_admission_reserves_until_the_budget_is_spent():
+    admitted, cost, _ = _admit("a", 60 * WORKER_SLOTS)
+    assert admitted and cost == pytest.approx(60 * WORKER_SLOTS)
+    assert active_jobs["a"]["estimated_seconds"] == pytest.approx(cost)
+    assert admission.backlog_seconds() == pytest.approx(60)
+    admitted, _, retry_after = _admit("b", 60 * WORKER_SLOTS)
+    assert not admitted and retry_after == 20
+    assert "b" not in active_jobs
+
+
+def test_release_gives_the_reservation_back():
+    _admit("a", 60 * WORKER_SLOTS)
+    admission.release("a")
+    assert admission.backlog_seconds() == 0
+    assert _admit("b", 60 * WORKER_SLOTS)[0]
+
+
+def test_concurrent_requests_cannot_overbook():
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(_admit(f"job-{i}", 60 * WORKER_SLOTS)[0]))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+
+
+def test_running_jobs_count_only_their_remaining_estimate():
+    now = time.time()
+    active_jobs.create("run", status="transcribing", started_at=now - 30, estimated_seconds=100 * WORKER_SLOTS)
+    active_jobs.create("done", status="complete", estimated_seconds=1000)
+    assert admission.backlog_seconds(now) == pytest.approx((100 * WORKER_SLOTS - 30) / WORKER_SLOTS)
+
+
+def test_remaining_estimate_covers_only_audio_left():
+    job = {"duration": 1000, "model_type": "faster-whisper", "model_size": "tiny", "estimated_seconds": 60}
+    factor = admission.real_time_factor("faster-whisper", "tiny")
+    assert admission.remaining_estimate(job, 400) == pytest.approx(600 * factor)
+    assert admission.remaining_estimate(job, 2000) == 0
+    assert admission.remaining_estimate({"estimated_seconds": 60}, 400) == 60
+
+
+def test_disabled_budget_admits_without_reserving(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_BACKLOG_SECONDS", 0)
+    assert _admit("a", 10 ** 6)[0]
+    assert "a" not in active_jobs
+
+
+def test_slow_duration_probe_gives_up(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(admission, "_probe", lambda url, timeout: release.wait(5) and 42)
+    started = time.time()
+    assert admission.probe_duration("https://youtu.be/x", timeout=0.2) is None
+    assert time.time() - started < 1
+    release.set()
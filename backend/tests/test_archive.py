@@ -0,0 +1,92 @@
+import io
+import json
+import zipfile
+import pytest
+from config import TRANSCRIPT_DIR, NOTES_DIR
+from modules import archive as archive_module, search
+from modules.archive import _ZipSink, _entry, archive_jobs, stream_archive
+from modules.storage import write_json_artifact
+
+
+@pytest.fixture(autouse=True)
+def empty_index():
+    conn = search._connect()
+    with conn:
+        conn.execute("DELETE FROM segments")
+        conn.execute("DELETE FROM documents")
+
+
+def _job(job_id, created_at, channel="Channel", status="complete", notes=True):
+    transcript = {"text": "Hello there.", "title": f"Title {job_id}", "channel": channel,
+                  "segments": [{"text": "Hello there.", "start": 0.0, "end": 1.0}]}
+    write_json_artifact(TRANSCRIPT_DIR, job_id, transcript)
+    if notes:
+        write_json_artifact(NOTES_DIR, job_id, {"summary": "Greeting"})
+    search.index_transcript(job_id, transcript, created_at, status)
+
+
+def test_zip_sink_hands_out_each_write_once():
+    sink = _ZipSink()
+    assert sink.writable()
+    sink.write(b"ab")
+    sink.write(memoryview(b"cd"))
+    assert sink.drain() == b"abcd"
+    assert sink.drain() == b""
+
+
+def test_archive_jobs_filters_in_the_index():
+    _job("arc-1", 100.0)
+    _job("arc-2", 200.0, channel="other")
+    _job("arc-3", 300.0, status="error")
+    _job("arc-4", 400.0)
+    assert [job["job_id"] for job in archive_jobs()] == ["arc-1", "arc-2", "arc-3", "arc-4"]
+    assert [job["job_id"] for job in archive_jobs(since=200, until=400)] == ["arc-2", "arc-3"]
+    assert [job["job_id"] for job in archive_jobs(channel="OTHER")] == ["arc-2"]
+    assert [job["job_id"] for job in archive_jobs(status="complete", after="arc-1")] == ["arc-2", "arc-4"]
+    assert [job["job_id"] for job in archive_jobs(limit=2)] == ["arc-1", "arc-2"]
+
+
+def test_status_updates_reach_the_filter():
+    _job("arc-1", 100.0, status="generating_notes")
+    assert archive_jobs(status="complete") == []
+    search.set_document_status("arc-1", "complete")
+    assert [job["job_id"] for job in archive_jobs(status="complete")] == ["arc-1"]
+
+
+def test_entries_before_the_zip_epoch_are_clamped():
+    info = _entry("old/transcript.json", 0.0)
+    assert info.date_time[0] >= 1980
+
+
+def test_stream_archive_builds_a_valid_zip():
+    _job("zip-1", 100.0)
+    _job("zip-2", 200.0, notes=False)
+    jobs = archive_jobs()
+    chunks = list(stream_archive(jobs, subtitles=("srt",), next_cursor="zip-2"))
+    # Blocks are handed out as they are written, not collected until the end
+    assert len([chunk for chunk in chunks if chunk]) > 2
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        names = archive.namelist()
+        assert names == ["zip-1/transcript.json", "zip-1/notes.json", "zip-1/transcript.srt",
+                         "zip-2/transcript.json", "zip-2/transcript.srt", "manifest.json"]
+        assert json.loads(archive.read("zip-1/notes.json")) == {"summary": "Greeting"}
+        assert archive.read("zip-2/transcript.srt").decode("utf-8").startswith("1\n00:00:00,000 --> ")
+        manifest = json.loads(archive.read("manifest.json"))
+    assert [job["job_id"] for job in manifest["jobs"]] == ["zip-1", "zip-2"]
+    assert manifest["next_cursor"] == "zip-2"
+
+
+def test_job_that_fails_partway_is_listed_as_failed(monkeypatch):
+    _job("zip-1", 100.0)
+    _job("zip-2", 200.0)
+
+    def broken(job_id, fmt):
+        if job_id == "zip-1":
+            raise OSError("disk error")
+        return iter([b"cue"])
+    monkeypatch.setattr(archive_module, "_export_chunks", broken)
+    chunks = list(stream_archive(archive_jobs(), subtitles=("srt",)))
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+    assert [job["job_id"] for job in manifest["jobs"]] == ["zip-2"]
+    assert [(job["job_id"], job["error"]) for job in manifest["failed"]] == [("zip-1", "disk error")]
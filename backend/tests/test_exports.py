@@ -0,0 +1,113 @@
+import os
+import re
+import uuid
+import pytest
+from config import TRANSCRIPT_DIR
+from modules import document as document_module
+from modules import exports
+from modules.segment_log import SegmentLog, compress_segment_log
+from modules.storage import write_json_artifact
+
+SEGMENTS = [
+    {"text": " Hello there.", "start": 0.0, "end": 2.5},
+    {"text": " How are", "start": 2.5, "end": 4.0},
+    {"text": " you today?", "start": 4.0, "end": 3725.125},
+]
+
+
+@pytest.fixture(autouse=True)
+def simple_sentences(monkeypatch):
+    monkeypatch.setattr(document_module, "sent_tokenize",
+                        lambda text: [part for part in re.split(r"(?<=[.?])\s+", text) if part])
+
+
+@pytest.fixture
+def job_id():
+    return uuid.uuid4().hex
+
+
+def _save_transcript(job_id, segments=SEGMENTS):
+    text = " ".join(segment["text"].strip() for segment in segments)
+    write_json_artifact(TRANSCRIPT_DIR, job_id, {"text": text, "segments": segments, "title": "Talk",
+                                                 "channel": "Channel", "youtube_url": "https://youtu.be/x"})
+
+
+def test_cue_time_formats_and_rounds():
+    assert exports._cue_time(3725.125, ",") == "01:02:05,125"
+    assert exports._cue_time(0.0004, ".") == "00:00:00.000"
+    assert exports._cue_time(-1, ",") == "00:00:00,000"
+    assert exports._cue_time(59.9996, ".") == "00:01:00.000"
+
+
+def test_srt_numbers_cues_and_cleans_text():
+    segments = [{"text": " a\n\nb --> c ", "start": 1.0, "end": 2.0}]
+    assert "".join(exports._srt(segments, {})) == "1\n00:00:01,000 --> 00:00:02,000\na b -> c\n\n"
+
+
+def test_vtt_has_header_and_dot_separator():
+    output = "".join(exports._vtt(SEGMENTS[:1], {}))
+    assert output == "WEBVTT\n\n00:00:00.000 --> 00:00:02.500\nHello there.\n\n"
+
+
+def test_markdown_paragraphs_start_with_clock(monkeypatch):
+    monkeypatch.setattr(exports, "PARAGRAPH_SECONDS", 3)
+    output = "".join(exports._md(SEGMENTS, {"title": "Talk", "channel": "Channel"}))
+    assert output.startswith("# Talk\n\nChannel\n\n**[0:00]** Hello there.")
+    assert "**[0:04]** you today?" in output
+
+
+def test_running_job_streams_from_its_log_without_caching(job_id):
+    log = SegmentLog(job_id, {"url": "https://youtu.be/x"})
+    log.append_segment(0.0, 1.5, " Partial words")
+    log.close()
+    assert "".join(exports.stream_export(job_id, "srt")) == "1\n00:00:00,000 --> 00:00:01,500\nPartial words\n\n"
+    assert not os.path.exists(exports.export_path(job_id, "srt"))
+
+
+def test_running_job_with_compressed_log_still_exports(job_id):
+    log = SegmentLog(job_id, {"url": "https://youtu.be/x"})
+    log.append_segment(0.0, 1.5, " Partial words")
+    log.close()
+    compress_segment_log(job_id)
+    assert "".join(exports.stream_export(job_id, "txt")) == "Partial words\n\n"
+
+
+def _cue_spans(output):
+    times = re.findall(r"(\d\d):(\d\d):(\d\d)[.,](\d{3}) --> (\d\d):(\d\d):(\d\d)[.,](\d{3})", output)
+    return [[int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000 for h, m, s, ms in (t[:4], t[4:])]
+            for t in times]
+
+
+def test_finished_subtitles_keep_segment_cues_and_cache(job_id):
+    segments = [
+        {"text": " One. Two.", "start": 0.0, "end": 4.0},
+        {"text": " Three", "start": 4.0, "end": 6.0},
+        {"text": " four.", "start": 6.0, "end": 8.0},
+    ]
+    _save_transcript(job_id, segments)
+    output = "".join(exports.stream_export(job_id, "vtt"))
+    spans = _cue_spans(output)
+    assert spans == [[0.0, 4.0], [4.0, 6.0], [6.0, 8.0]]
+    assert all(previous[1] <= following[0] for previous, following in zip(spans, spans[1:]))
+    assert exports.cached_export(job_id, "vtt") == exports.export_path(job_id, "vtt")
+
+
+def test_finished_text_paragraphs_follow_document_sentences(job_id, monkeypatch):
+    monkeypatch.setattr(exports, "PARAGRAPH_SECONDS", 1)
+    _save_transcript(job_id)
+    # "How are you today?" spans two segments and stays in one paragraph
+    assert "".join(exports.stream_export(job_id, "txt")) == "Hello there.\n\nHow are you today?\n\n"
+
+
+def test_interrupted_download_leaves_no_cache(job_id):
+    _save_transcript(job_id)
+    chunks = exports.stream_export(job_id, "srt")
+    next(chunks)
+    chunks.close()
+    assert exports.cached_export(job_id, "srt") is None
+    assert not [name for name in os.listdir(os.path.dirname(exports.export_path(job_id, "srt")))
+                if name.startswith(job_id)]
+
+
+def test_job_without_transcript_has_no_export(job_id):
+    assert exports.stream_export(job_id, "txt") is None
@@ -0,0 +1,133 @@
+import time
+import pytest
+from config import LEASE_SECONDS
+from modules.job_queue import SQLiteBroker
+from modules.cancellation import LEASE_LOST
+
+
+@pytest.fixture
+def broker(tmp_path):
+    broker = SQLiteBroker(str(tmp_path / "queue.db"))
+    yield broker
+    broker.close()
+
+
+def _state(broker):
+    return {row["job_id"]: (row["state"], row["worker"], row["cancel"]) for row in broker.rows()}
+
+
+def _beat(broker, name, slots):
+    broker.heartbeat({}, 30, {"name": name, "slots": slots, "readiness": {"ready": True}})
+
+
+def test_claims_follow_priority_then_sequence(broker):
+    broker.enqueue("bulk", "u", None, "bulk", 1)
+    broker.enqueue("first", "u", None, "interactive", 0)
+    broker.enqueue("second", "u", None, "interactive", 0)
+    assert [broker.claim("w/0", 30)["job_id"] for _ in range(3)] == ["first", "second", "bulk"]
+    assert broker.claim("w/0", 30) is None
+
+
+def test_heartbeat_renews_only_the_holders_lease(broker):
+    broker.enqueue("a", "u", None, "interactive", 0)
+    broker.claim("w/0", 30)
+    assert broker.heartbeat({"a": {"worker": "w/0", "progress": "transcribing"}}, 30) == {}
+    assert broker.heartbeat({"a": {"worker": "other/0"}}, 30) == {"a": LEASE_LOST}
+    assert broker.rows()[0]["progress"] == "transcribing"
+
+
+def test_expired_lease_is_requeued_and_reclaimed(broker):
+    broker.enqueue("a", "u", None, "interactive", 0)
+    broker.claim("dead/0", 30)
+    assert broker.reclaim_expired(now=time.time() + 10) == ([], [])
+    assert broker.reclaim_expired(now=time.time() + 31) == (["a"], [])
+    assert _state(broker)["a"] == ("queued", None, None)
+    claimed = broker.claim("alive/0", 30)
+    assert claimed["job_id"] == "a" and claimed["attempts"] == 1
+    # The old holder learns it lost the job on its next beat
+    assert broker.heartbeat({"a": {"worker": "dead/0"}}, 30) == {"a": LEASE_LOST}
+
+
+def test_expired_cancelled_job_is_dropped(broker):
+    broker.enqueue("a", "u", None, "interactive", 0)
+    broker.claim("dead/0", 30)
+    assert broker.cancel("a") == "cancelling"
+    assert broker.reclaim_expired(now=time.time() + 31) == ([], ["a"])
+    assert broker.rows() == []
+
+
+def test_cancel_removes_queued_and_flags_running(broker):
+    broker.enqueue("queued", "u", None, "bulk", 1)
+    broker.enqueue("running", "u", None, "interactive", 0)
+    broker.claim("w/0", 30)
+    assert broker.cancel("queued") == "cancelled"
+    assert broker.cancel("running") == "cancelling"
+    assert broker.cancel("unknown") is None
+    assert broker.heartbeat({"running": {"worker": "w/0"}}, 30) == {"running": "cancelled"}
+
+
+def test_interactive_job_preempts_newest_bulk_when_live_slots_are_full(broker):
+    _beat(broker, "node", 2)
+    for job_id in ("bulk-old", "bulk-new"):
+        broker.enqueue(job_id, "u", None, "bulk", 1)
+        broker.claim("node/0", 30)
+    since = time.time() - 30
+    broker.enqueue("interactive", "u", None, "interactive", 0, live_since=since)
+    assert _state(broker)["bulk-new"][2] == "preempted"
+    assert _state(broker)["bulk-old"][2] is None
+
+
+def test_no_preemption_while_live_slots_are_free(broker):
+    _beat(broker, "node-a", 1)
+    _beat(broker, "node-b", 1)
+    broker.enqueue("bulk", "u", None, "bulk", 1)
+    broker.claim("node-a/0", 30)
+    broker.enqueue("interactive", "u", None, "interactive", 0, live_since=time.time() - 30)
+    assert _state(broker)["bulk"][2] is None
+    assert broker.capacity(time.time() - 30) == 2
+    # Workers that stopped heartbeating no longer count
+    assert broker.capacity(time.time() + 1) == 0
+
+
+def test_release_requeues_only_for_the_holder(broker):
+    broker.enqueue("a", "u", None, "bulk", 1)
+    broker.claim("w/0", 30)
+    broker.release("a", worker="other/0")
+    assert _state(broker)["a"][0] == "running"
+    broker.release("a", worker="w/0", requeue=True)
+    assert _state(broker)["a"] == ("queued", None, None)
+    broker.release("a")
+    assert broker.rows() == []
+
+
+
+def test_reservations_count_as_work_until_abandoned(broker):
+    since = time.time() - 30
+    admit_all = lambda work, capacity: (True, 0)
+    broker.reserve("a", "u", "interactive", 0, 50.0, since, admit_all)
+    assert broker.work(since) == 50.0
+    # Reservations are never handed to workers
+    assert broker.claim("w/0", 30) is None
+    broker.enqueue("a", "u", None, "interactive", 0, estimated_seconds=50.0)
+    assert _state(broker)["a"][0] == "queued"
+    broker.reserve("b", "u", "interactive", 0, 20.0, since, admit_all)
+    assert broker.work(time.time() + 1) == 50.0
+    broker.reclaim_expired(now=time.time() + LEASE_SECONDS + 1)
+    assert "b" not in _state(broker)
+
+
+def test_cancelled_reservation_is_not_revived_by_enqueue(broker):
+    since = time.time() - 30
+    broker.reserve("a", "u", "interactive", 0, 50.0, since, lambda work, capacity: (True, 0))
+    assert broker.cancel("a") == "cancelled"
+    assert broker.work(since) == 0
+    assert broker.enqueue("a", "u", None, "interactive", 0, estimated_seconds=50.0) is None
+    assert "a" not in _state(broker)
+    assert broker.claim("w/0", 30) is None
+
+
+def test_heartbeat_publishes_the_workers_profile(broker):
+    broker.heartbeat({}, 30, {"name": "inf-0", "slots": 1, "readiness": None, "profile": {"device": "cpu"}})
+    broker.heartbeat({}, 30, {"name": "inf-1", "slots": 1, "readiness": None})
+    workers = {worker["name"]: worker["profile"] for worker in broker.workers(0)}
+    assert workers == {"inf-0": {"device": "cpu"}, "inf-1": None}
@@ -0,0 +1,119 @@
+import threading
+import pytest
+from modules.job_store import JobStore, LogStore, InvalidTransition
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path), ttl=60, max_jobs=3)
+
+
+def _finish(store, job_id):
+    for status in ("downloading", "transcribing", "generating_notes", "complete"):
+        store.update(job_id, status=status)
+
+
+def test_update_is_copy_on_write(store):
+    first = store.create("a", status="queued")
+    second = store.update("a", status="downloading", progress=1)
+    assert first["status"] == "queued" and "progress" not in first
+    assert second["version"] == first["version"] + 1
+    assert store["a"] is second
+
+
+def test_invalid_transition_is_rejected(store):
+    store.create("a", status="queued")
+    with pytest.raises(InvalidTransition):
+        store.update("a", status="complete")
+    _finish(store, "a")
+    assert "finished_at" in store["a"]
+    with pytest.raises(InvalidTransition):
+        store.update("a", status="queued")
+
+
+def test_update_of_unknown_job_raises_key_error(store):
+    with pytest.raises(KeyError):
+        store.update("missing", status="queued")
+
+
+def test_ttl_eviction_keeps_running_jobs_and_persists_finished(store):
+    store.create("done", status="queued")
+    _finish(store, "done")
+    store.create("running", status="queued")
+    finished_at = store["done"]["finished_at"]
+    assert store.evict_expired(now=finished_at + 61) == 1
+    assert "done" not in store and "running" in store
+    assert store.load("done")["status"] == "complete"
+
+
+def test_capacity_evicts_longest_finished_first(store):
+    for job_id in ("a", "b", "c"):
+        store.create(job_id, status="queued")
+        _finish(store, job_id)
+    store.create("d", status="queued")
+    assert set(store) == {"b", "c", "d"}
+    assert store.load("a")["status"] == "complete"
+
+
+def test_byte_cap_evicts_finished_jobs(tmp_path):
+    store = JobStore(str(tmp_path), max_jobs=100, max_bytes=600)
+    store.create("old", status="queued", notes="x" * 300)
+    _finish(store, "old")
+    store.create("new", status="queued", notes="y" * 300)
+    assert "old" not in store and "new" in store
+    assert store.total_bytes <= 600
+
+
+def test_amend_loses_no_concurrent_changes(store):
+    store.create("a", status="queued")
+
+    def add_spans():
+        for i in range(200):
+            store.amend("a", "trace", lambda spans: spans + (i,), ())
+
+    threads = [threading.Thread(target=add_spans) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store["a"]["trace"]) == 1000
+    assert store["a"]["version"] == 1
+
+
+def test_transient_keys_never_reach_disk(store):
+    store.create("a", status="queued")
+    store.amend("a", "trace", lambda spans: spans + ({"stage": "asr"},), ())
+    store.persist("a")
+    assert "trace" not in store._read("a")
+
+
+def test_recreated_job_wins_over_stale_copies_in_other_stores(tmp_path):
+    api, worker = JobStore(str(tmp_path), shared=True), JobStore(str(tmp_path), shared=True)
+    api.create("job", status="queued")
+    for status in ("downloading", "transcribing", "error"):
+        worker.update("job", status=status)
+    assert api.load("job")["status"] == "error"
+    # Resuming replaces the failed record; the worker still holds the old one in memory
+    api.create("job", status="queued")
+    assert worker.update("job", status="downloading")["version"] == 6
+    assert api.load("job")["status"] == "downloading"
+
+
+def test_log_store_keeps_the_newest_lines_of_the_newest_jobs():
+    logs = LogStore(max_lines=2, max_jobs=2)
+    for line in ("one", "two", "three"):
+        logs.append("a", line)
+    logs.append("b", "b1")
+    logs.append("c", "c1")
+    assert logs.lines("a") == []
+    assert logs.lines("b") == ["b1"]
+
+
+def test_shared_log_store_tails_and_discards(tmp_path):
+    writer, reader = LogStore(log_dir=str(tmp_path)), LogStore(log_dir=str(tmp_path))
+    writer.append("a", "first")
+    assert reader.lines("a") == ["first"]
+    writer.append("a", "second\nline")
+    assert reader.lines("a") == ["first", "second line"]
+    reader.discard("a")
+    assert not (tmp_path / "a.log").exists()
@@ -0,0 +1,59 @@
+import pytest
+from modules import search
+
+
+@pytest.fixture(autouse=True)
+def empty_index():
+    conn = search._connect()
+    with conn:
+        conn.execute("DELETE FROM segments")
+        conn.execute("DELETE FROM documents")
+
+
+def _transcript(*texts, title="Talk"):
+    return {"title": title, "channel": "Channel", "language": "en",
+            "segments": [{"text": text, "start": i * 5.0, "end": i * 5.0 + 5} for i, text in enumerate(texts)]}
+
+
+def test_build_match_query_quotes_terms():
+    assert search.build_match_query("fast whisper") == '"fast" "whisper"'
+
+
+def test_build_match_query_keeps_prefix_star():
+    assert search.build_match_query("transcri*") == '"transcri"*'
+
+
+def test_build_match_query_drops_fts_syntax():
+    # Quotes and operators would otherwise be FTS5 syntax errors
+    assert search.build_match_query('say "hello" OR -') == '"say" "hello" "OR" "-"'
+    assert search.build_match_query('  "" * ') == ""
+
+
+def test_search_returns_timestamped_hits():
+    search.index_transcript("job-a", _transcript("Welcome to the show", "Today we talk about whisper models"))
+    hits = search.search("whisper")
+    assert len(hits) == 1
+    hit = hits[0]
+    assert (hit["job_id"], hit["title"], hit["start"], hit["end"]) == ("job-a", "Talk", 5.0, 10.0)
+    assert "<mark>whisper</mark>" in hit["snippet"]
+
+
+def test_search_filters_by_job_and_prefix():
+    search.index_transcript("job-a", _transcript("transcription is hard"))
+    search.index_transcript("job-b", _transcript("transcribing audio"))
+    assert {hit["job_id"] for hit in search.search("transcri*")} == {"job-a", "job-b"}
+    assert [hit["job_id"] for hit in search.search("transcri*", job_id="job-b")] == ["job-b"]
+
+
+def test_reindex_replaces_and_remove_drops():
+    search.index_transcript("job-a", _transcript("first version"))
+    search.index_transcript("job-a", _transcript("second version", "with two segments"))
+    assert search.search("first") == []
+    assert search.index_stats() == {"documents": 1, "segments": 2}
+    search.remove_transcript("job-a")
+    assert search.index_stats() == {"documents": 0, "segments": 0}
+
+
+def test_empty_query_has_no_hits():
+    search.index_transcript("job-a", _transcript("anything"))
+    assert search.search('""') == []
@@ -0,0 +1,64 @@
+import re
+import pytest
+from modules import document as document_module
+from modules.document import Document
+from modules.summarization import token_chunks, summarizer_input_limit, INPUT_TOKEN_MARGIN
+
+
+class WordTokenizer:
+    """One token per word, like a HF tokenizer's batch call"""
+
+    model_max_length = 1024
+
+    def __call__(self, texts, add_special_tokens=False):
+        return {"input_ids": [[0] * len(text.split()) for text in texts]}
+
+
+@pytest.fixture(autouse=True)
+def simple_sentences(monkeypatch):
+    # NLTK's punkt model is not needed to split these test sentences
+    monkeypatch.setattr(document_module, "sent_tokenize",
+                        lambda text: [part for part in re.split(r"(?<=\.)\s+", text) if part])
+
+
+def _document(*segment_texts):
+    segments = [{"text": text, "start": i * 10.0, "end": i * 10.0 + 10} for i, text in enumerate(segment_texts)]
+    return Document.build(" ".join(segment_texts), segments)
+
+
+def test_chunks_fill_up_to_the_limit_on_segment_boundaries():
+    document = _document("One two three.", "Four five six.", "Seven eight nine.")
+    chunks = token_chunks(document, WordTokenizer(), 6)
+    assert [chunk["text"] for chunk in chunks] == ["One two three. Four five six.", "Seven eight nine."]
+    assert [chunk["tokens"] for chunk in chunks] == [6, 3]
+    assert (chunks[0]["start"], chunks[0]["end"], chunks[1]["start"]) == (0.0, 20.0, 20.0)
+
+
+def test_sentence_spanning_segments_is_never_split():
+    # "Two three four." starts in the first segment and ends in the second
+    document = _document("One. Two three", "four. Five.")
+    chunks = token_chunks(document, WordTokenizer(), 4)
+    assert [chunk["text"] for chunk in chunks] == ["One. Two three four.", "Five."]
+
+
+def test_oversized_unit_is_split_between_sentences():
+    document = _document("A b c. D e f. G h i.")
+    chunks = token_chunks(document, WordTokenizer(), 4)
+    assert [chunk["text"] for chunk in chunks] == ["A b c.", "D e f.", "G h i."]
+    assert all(chunk["tokens"] <= 4 for chunk in chunks)
+
+
+def test_without_tokenizer_counts_are_estimated():
+    document = _document("One two three.")
+    [chunk] = token_chunks(document, None, 100)
+    assert chunk["tokens"] == int(3 * 4 / 3) + 1
+
+
+def test_input_limit_leaves_a_margin_and_ignores_sentinels():
+    assert summarizer_input_limit(WordTokenizer()) == 1024 - INPUT_TOKEN_MARGIN
+
+    class Unbounded:
+        model_max_length = int(1e30)
+
+    assert summarizer_input_limit(Unbounded(), default=512) == 512 - INPUT_TOKEN_MARGIN
+    assert summarizer_input_limit(None) == 1024 - INPUT_TOKEN_MARGIN